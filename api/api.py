@@ -1,45 +1,304 @@
 # api.py
-from src.index.index_creator import IndexCreator, FAISSIndex
+from src.index.index_creator import FAISSIndex
 from src.config.config_loader import ConfigLoader
-from src.utils.utils import DatabaseUtils, Logger
+from src.utils.llm_loader import LLMLoader
+from src.utils.llm_scheduler import LLMScheduler
+from src.utils.resource_registry import ResourceRegistry
+from src.utils.metrics import (
+    CACHE_REQUESTS,
+    QUERY_ERRORS,
+    REFINER_RETRIES,
+    SUMMARIES,
+    get_metrics_endpoint,
+    observe_stage,
+    observe_stage_items,
+)
+from src.utils.result_summariser import ResultSummariser
+from src.utils.template_sql import TemplateSQLBuilder
+from src.utils.token_budget import get_request_token_usage
 from llama_index.schema import QueryBundle
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
 import json
+import queue
 from typing import Optional
 
+# rows of a result shown in the responses and prompted to the LLM
+RESULT_SAMPLE_ROWS = 10
+
 
 class BaseAPI:
     def __init__(self):
+        self._registry = ResourceRegistry()
         self._prompt_templates = ConfigLoader().load_prompt_config()
-        self._query_engine = IndexCreator().create_query_engine()
+        self._query_engine = self._registry.query_engine
         self._llm = self._query_engine.service_context.llm
-        self._database_utils_instance = DatabaseUtils()
-        self._schema_str = self._database_utils_instance.get_schema_str()
-        self._fk_str = self._database_utils_instance.get_fk_str()
+        self._llm_loader = LLMLoader()
+        self._llm_scheduler = LLMScheduler()
+        self._database_utils_instance = self._registry.database_utils
+        self._schema_str = self._registry.schema_str
+        self._fk_str = self._registry.fk_str
+        self._schema_retriever = self._registry.schema_retriever
         self.max_tries = 2
-        self.logger_instance = Logger()
+        self.logger_instance = self._registry.logger
+        self._sql_cache = self._registry.sql_cache
+        self._semantic_cache = self._registry.semantic_cache
+        self._schema_fingerprint = self._registry.schema_fingerprint
+        self._result_summariser = ResultSummariser()
+        self._prompt_budget = self._registry.prompt_budget
+        self._registry.register_prompt_prefixes()
 
-    def get_llm_response(
-        self, user_question, result, summarize: Optional[bool] = False
-    ):
+    def get_llm(self, template_name=None):
+        """
+        Returns:
+            tuple: (LLM the prompt template is routed to, its admission queue)
+        """
+        if template_name is None:
+            return self._llm, self._llm_scheduler
+        return (
+            self._llm_loader.get_llm_for_template(template_name),
+            LLMScheduler.for_template(template_name),
+        )
+
+    def build_prompt(self, template_name, **fields):
+        """
+        Formats a prompt template, counting its tokens and keeping it within the template's token budget.
+        """
+        return self._prompt_budget.build(template_name, **fields)
+
+    def complete(self, prompt, template_name=None):
+        llm, llm_scheduler = self.get_llm(template_name)
+        with llm_scheduler.slot():
+            response = llm.complete(prompt)
+        if template_name is not None:
+            self._prompt_budget.record_completion(template_name, response.text)
+        return response
+
+    def stream_complete(self, prompt, template_name=None):
+        llm, llm_scheduler = self.get_llm(template_name)
+        completion = ""
+        # the slot is held until the whole completion has been streamed
+        with llm_scheduler.slot():
+            for response in llm.stream_complete(prompt):
+                completion += response.delta or ""
+                yield response
+        if template_name is not None:
+            self._prompt_budget.record_completion(template_name, completion)
+
+    def query(self, prompt, template_name=None):
+        # the query engine's templates always run on its own (default) LLM, whatever their routing
+        with self._llm_scheduler.slot():
+            response = self._query_engine.query(prompt)
+        if template_name is not None:
+            self._prompt_budget.record_completion(
+                template_name, response.metadata["sql_query"]
+            )
+        return response
+
+    def retrieve_sql_with_metadata(self, query_bundle, template_name=None):
+        with self._llm_scheduler.slot():
+            retrieved_nodes, metadata = (
+                self._query_engine._sql_retriever.retrieve_with_metadata(query_bundle)
+            )
+        if template_name is not None:
+            self._prompt_budget.record_completion(
+                template_name, metadata["sql_query"]
+            )
+        return retrieved_nodes, metadata
+
+    def get_cache_scope(self, template_name, evidence=""):
+        return f"{template_name}|{self._schema_fingerprint}|{(evidence or '').strip()}"
+
+    def get_cached_sql_query(self, template_name, user_question, evidence=""):
+        """
+        Looks the question up in the exact match cache first and then in the semantic cache.
+        Returns:
+            dict: lookup details, "sql_query" is None on a miss and "source" tells which cache answered.
+        """
+        lookup = {
+            "template_name": template_name,
+            "evidence": evidence,
+            "cache_key": None,
+            "sql_query": None,
+            "source": None,
+            "semantic_match": None,
+        }
+        with observe_stage("cache_lookup"):
+            if self._sql_cache is not None:
+                lookup["cache_key"] = self._sql_cache.make_key(
+                    question=user_question,
+                    evidence=evidence,
+                    template_name=template_name,
+                    schema_fingerprint=self._schema_fingerprint,
+                )
+                lookup["sql_query"] = self._sql_cache.get(lookup["cache_key"])
+                CACHE_REQUESTS.inc(
+                    "sql", "miss" if lookup["sql_query"] is None else "hit"
+                )
+                if lookup["sql_query"] is not None:
+                    lookup["source"] = "exact"
+                    return lookup
+
+            if self._semantic_cache is not None:
+                semantic_match = self._semantic_cache.lookup(
+                    user_question, scope=self.get_cache_scope(template_name, evidence)
+                )
+                CACHE_REQUESTS.inc("semantic", "miss" if semantic_match is None else "hit")
+                if semantic_match is not None:
+                    lookup["sql_query"] = semantic_match["sql_query"]
+                    lookup["source"] = "semantic"
+                    lookup["semantic_match"] = semantic_match
+        return lookup
+
+    def invalidate_cached_sql_query(self, lookup):
+        if lookup["source"] == "exact":
+            self._sql_cache.invalidate(lookup["cache_key"])
+        elif lookup["source"] == "semantic":
+            self._semantic_cache.invalidate(lookup["semantic_match"]["id"])
+        lookup["source"] = None
+
+    def cache_sql_query(self, lookup, user_question, sql_query):
+        if lookup["source"] == "exact":
+            return
+        if self._sql_cache is not None and lookup["cache_key"] is not None:
+            self._sql_cache.put(lookup["cache_key"], sql_query)
+        if self._semantic_cache is not None and lookup["source"] is None:
+            self._semantic_cache.add(
+                user_question,
+                scope=self.get_cache_scope(
+                    lookup["template_name"], lookup["evidence"]
+                ),
+                sql_query=sql_query,
+            )
+
+    def get_cache_info(self, lookup):
+        cache_info = {
+            "sql_cache_hit": lookup["source"] == "exact",
+            "semantic_cache_hit": lookup["source"] == "semantic",
+        }
+        if lookup["source"] == "semantic":
+            cache_info["semantic_match"] = {
+                "question": lookup["semantic_match"]["question"],
+                "score": lookup["semantic_match"]["score"],
+            }
+        if self._sql_cache is not None:
+            cache_info["sql_cache"] = self._sql_cache.stats()
+        if self._semantic_cache is not None:
+            cache_info["semantic_cache"] = self._semantic_cache.stats()
+        result_cache_stats = self._database_utils_instance.get_result_cache_stats()
+        if result_cache_stats is not None:
+            cache_info["result_cache"] = result_cache_stats
+        return cache_info
+
+    def get_llm_prompt(self, user_question, result, summarize: Optional[bool] = False):
         if summarize:
-            prompt = self._prompt_templates["summary_template"].format(
-                schema_str=self._schema_str, result=result
+            prompt = self.build_prompt(
+                "summary_template", schema_str=self._schema_str, result=result
             )
         else:
-            prompt = self._prompt_templates["human_like_response_template"].format(
-                user_question=user_question, result=result
+            prompt = self.build_prompt(
+                "human_like_response_template",
+                user_question=user_question,
+                result=result,
             )
-        response = self._llm.complete(prompt)
+        return prompt
+
+    @staticmethod
+    def get_response_template_name(summarize: Optional[bool] = False):
+        return "summary_template" if summarize else "human_like_response_template"
+
+    def get_llm_response(
+        self, user_question, result, summarize: Optional[bool] = False
+    ):
+        prompt = self.get_llm_prompt(
+            user_question=user_question, result=result, summarize=summarize
+        )
+        response = self.complete(
+            prompt, template_name=self.get_response_template_name(summarize)
+        )
         return str(response)
 
+    def get_rule_summary(self, result, mode=None):
+        """
+        Counts in SUMMARIES whether the rules or the LLM summarise the result.
+        Returns:
+            str: The rule based summary, None when the LLM should summarise the result.
+        """
+        string_response = self._result_summariser.summarise(result, mode=mode)
+        SUMMARIES.inc(
+            get_metrics_endpoint(), "rules" if string_response is not None else "llm"
+        )
+        return string_response
+
+    def get_result_summary(self, user_question, result, result_sample, mode=None):
+        """
+        Summarises a query result with the rule based summariser when the summary mode allows it,
+        otherwise with the LLM.
+        Args:
+            result (pandas.DataFrame): The raw query result.
+            result_sample: The sample of the result the LLM is prompted with.
+            mode (str): Overrides the summary mode of the current request.
+        """
+        with observe_stage("summary"):
+            string_response = self.get_rule_summary(result, mode)
+            if string_response is None:
+                string_response = self.get_llm_response(
+                    user_question=user_question, result=result_sample, summarize=True
+                )
+        return string_response
+
+    def stream_result_summary(self, user_question, result, result_sample):
+        """
+        Same as get_result_summary but yields the summary piece by piece as the LLM generates it.
+        """
+        string_response = self.get_rule_summary(result)
+        if string_response is not None:
+            yield string_response
+            return
+        yield from self.stream_llm_response(
+            user_question=user_question, result=result_sample, summarize=True
+        )
+
+    def stream_llm_response(
+        self, user_question, result, summarize: Optional[bool] = False
+    ):
+        """
+        Same as get_llm_response but yields the response text piece by piece as the LLM generates it.
+        """
+        prompt = self.get_llm_prompt(
+            user_question=user_question, result=result, summarize=summarize
+        )
+        for response in self.stream_complete(
+            prompt, template_name=self.get_response_template_name(summarize)
+        ):
+            if response.delta:
+                yield response.delta
+
+    def get_schema_strings(self, user_question, evidence=""):
+        """
+        Returns:
+            tuple: (schema_str, fk_str) for the SQL prompts, pruned to the tables and columns relevant
+                to the question when schema pruning is enabled.
+        """
+        if self._schema_retriever is None:
+            return self._schema_str, self._fk_str
+        with observe_stage("schema_retrieval"):
+            return self._schema_retriever.get_schema_strings(
+                f"{user_question} {evidence or ''}".strip()
+            )
+
     def get_sql_query(self, user_question, evidence=""):
-        prompt = self._prompt_templates["decomposer_template"].format(
-            schema_str=self._schema_str,
-            fk_str=self._fk_str,
+        schema_str, fk_str = self.get_schema_strings(user_question, evidence)
+        prompt = self.build_prompt(
+            "decomposer_template",
+            schema_str=schema_str,
+            fk_str=fk_str,
             query=user_question,
             evidence=evidence,
         )
-        response = self._query_engine.query(prompt)
+        with observe_stage("sql_generation"):
+            response = self.query(prompt, template_name="decomposer_template")
 
         # string splitted by the substring 'sql' and take the last element,
         # split again on extra back-ticks and take the substring, left of the ```
@@ -49,52 +308,128 @@ class BaseAPI:
 
         return sql_query
 
-    def get_sql_result(self, sql_query):
-        return self._database_utils_instance.run_sql_query(sql_query=sql_query)
+    def refine_sql_query(self, user_question, evidence, sql_query, result):
+        """
+        Asks the LLM to fix a SQL query given the sqlite_error dict it produced. Guardrail errors (time budget
+        exceeded, expensive query rejected by the preflight) explain in sqlite_error how to make the SQL cheaper.
+        """
+        schema_str, fk_str = self.get_schema_strings(user_question, evidence)
+        prompt = self.build_prompt(
+            "refiner_template",
+            query=user_question,
+            evidence=evidence,
+            schema_str=schema_str,
+            fk_str=fk_str,
+            sql=sql_query,
+            sqlite_error=result.get("sqlite_error"),
+            exception_class=result.get("exception_class"),
+        )
+        REFINER_RETRIES.inc(get_metrics_endpoint())
+        with observe_stage("sql_refinement"):
+            response = self.query(prompt, template_name="refiner_template")
+        return str(response.metadata["sql_query"]).split("sql")[-1].split(";")[0]
 
-    def get_user_question_response(self, user_question, evidence=""):
+    def get_sql_result(self, sql_query, keep="tail", n_rows=None):
+        """
+        Runs a query. Answers only keep a rolling buffer of the last rows of the result by default:
+        the rule based summariser only describes results of up to max_rows rows and the responses
+        show the last RESULT_SAMPLE_ROWS rows, so max_rows + 1 rows answer both.
+        """
+        if n_rows is None:
+            n_rows = max(self._result_summariser.max_rows + 1, RESULT_SAMPLE_ROWS)
+        with observe_stage("sql_execution"):
+            return self._database_utils_instance.run_sql_query(
+                sql_query=sql_query, keep=keep, n_rows=n_rows
+            )
+
+    def get_truncation_info(self, result, user_question, sql_query):
+        """
+        Returns:
+            dict: "truncated" and "total_rows" (None when unknown) when the fetch caps cut the result, else empty.
+        """
+        if not result.attrs.get("truncated"):
+            return {}
+        total_rows = result.attrs.get("total_rows")
+        self.logger_instance.info(
+            f"user_question: {user_question} - sql_query: {sql_query} - "
+            f"result truncated to {len(result)} of {total_rows or 'more'} rows"
+        )
+        return {"truncated": True, "total_rows": total_rows}
+
+    def get_sql_query_and_result(self, user_question, evidence=""):
+        """
+        Resolves the SQL for a question from the caches or the decomposer (with refiner retries) and runs it.
+        Returns:
+            tuple: (cache lookup, sql query, result DataFrame or sqlite_error dict)
+        """
         result = None
-        sql_query = self.get_sql_query(user_question=user_question, evidence=evidence)
-        for _ in range(self.max_tries):
+        lookup = self.get_cached_sql_query(
+            template_name="decomposer_template",
+            user_question=user_question,
+            evidence=evidence,
+        )
+        sql_query = lookup["sql_query"]
+        if lookup["source"] is not None:
             result = self.get_sql_result(sql_query=sql_query)
-            if result.__contains__("sqlite_error"):
-                sqlite_error = result.get("sqlite_error")
-                exception_class = result.get("exception_class")
+            if result.__contains__("sqlite_error") and result.get("refinable", True):
+                # cached sql does not run anymore, generate it again
+                self.invalidate_cached_sql_query(lookup)
 
-                prompt = self._prompt_templates["refiner_template"].format(
-                    query=user_question,
-                    evidence=evidence,
-                    schema_str=self._schema_str,
-                    fk_str=self._fk_str,
-                    sql=sql_query,
-                    sqlite_error=sqlite_error,
-                    exception_class=exception_class,
-                )
-                response = self._query_engine.query(prompt)
-                sql_query = (
-                    str(response.metadata["sql_query"]).split("sql")[-1].split(";")[0]
-                )
-            else:
-                break
+        if lookup["source"] is None:
+            sql_query = self.get_sql_query(
+                user_question=user_question, evidence=evidence
+            )
+            for _ in range(self.max_tries):
+                result = self.get_sql_result(sql_query=sql_query)
+                if result.__contains__("sqlite_error"):
+                    if not result.get("refinable", True):
+                        # e.g. the database is locked, nothing for the refiner to fix
+                        break
+                    sql_query = self.refine_sql_query(
+                        user_question=user_question,
+                        evidence=evidence,
+                        sql_query=sql_query,
+                        result=result,
+                    )
+                else:
+                    break
 
-        if result.__contains__("sqlite_error"):
-            log_msg = f"user_question: {user_question} - sql_query: {sql_query} - error: {result}"
-            self.logger_instance.error(log_msg)
-            return {
-                "result": [
-                    {"output_type": "string", "output_data": "Could not process query."}
-                ]
-            }
+        return lookup, sql_query, result
 
-        result = result.tail(10)  # works even if result had < 10 rows
-        result = self._database_utils_instance.format_numeric_columns(result)
-        result_dict = result.to_dict(orient="records")
-        result_sample = result.to_json(orient="split")
+    def get_error_response(self, user_question, sql_query, result, lookup):
+        QUERY_ERRORS.inc(get_metrics_endpoint())
+        log_msg = f"user_question: {user_question} - sql_query: {sql_query} - error: {result}"
+        self.logger_instance.error(log_msg)
+        return {
+            "result": [
+                {"output_type": "string", "output_data": "Could not process query."}
+            ],
+            "cache": self.get_cache_info(lookup),
+            "error": True,
+        }
 
-        string_response = self.get_llm_response(
-            user_question=user_question, result=result_sample, summarize=True
-        )
+    def prepare_result(self, result):
+        """
+        Keeps the last 10 rows of the result and formats its numbers.
+        Returns:
+            tuple: (records for the json output, json sample for the summary prompt)
+        """
+        with observe_stage("format_result"):
+            result = result.tail(RESULT_SAMPLE_ROWS)  # works even if result had < 10 rows
+            result = self._database_utils_instance.format_numeric_columns(result)
+            result_dict = result.to_dict(orient="records")
+            result_sample = result.to_json(orient="split")
+        return result_dict, result_sample
 
+    def get_final_response(
+        self,
+        user_question,
+        sql_query,
+        string_response,
+        result_dict,
+        lookup,
+        truncation_info=None,
+    ):
         final_response = {
             "result": [
                 {
@@ -102,7 +437,10 @@ class BaseAPI:
                     "output_data": string_response,
                 },
                 {"output_type": "json", "output_data": result_dict},
-            ]
+            ],
+            "cache": self.get_cache_info(lookup),
+            "tokens": get_request_token_usage(),
+            **(truncation_info or {}),
         }
 
         log_msg = f"user_question: {user_question} - sql_query: {sql_query} - response: {final_response}"
@@ -110,66 +448,162 @@ class BaseAPI:
 
         return final_response
 
+    def get_user_question_response(self, user_question, evidence=""):
+        lookup, sql_query, result = self.get_sql_query_and_result(
+            user_question=user_question, evidence=evidence
+        )
+        if result.__contains__("sqlite_error"):
+            return self.get_error_response(user_question, sql_query, result, lookup)
+
+        self.cache_sql_query(lookup, user_question, sql_query)
+        truncation_info = self.get_truncation_info(result, user_question, sql_query)
+        result_dict, result_sample = self.prepare_result(result)
+
+        string_response = self.get_result_summary(user_question, result, result_sample)
+
+        return self.get_final_response(
+            user_question,
+            sql_query,
+            string_response,
+            result_dict,
+            lookup,
+            truncation_info,
+        )
+
 
 class FastBaseAPI(BaseAPI):
     def __init__(self):
         super().__init__()
 
     def get_sql_query_fast(self, user_question, evidence=""):
-        prompt = self._prompt_templates["detail_template"].format(
-            schema_str=self._schema_str,
-            fk_str=self._fk_str,
+        schema_str, fk_str = self.get_schema_strings(user_question, evidence)
+        prompt = self.build_prompt(
+            "detail_template",
+            schema_str=schema_str,
+            fk_str=fk_str,
             query=user_question,
             evidence=evidence,
         )
         query_bundle = QueryBundle(prompt)
-        _, metadata = self._query_engine._sql_retriever.retrieve_with_metadata(
-            query_bundle
-        )
+        with observe_stage("sql_generation"):
+            _, metadata = self.retrieve_sql_with_metadata(
+                query_bundle, template_name="detail_template"
+            )
         sql_query = str(metadata["sql_query"]).split("sql")[-1].split(";")[0]
         print(sql_query)
 
         return sql_query
 
-    def get_user_question_response_fast(self, user_question, evidence=""):
-        sql_query = self.get_sql_query_fast(
+    def get_sql_query_and_result_fast(self, user_question, evidence=""):
+        """
+        Resolves the SQL for a question from the caches or a single detail_template generation and runs it.
+        Returns:
+            tuple: (cache lookup, sql query, result DataFrame or sqlite_error dict)
+        """
+        result = None
+        lookup = self.get_cached_sql_query(
+            template_name="detail_template",
             user_question=user_question,
             evidence=evidence,
         )
-        result = self.get_sql_result(sql_query=sql_query)
+        sql_query = lookup["sql_query"]
+        if lookup["source"] is not None:
+            result = self.get_sql_result(sql_query=sql_query)
+            if result.__contains__("sqlite_error") and result.get("refinable", True):
+                self.invalidate_cached_sql_query(lookup)
+
+        if lookup["source"] is None:
+            sql_query = self.get_sql_query_fast(
+                user_question=user_question,
+                evidence=evidence,
+            )
+            result = self.get_sql_result(sql_query=sql_query)
+
+        return lookup, sql_query, result
 
+    def get_user_question_response_fast(self, user_question, evidence=""):
+        lookup, sql_query, result = self.get_sql_query_and_result_fast(
+            user_question=user_question, evidence=evidence
+        )
         if result.__contains__("sqlite_error"):
-            log_msg = f"user_question: {user_question} - sql_query: {sql_query} - error: {result}"
-            self.logger_instance.error(log_msg)
-            return {
-                "result": [
-                    {"output_type": "string", "output_data": "Could not process query."}
-                ]
-            }
+            return self.get_error_response(user_question, sql_query, result, lookup)
 
-        result = result.tail(10)  # works even if result had < 10 rows
-        result = self._database_utils_instance.format_numeric_columns(result)
-        result_dict = result.to_dict(orient="records")
-        result_sample = result.to_json(orient="split")
+        self.cache_sql_query(lookup, user_question, sql_query)
+        truncation_info = self.get_truncation_info(result, user_question, sql_query)
+        result_dict, result_sample = self.prepare_result(result)
 
-        string_response = self.get_llm_response(
-            user_question=user_question, result=result_sample, summarize=True
+        string_response = self.get_result_summary(user_question, result, result_sample)
+
+        return self.get_final_response(
+            user_question,
+            sql_query,
+            string_response,
+            result_dict,
+            lookup,
+            truncation_info,
         )
 
-        final_response = {
-            "result": [
-                {
-                    "output_type": "string",
-                    "output_data": string_response,
-                },
-                {"output_type": "json", "output_data": result_dict},
-            ]
+    def stream_user_question_response(
+        self, user_question, evidence="", fast: Optional[bool] = False
+    ):
+        """
+        Streaming variant of get_user_question_response / get_user_question_response_fast.
+        Yields events as soon as they are available:
+            {"event": "sql", "data": {"sql_query": ...}}
+            {"event": "result", "data": {"output_type": "json", "output_data": [...]}}
+            {"event": "token", "data": {"text": ...}}  (one per generated piece of the summary)
+            {"event": "done", "data": <same payload as the non streaming endpoint>}
+        or a single {"event": "error", ...} when the query could not be processed.
+        """
+        if fast:
+            lookup, sql_query, result = self.get_sql_query_and_result_fast(
+                user_question=user_question, evidence=evidence
+            )
+        else:
+            lookup, sql_query, result = self.get_sql_query_and_result(
+                user_question=user_question, evidence=evidence
+            )
+        if result.__contains__("sqlite_error"):
+            yield {
+                "event": "error",
+                "data": self.get_error_response(
+                    user_question, sql_query, result, lookup
+                ),
+            }
+            return
+
+        self.cache_sql_query(lookup, user_question, sql_query)
+        truncation_info = self.get_truncation_info(result, user_question, sql_query)
+        result_dict, result_sample = self.prepare_result(result)
+        yield {"event": "sql", "data": {"sql_query": sql_query}}
+        yield {
+            "event": "result",
+            "data": {
+                "output_type": "json",
+                "output_data": result_dict,
+                **truncation_info,
+            },
         }
 
-        log_msg = f"user_question: {user_question} - sql_query: {sql_query} - response: {final_response}"
-        self.logger_instance.success(log_msg)
+        string_response = ""
+        # the time the client takes to read the tokens is not part of the summary stage
+        for text in observe_stage_items(
+            "summary", self.stream_result_summary(user_question, result, result_sample)
+        ):
+            string_response += text
+            yield {"event": "token", "data": {"text": text}}
 
-        return final_response
+        yield {
+            "event": "done",
+            "data": self.get_final_response(
+                user_question,
+                sql_query,
+                string_response,
+                result_dict,
+                lookup,
+                truncation_info,
+            ),
+        }
 
 
 class InsightsAPI(FastBaseAPI):
@@ -178,21 +612,37 @@ class InsightsAPI(FastBaseAPI):
         n_ques: Optional[int] = 3,
         automatic: Optional[bool] = False,
         fast: Optional[bool] = True,
+        pipelined: Optional[bool] = True,
     ):
         super().__init__()
         self.automatic = automatic
         self.n_ques = n_ques
         self.fast = fast
+        self.pipelined = pipelined
         if not self.automatic:
             self._template_questions = ConfigLoader().load_questions_config()
 
     def generate_insight_questions(self):
-        prompt = self._prompt_templates["insights_question_generation_template"].format(
-            n_ques=self.n_ques, schema_str=self._schema_str, fk_str=self._fk_str
+        prompt = self.build_prompt(
+            "insights_question_generation_template",
+            n_ques=self.n_ques,
+            schema_str=self._schema_str,
+            fk_str=self._fk_str,
         )
-        response = self._llm.complete(prompt)
+        with observe_stage("question_generation"):
+            response = self.complete(
+                prompt, template_name="insights_question_generation_template"
+            )
         return response
 
+    def get_insight_questions_key(self):
+        """
+        Identifies the set of insight questions without asking the LLM for them.
+        """
+        if self.automatic:
+            return f"automatic:{self.n_ques}"
+        return self._template_questions["questions_approaches"]
+
     def get_insight_questions(self):
         if self.automatic:
             response = self.generate_insight_questions()
@@ -204,49 +654,252 @@ class InsightsAPI(FastBaseAPI):
 
         return questions, approaches
 
-    def get_insights(self):
+    def format_insight(self, question, response):
+        result_items = response.get("result", [])
+        result = result_items[1].get("output_data") if len(result_items) > 1 else []
+        description = result_items[0].get("output_data") if result_items else ""
+        present_format = "tile" if len(result) == 1 else "table"
+
+        if len(result) > 0:
+            columns = list(result[0].keys())
+            column_names = [col.replace("_", " ").upper() for col in columns]
+            result_dict = (
+                result[0]
+                if len(result) == 1
+                else {
+                    "data": result,
+                    "columns": columns,
+                    "column_names": column_names,
+                }
+            )
+        else:
+            result_dict = {"data": [], "columns": [], "column_names": []}
+
+        insight_response = {
+            "question": question,
+            "result": result_dict,
+            "output_format": "json",
+            "present_format": present_format,
+            "description": description,
+        }
+        if response.get("error"):
+            insight_response["error"] = True
+        return insight_response
+
+    def get_insight(self, question, approach):
+        if self.fast:
+            response = self.get_user_question_response_fast(
+                user_question=question, evidence=approach
+            )
+        else:
+            response = self.get_user_question_response(
+                user_question=question, evidence=approach
+            )
+        return self.format_insight(question, response)
+
+    def get_insights(self, progress_callback=None):
+        """
+        Answers every insight question.
+        Args:
+            progress_callback (callable, optional): Called as progress_callback(index, question, status, insight)
+                with status "pending" for every question up front, then "running" and "completed" per question.
+        Returns:
+            dict: {"insights": [...]} in question order.
+        """
         response_list = []
         questions, approaches = self.get_insight_questions()
-        for question, approach in zip(questions.values(), approaches.values()):
-            if self.fast:
-                response = self.get_user_question_response_fast(
-                    user_question=question, evidence=approach
-                )
-            else:
-                response = self.get_user_question_response(
-                    user_question=question, evidence=approach
-                )
+        questions_approaches = list(zip(questions.values(), approaches.values()))
+        if progress_callback is not None:
+            for index, (question, _) in enumerate(questions_approaches):
+                progress_callback(index, question, "pending", None)
 
-            result = response.get("result", [])[1].get("output_data")
-            description = response.get("result", [])[0].get("output_data")
-            present_format = "tile" if len(result) == 1 else "table"
-
-            if len(result) > 0:
-                columns = list(result[0].keys())
-                column_names = [col.replace("_", " ").upper() for col in columns]
-                result_dict = (
-                    result[0]
-                    if len(result) == 1
-                    else {
-                        "data": result,
-                        "columns": columns,
-                        "column_names": column_names,
-                    }
-                )
-            else:
-                result_dict = {"data": [], "columns": [], "column_names": []}
+        if self.pipelined:
+            response_list = self.get_insights_pipelined(
+                questions_approaches, progress_callback
+            )
+            return {"insights": response_list}
 
-            insight_response = {
-                "question": question,
-                "result": result_dict,
-                "output_format": "json",
-                "present_format": present_format,
-                "description": description,
-            }
+        for index, (question, approach) in enumerate(questions_approaches):
+            if progress_callback is not None:
+                progress_callback(index, question, "running", None)
+            insight_response = self.get_insight(question, approach)
             response_list.append(insight_response)
+            if progress_callback is not None:
+                progress_callback(index, question, "completed", insight_response)
         response_dict = {"insights": response_list}
         return response_dict
 
+    def generate_insight_sql(self, item):
+        """
+        LLM stage: resolves the SQL of an insight question from the caches, or generates / refines it.
+        """
+        if item["result"] is not None:
+            item["sql_query"] = self.refine_sql_query(
+                user_question=item["question"],
+                evidence=item["approach"],
+                sql_query=item["sql_query"],
+                result=item["result"],
+            )
+            item["tries"] += 1
+            return
+
+        template_name = "detail_template" if self.fast else "decomposer_template"
+        if item["lookup"] is None:
+            item["lookup"] = self.get_cached_sql_query(
+                template_name=template_name,
+                user_question=item["question"],
+                evidence=item["approach"],
+            )
+            if item["lookup"]["source"] is not None:
+                item["sql_query"] = item["lookup"]["sql_query"]
+                return
+
+        if self.fast:
+            item["sql_query"] = self.get_sql_query_fast(
+                user_question=item["question"], evidence=item["approach"]
+            )
+        else:
+            item["sql_query"] = self.get_sql_query(
+                user_question=item["question"], evidence=item["approach"]
+            )
+
+    def execute_insight_sql(self, item):
+        """
+        SQLite stage: runs the SQL of an insight question and formats the result.
+        Returns:
+            bool: True when the result is ready to be summarised.
+        """
+        try:
+            item["result"] = self.get_sql_result(sql_query=item["sql_query"])
+        except Exception as er:
+            item["result"] = {
+                "sqlite_error": " ".join(str(arg) for arg in er.args),
+                "exception_class": str(er.__class__),
+            }
+        if item["result"].__contains__("sqlite_error"):
+            return False
+        self.cache_sql_query(item["lookup"], item["question"], item["sql_query"])
+        item["result_dict"], item["result_sample"] = self.prepare_result(
+            item["result"]
+        )
+        return True
+
+    def needs_sql_generation(self, item):
+        """
+        Decides what happens to an insight question whose SQL failed.
+        Returns:
+            bool: True when the LLM should generate or refine the SQL again, False when the question failed.
+        """
+        if not item["result"].get("refinable", True):
+            # e.g. the database is locked, the SQL is fine and neither cached nor generated SQL can do better
+            return False
+        if item["lookup"]["source"] is not None:
+            # cached sql does not run anymore, generate it again
+            self.invalidate_cached_sql_query(item["lookup"])
+            item["result"] = None
+            return True
+        if not self.fast and item["tries"] < self.max_tries - 1:
+            return True
+        return False
+
+    def summarise_insight(self, item):
+        """
+        LLM stage: summarises the formatted result of an insight question.
+        """
+        if item["result_dict"] is None:
+            response = self.get_error_response(
+                item["question"], item["sql_query"], item["result"], item["lookup"]
+            )
+        else:
+            string_response = self.get_result_summary(
+                item["question"], item["result"], item["result_sample"]
+            )
+            response = self.get_final_response(
+                item["question"],
+                item["sql_query"],
+                string_response,
+                item["result_dict"],
+                item["lookup"],
+            )
+        return self.format_insight(item["question"], response)
+
+    def get_insights_pipelined(self, questions_approaches, progress_callback=None):
+        """
+        Answers the insight questions in a staged pipeline: this thread owns every LLM call
+        (SQL generation, refinement and summaries) while a second thread runs the SQLite queries
+        and formats their results, so question N+1's SQL is generated while question N's SQL executes.
+        Whenever the database is idle the LLM generates the next SQL first, otherwise it summarises
+        the results that are ready.
+        """
+        items = [
+            {
+                "index": index,
+                "question": question,
+                "approach": approach,
+                "lookup": None,
+                "sql_query": None,
+                "tries": 0,
+                "result": None,
+                "result_dict": None,
+                "result_sample": None,
+            }
+            for index, (question, approach) in enumerate(questions_approaches)
+        ]
+        insights = [None] * len(items)
+        to_generate = deque(items)
+        to_summarise = deque()
+        executed = queue.Queue()
+        n_executing = 0
+        n_completed = 0
+
+        def execute(item):
+            executed.put((item, self.execute_insight_sql(item)))
+
+        def handle_executed(item, is_ready):
+            if is_ready or not self.needs_sql_generation(item):
+                to_summarise.append(item)
+            else:
+                # retries jump the queue, their question is already running
+                to_generate.appendleft(item)
+
+        with ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="insights-sql"
+        ) as executor:
+            while n_completed < len(items):
+                while True:
+                    try:
+                        item, is_ready = executed.get_nowait()
+                    except queue.Empty:
+                        break
+                    n_executing -= 1
+                    handle_executed(item, is_ready)
+
+                if to_generate and (n_executing == 0 or not to_summarise):
+                    item = to_generate.popleft()
+                    if progress_callback is not None and item["lookup"] is None:
+                        progress_callback(item["index"], item["question"], "running", None)
+                    self.generate_insight_sql(item)
+                    n_executing += 1
+                    # the sql thread records its stage metrics under this request's endpoint
+                    executor.submit(contextvars.copy_context().run, execute, item)
+                elif to_summarise:
+                    item = to_summarise.popleft()
+                    insights[item["index"]] = self.summarise_insight(item)
+                    n_completed += 1
+                    if progress_callback is not None:
+                        progress_callback(
+                            item["index"],
+                            item["question"],
+                            "completed",
+                            insights[item["index"]],
+                        )
+                else:
+                    item, is_ready = executed.get()
+                    n_executing -= 1
+                    handle_executed(item, is_ready)
+
+        return insights
+
 
 class NonLLMAPI(BaseAPI, FAISSIndex):
     def __init__(self):
@@ -254,13 +907,33 @@ class NonLLMAPI(BaseAPI, FAISSIndex):
         FAISSIndex.__init__(self)
 
     def get_user_question_response(self, user_question):
-        sql_query = self.match_question(user_question)
-        result = self.get_sql_result(sql_query)
+        with observe_stage("retrieval"):
+            sql_query = self.match_question(user_question)
+        if sql_query is None:
+            self.logger_instance.error(
+                f"user_question: {user_question} - error: no pre-defined sql query matched"
+            )
+            return {
+                "result": [
+                    {"output_type": "string", "output_data": "Could not process query."}
+                ]
+            }
+        result = self.get_sql_result(sql_query, keep="all")
+        if isinstance(result, dict):
+            # sqlite_error dict of a failed or refused query
+            QUERY_ERRORS.inc(get_metrics_endpoint())
+            self.logger_instance.error(
+                f"user_question: {user_question} - sql_query: {sql_query} - error: {result}"
+            )
+            return {
+                "result": [
+                    {"output_type": "string", "output_data": "Could not process query."}
+                ]
+            }
         result_dict = result.to_dict(orient="records")
-        result = result.head(10)  # works even if result had < 10 rows
 
-        response = self.get_llm_response(
-            user_question=user_question, result=result, summarize=True
+        response = self.get_result_summary(
+            user_question, result, result.head(RESULT_SAMPLE_ROWS)
         )
         final_response = {
             "result": [
@@ -269,7 +942,8 @@ class NonLLMAPI(BaseAPI, FAISSIndex):
                     "output_data": response,
                 },
                 {"output_type": "json", "output_data": result_dict},
-            ]
+            ],
+            **self.get_truncation_info(result, user_question, sql_query),
         }
         return final_response
 
@@ -295,14 +969,16 @@ class SummaryAPI(FastBaseAPI, NonLLMAPI):
         ]
 
     def get_summary_questions(self, keywords):
-        questions_generation_template = self._prompt_templates[
-            "summary_questions_generation_template"
-        ]
-        prompt = questions_generation_template.format(
-            schema_str=self._schema_str, keywords=keywords
+        prompt = self.build_prompt(
+            "summary_questions_generation_template",
+            schema_str=self._schema_str,
+            keywords=keywords,
         )
 
-        response = self._llm.complete(prompt)
+        with observe_stage("question_generation"):
+            response = self.complete(
+                prompt, template_name="summary_questions_generation_template"
+            )
         print(response.text)
         response = json.loads(response.text)
         return response
@@ -333,58 +1009,20 @@ class TemplateBasedQAAPI(BaseAPI):
     def __init__(self):
         super().__init__()
         config_loader = ConfigLoader()
-        self._database_utils_instance = DatabaseUtils()
         self._paths = config_loader.load_path_config()
-        template_sql_config_filepath = self._paths[
-            "pre_defined_qna_template_sql_queries_path"
-        ]
-        with open(template_sql_config_filepath, mode="rb") as file:
-            content = file.read()
-            qna_config = json.loads(content)
-            self.sql_query_templates_map = qna_config.get("sql_queries")
-            self.time_period_map = qna_config.get("time_period_map")
-            self.position_map = qna_config.get("position_map")
-            self.sales_type_map = qna_config.get("sales_type_map")
-            self.state_codes_map = qna_config.get("state_code_map")
-            self.time_frame_map = qna_config.get("time_frame_map")
+        self._template_sql_builder = TemplateSQLBuilder.from_file(
+            self._paths["pre_defined_qna_template_sql_queries_path"]
+        )
 
     def get_user_question_response(
         self, user_inputs: dict, question_num: int, fast: Optional[bool] = False
     ):
-        period = user_inputs.get("period", "")
-        position = user_inputs.get("position", "")
-        sales_type = user_inputs.get("sale_type", "")
-        product_name = user_inputs.get("sku", "")
-        time_frame = user_inputs.get("time_frame", "")
-        state_name = user_inputs.get("state", "")
-        start_date = user_inputs.get("from", "")
-        end_date = user_inputs.get("to", "")
-
-        if question_num == 1:
-            template = self.sql_query_templates_map["avg_sales_template_sql"]
-        elif question_num == 2:
-            template = self.sql_query_templates_map["total_sales_template_sql"]
-        elif question_num == 3:
-            template = self.sql_query_templates_map["growth_rate_template_sql"]
-        else:
-            template = self.sql_query_templates_map["top_products_template_sql"]
-
-        sql_query = template.format(
-            quantity_or_value=self.sales_type_map.get(sales_type, ""),
-            time_period=self.time_period_map.get(period, ""),
-            product_name=product_name,
-            state_code=self.state_codes_map.get(state_name, ""),
-            time_frame=self.time_period_map.get(
-                self.time_frame_map.get(time_frame, "")
-            ),
-            start_date=start_date,
-            end_date=end_date,
-            position=self.position_map.get(position, ""),
-        )
+        sql_query = self._template_sql_builder.build(user_inputs, question_num)
 
-        result = self._database_utils_instance.run_sql_query(sql_query=sql_query)
+        result = self.get_sql_result(sql_query=sql_query, keep="all")
 
         if result.__contains__("sqlite_error"):
+            QUERY_ERRORS.inc(get_metrics_endpoint())
             log_msg = f"user_question: {user_inputs} - sql_query: {sql_query} - error: {result}"
             self.logger_instance.error(log_msg)
             return {
@@ -394,14 +1032,12 @@ class TemplateBasedQAAPI(BaseAPI):
             }
 
         result_data = result.to_dict(orient="records")
-        result = result.head(10)
-        result_sample = result.to_json(orient="values")
-        result_text = (
-            f"Here are the results: \n{result.to_string(index=False)}"
-            if fast
-            else self.get_llm_response(
-                user_question="", result=result_sample, summarize=True
-            )
+        # the fast endpoint never waits for the LLM, complex results are rendered as a table
+        result_text = self.get_result_summary(
+            "",
+            result,
+            result.head(RESULT_SAMPLE_ROWS).to_json(orient="values"),
+            mode="rules" if fast else None,
         )
         final_response = {
             "result": [
@@ -410,6 +1046,7 @@ class TemplateBasedQAAPI(BaseAPI):
                     "output_data": result_text,
                 },
                 {"output_type": "json", "output_data": result_data},
-            ]
+            ],
+            **self.get_truncation_info(result, user_inputs, sql_query),
         }
         return final_response
@@ -1,20 +1,162 @@
 import json
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from src.service_context.create_service_context import ServiceContextCreator
 from api.api import InsightsAPI, SummaryAPI, TemplateBasedQAAPI
+from src.config.config_loader import ConfigLoader
+from src.jobs.insights_snapshot import InsightsSnapshotService
+from src.jobs.job_manager import JobManager, JobQueueFullError
+from src.utils.llm_loader import LLMLoader
+from src.utils.metrics import (
+    REQUEST_LATENCY,
+    metrics_endpoint,
+    render_metrics,
+    set_metrics_endpoint,
+)
+from src.utils.request_profiler import register_request_profiler
+from src.utils.resource_registry import ResourceRegistry
+from src.utils.result_summariser import set_summary_mode, summary_mode
+from src.utils.token_budget import (
+    PromptBudgetExceededError,
+    get_request_token_usage,
+    start_request_token_usage,
+)
+from src.utils.llm_scheduler import (
+    LLMQueueFullError,
+    LLMQueueTimeoutError,
+    LLMScheduler,
+    llm_priority,
+    set_request_priority,
+)
+import os
+import time
+import traceback
 
 app = Flask(__name__)
 ServiceContextCreator().set_service_context()
 _insights_api = InsightsAPI()
 _summary_api = SummaryAPI()
 _template_api = TemplateBasedQAAPI()
+_job_params = ConfigLoader().load_job_config()
+_job_manager = JobManager(
+    max_workers=_job_params.getint("max_workers"),
+    max_pending_jobs=_job_params.getint("max_pending_jobs"),
+    job_ttl_seconds=_job_params.getint("job_ttl_seconds"),
+)
+_insights_params = ConfigLoader().load_insights_config()
+_insights_snapshot_service = None
+if _insights_params.getboolean("snapshot_enabled"):
+    _insights_snapshot_service = InsightsSnapshotService(
+        insights_api=_insights_api,
+        database_utils=_insights_api._database_utils_instance,
+        snapshot_path=_insights_params["snapshot_path"],
+        poll_interval_seconds=_insights_params.getint("snapshot_poll_seconds"),
+        result_summary_mode=ConfigLoader().load_summary_config()["insights_mode"],
+    )
+    _insights_snapshot_service.start()
+_static_insights = {"mtime": None, "insights": None}
+_profiling_params = ConfigLoader().load_profiling_config()
+if _profiling_params.getboolean("enabled"):
+    register_request_profiler(app, _profiling_params)
+_endpoint_llm_priorities = {
+    "user_qna": "interactive",
+    "user_qna_fast": "interactive",
+    "user_qna_stream": "interactive",
+    "user_qna_fast_stream": "interactive",
+    "template_qna": "interactive",
+    "summary": "default",
+    "insights": "batch",
+}
+
+_summary_params = ConfigLoader().load_summary_config()
+_endpoint_summary_modes = {
+    "user_qna": _summary_params["qna_mode"],
+    "user_qna_stream": _summary_params["qna_mode"],
+    "user_qna_fast": _summary_params["fast_qna_mode"],
+    "user_qna_fast_stream": _summary_params["fast_qna_mode"],
+    "insights": _summary_params["insights_mode"],
+    "submit_insights_job": _summary_params["insights_mode"],
+    "summary": _summary_params["summary_mode"],
+    "template_qna": _summary_params["template_qna_mode"],
+    "fast_template_qna": _summary_params["fast_template_qna_mode"],
+}
+
+
+@app.before_request
+def set_llm_priority():
+    set_request_priority(_endpoint_llm_priorities.get(request.endpoint, "default"))
+
+
+@app.before_request
+def set_result_summary_mode():
+    set_summary_mode(
+        _endpoint_summary_modes.get(request.endpoint, _summary_params["default_mode"])
+    )
+
+
+@app.before_request
+def count_request_tokens():
+    start_request_token_usage()
+
+
+@app.before_request
+def start_request_metrics():
+    set_metrics_endpoint(request.endpoint)
+    g.request_start_time = time.perf_counter()
+
+
+@app.after_request
+def observe_request_latency(response):
+    # a streamed response is still being generated, its stages are timed individually
+    if not response.is_streamed and "request_start_time" in g:
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - g.request_start_time, request.endpoint or "none"
+        )
+    return response
+
+
+@app.after_request
+def add_token_usage_headers(response):
+    usage = get_request_token_usage()
+    if usage is not None and not response.is_streamed:
+        response.headers["X-Prompt-Tokens"] = str(usage["prompt_tokens"])
+        response.headers["X-Completion-Tokens"] = str(usage["completion_tokens"])
+    return response
+
+
+@app.errorhandler(PromptBudgetExceededError)
+def prompt_over_budget(er):
+    return (
+        jsonify(
+            {
+                "error": str(er),
+                "template_name": er.template_name,
+                "prompt_tokens": er.n_tokens,
+                "budget": er.budget,
+            }
+        ),
+        422,
+    )
+
+
+@app.errorhandler(LLMQueueFullError)
+@app.errorhandler(LLMQueueTimeoutError)
+def llm_queue_unavailable(er):
+    return (
+        jsonify({"error": str(er)}),
+        503,
+        {"Retry-After": str(er.retry_after)},
+    )
 
 
 @app.route("/api/static-insights")
 def static_insights():
-    with open("data/sample-insights.json", "r") as f:
-        insights = json.load(f)
-    return jsonify(insights)
+    static_insights_path = "data/sample-insights.json"
+    mtime = os.stat(static_insights_path).st_mtime_ns
+    if _static_insights["mtime"] != mtime:
+        with open(static_insights_path, "r") as f:
+            _static_insights["insights"] = json.load(f)
+        _static_insights["mtime"] = mtime
+    return jsonify(_static_insights["insights"])
 
 
 @app.route("/")
@@ -29,6 +171,45 @@ def home():
     return "Welcome!"
 
 
+@app.route("/api/llm-queue")
+def llm_queue_stats():
+    """
+    LLM Queue Endpoint
+
+    :return: JSON with the LLM admission queue depth, active calls and per priority wait statistics,
+        plus the LLM worker pool's load when it is enabled. The default LLM's queue is at the top level,
+        every loaded LLM (including the default one) is listed under "models".
+    """
+    stats = LLMScheduler().stats()
+    stats["models"] = LLMScheduler.all_stats()
+    worker_pool_stats = LLMLoader().get_worker_pool_stats()
+    stats["worker_pool"] = worker_pool_stats.get("default")
+    stats["worker_pools"] = worker_pool_stats
+    return jsonify(stats)
+
+
+@app.route("/metrics")
+def metrics():
+    """
+    Metrics Endpoint
+
+    :return: Prometheus text format metrics: request and per stage latency histograms per endpoint,
+        refiner retries, query errors, cache hits / misses and summaries by summariser.
+    """
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/api/token-usage")
+def token_usage_stats():
+    """
+    Token Usage Endpoint
+
+    :return: JSON with the prompt and completion tokens counted since startup, per prompt template
+        with its budget, how often its overflow policies were applied and how many prompts were rejected.
+    """
+    return jsonify(ResourceRegistry().prompt_budget.stats())
+
+
 @app.route("/api/qna", methods=["POST"])
 def user_qna():
     """
@@ -48,11 +229,101 @@ def insights():
     Insights Endpoint
 
     Retrieves a list of insights using the InsightsAPI.
+    Served from the precomputed insights snapshot when it is enabled, a stale snapshot is served while the
+    background refresh catches up with new data. Pass ?refresh=true to recompute it in a background job,
+    the current snapshot is returned with the job id (status 202).
+    Insights are never computed on the request thread: until the first snapshot exists the response is a 503.
 
     :return: JSON response with a list of insights.
     """
-    response_list = _insights_api.get_insights()
-    return response_list
+    if _insights_snapshot_service is None:
+        response_list = _insights_api.get_insights()
+        return response_list
+
+    force = request.args.get("refresh", "false").lower() in ("1", "true", "yes")
+    snapshot = _insights_snapshot_service.get_snapshot()
+    if snapshot is None:
+        # the startup refresh is still running, a forced refresh would only repeat it
+        error = "The insights snapshot is being computed, retry later."
+        return jsonify({"error": error}), 503, {"Retry-After": "30"}
+    response = {
+        "insights": snapshot["insights"],
+        "snapshot": {
+            "version": snapshot["version"],
+            "computed_at": snapshot["computed_at"],
+            "failed_questions": snapshot.get("failed_questions", 0),
+            "stale": not _insights_snapshot_service.is_current(),
+        },
+    }
+    if not force:
+        return response
+
+    def task(job):
+        with llm_priority("batch"), summary_mode(
+            _summary_params["insights_mode"]
+        ), metrics_endpoint("insights_snapshot"):
+            return _insights_snapshot_service.refresh(
+                force=True, progress_callback=job.update_progress
+            )
+
+    try:
+        job = _job_manager.submit(job_type="insights_snapshot", task=task)
+    except JobQueueFullError as er:
+        return jsonify({"error": str(er)}), 503, {"Retry-After": "30"}
+    response["job_id"] = job.job_id
+    return jsonify(response), 202
+
+
+@app.route("/api/insights/jobs", methods=["POST"])
+def submit_insights_job():
+    """
+    Insights Job Submit Endpoint
+
+    Starts insight generation in the background.
+
+    :return: JSON with the job id, 503 when too many jobs are pending.
+    """
+
+    def task(job):
+        with llm_priority("batch"), summary_mode(
+            _summary_params["insights_mode"]
+        ), metrics_endpoint("insights_job"):
+            return _insights_api.get_insights(progress_callback=job.update_progress)
+
+    try:
+        job = _job_manager.submit(job_type="insights", task=task)
+    except JobQueueFullError as er:
+        return jsonify({"error": str(er)}), 503, {"Retry-After": "30"}
+    return jsonify({"job_id": job.job_id, "status": job.status}), 202
+
+
+@app.route("/api/insights/jobs/<job_id>")
+def insights_job_status(job_id):
+    """
+    Insights Job Status Endpoint
+
+    :return: JSON with the job status and per question progress.
+    """
+    job = _job_manager.get_job(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job id {job_id}"}), 404
+    return jsonify(job.get_status())
+
+
+@app.route("/api/insights/jobs/<job_id>/result")
+def insights_job_result(job_id):
+    """
+    Insights Job Result Endpoint
+
+    :return: JSON with the insights; while the job is still running, the insights completed so far with status 202.
+    """
+    job = _job_manager.get_job(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job id {job_id}"}), 404
+    if job.status == "completed":
+        return jsonify(job.get_result())
+    response = {"status": job.status, "error": job.error, "insights": job.get_result()}
+    return jsonify(response), 500 if job.status == "failed" else 202
 
 
 @app.route("/api/fast-qna", methods=["POST"])
@@ -72,6 +343,67 @@ def user_qna_fast():
     return response
 
 
+def to_event_stream(events):
+    try:
+        for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+    except (LLMQueueFullError, LLMQueueTimeoutError) as er:
+        # headers are already sent, report the saturated queue in the stream
+        data = {"error": str(er), "retry_after": er.retry_after}
+        yield f"event: error\ndata: {json.dumps(data)}\n\n"
+    except PromptBudgetExceededError as er:
+        data = {"error": str(er), "prompt_tokens": er.n_tokens, "budget": er.budget}
+        yield f"event: error\ndata: {json.dumps(data)}\n\n"
+    except Exception as er:
+        # an unexpected failure would otherwise end the stream without telling the client
+        ResourceRegistry().logger.error(
+            f"stream failed - error: {er.__class__.__name__}: {er}\n{traceback.format_exc()}"
+        )
+        data = {"error": "Could not process query."}
+        yield f"event: error\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_response(events):
+    return Response(
+        stream_with_context(to_event_stream(events)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/qna/stream", methods=["POST"])
+def user_qna_stream():
+    """
+    Streaming User Q&A Endpoint
+
+    Server-sent events variant of /api/qna: sends the SQL and the result rows as soon as the query has run,
+    then the summary tokens as the LLM generates them.
+
+    :return: text/event-stream with sql, result, token and done (or error) events.
+    """
+    post_data = request.get_json()
+    user_question = post_data.get("user_question", "")
+    events = _insights_api.stream_user_question_response(user_question=user_question)
+    return stream_response(events)
+
+
+@app.route("/api/fast-qna/stream", methods=["POST"])
+def user_qna_fast_stream():
+    """
+    Streaming Fast User Q&A Endpoint
+
+    Server-sent events variant of /api/fast-qna.
+
+    :return: text/event-stream with sql, result, token and done (or error) events.
+    """
+    post_data = request.get_json()
+    user_question = post_data.get("user_question", "")
+    events = _insights_api.stream_user_question_response(
+        user_question=user_question, fast=True
+    )
+    return stream_response(events)
+
+
 # @app.route("/api/qna_template", methods=["POST"])
 # def user_qna_non_llm():
 #     post_data = request.get_json()
@@ -0,0 +1,234 @@
+# fakes.py
+"""
+Deterministic, network-free stand-ins for the models the app loads: the LLM (canned SQL, summaries and
+question lists after a configurable delay), the embedding model (hashed bag of words vectors)
+and the tokenizer (word / punctuation split).
+"""
+import json
+import re
+import time
+import zlib
+from typing import Any
+import numpy as np
+from llama_index.bridge.pydantic import Field
+from llama_index.llms import CustomLLM
+from llama_index.llms.base import llm_completion_callback
+from llama_index.llms.types import CompletionResponse, LLMMetadata
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# question keyword -> SQL over the synthetic sales table, the first match wins
+CANNED_SQL = [
+    (
+        ("state",),
+        "SELECT STATE, SUM(Gross_sale) AS total_gross_sale FROM sales GROUP BY STATE "
+        "ORDER BY total_gross_sale DESC LIMIT 5",
+    ),
+    (
+        ("average price", "price"),
+        "SELECT level3_desc, level5_desc, AVG(RRP) AS average_price FROM sales "
+        "GROUP BY level3_desc, level5_desc",
+    ),
+    (
+        ("distribution center", "dc"),
+        "SELECT DC, SUM(Gross_sale) AS total_gross_sale FROM sales GROUP BY DC "
+        "ORDER BY total_gross_sale DESC LIMIT 1",
+    ),
+    (
+        ("wireless phone",),
+        "SELECT billing_date_month, SUM(Gross_sale) AS gross_sales FROM sales "
+        "WHERE level3_desc = 'WIRELESS PHONE' AND Region = 'TG' "
+        "GROUP BY billing_date_month ORDER BY billing_date_month",
+    ),
+    (
+        ("gsm handsets ios",),
+        "SELECT billing_date_month, SUM(Gross_sale) AS gross_sales FROM sales "
+        "WHERE level5_desc = 'GSM HANDSETS IOS' AND Region = 'DEL' "
+        "GROUP BY billing_date_month ORDER BY billing_date_month",
+    ),
+    (
+        ("brand",),
+        "SELECT brand, SUM(Gross_sale) AS total_gross_sale FROM sales GROUP BY brand "
+        "ORDER BY total_gross_sale DESC",
+    ),
+    (
+        ("monthly", "month", "trend"),
+        "SELECT billing_date_month, SUM(Gross_sale) AS gross_sales FROM sales "
+        "GROUP BY billing_date_month ORDER BY billing_date_month",
+    ),
+    (
+        ("product", "sku", "items"),
+        "SELECT zposdesc, SUM(quantity) AS total_quantity FROM sales GROUP BY zposdesc "
+        "ORDER BY total_quantity DESC LIMIT 10",
+    ),
+]
+DEFAULT_SQL = "SELECT SUM(Gross_sale) AS total_gross_sale FROM sales"
+# references a column that does not exist, sends the question through the refiner
+BROKEN_SQL = "SELECT SUM(gross_sales_value) AS total_gross_sale FROM sales"
+
+INSIGHT_QUESTIONS = [
+    ("What are the top 5 states by total gross sales value?", "Sum Gross_sale grouped by STATE."),
+    ("What is the monthly gross sales trend?", "Sum Gross_sale grouped by billing_date_month."),
+    ("Which brand has the highest gross sales value?", "Sum Gross_sale grouped by brand."),
+    ("Which products sell the most units?", "Sum quantity grouped by zposdesc."),
+    ("Which distribution center has the highest gross sales value?", "Sum Gross_sale grouped by DC."),
+]
+
+
+def stable_hash(text):
+    return zlib.crc32(text.encode("utf-8"))
+
+
+class FakeTokenizer:
+    """
+    Stands in for the HF tokenizer that ServiceContextCreator installs as the global tokenizer.
+    """
+
+    @classmethod
+    def from_pretrained(cls, *args, **kwargs):
+        return cls()
+
+    def encode(self, text, **kwargs):
+        return [stable_hash(token) % 32000 for token in TOKEN_PATTERN.findall(text)]
+
+
+class FakeEmbeddingService:
+    """
+    Stands in for EmbeddingService: hashed bag of words embeddings, so texts sharing words are similar.
+    """
+
+    def __init__(self, dimension=384):
+        self.dimension = dimension
+        self.backend = "fake"
+        self.n_forward_passes = 0
+        self.n_texts = 0
+
+    def embed_text(self, text):
+        embedding = np.zeros(self.dimension, dtype="float32")
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            token_hash = stable_hash(token)
+            embedding[token_hash % self.dimension] += 1.0 if token_hash & 1 else -1.0
+        return embedding
+
+    def embed(self, texts, pooling="cls", normalize=True):
+        self.n_forward_passes += 1
+        self.n_texts += len(texts)
+        embeddings = np.stack(
+            [self.embed_text(text) for text in texts]
+        ) if texts else np.zeros((0, self.dimension), dtype="float32")
+        if normalize and len(texts):
+            embeddings /= np.maximum(
+                np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12
+            )
+        return embeddings
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            "forward_passes": self.n_forward_passes,
+            "texts": self.n_texts,
+        }
+
+
+class FakeLLM(CustomLLM):
+    """
+    Deterministic LLM: answers text-to-SQL prompts with canned SQL picked by keywords of the question,
+    question generation prompts with JSON question lists and every other prompt with a fixed summary.
+    Each call sleeps latency_ms plus ms_per_token for every generated token.
+    """
+
+    latency_ms: float = Field(default=200.0, description="Fixed time of every call.")
+    ms_per_token: float = Field(default=0.0, description="Time per generated token.")
+    summary_tokens: int = Field(default=40, description="Length of the summaries.")
+    sql_error_rate: float = Field(
+        default=0.0, description="Share of questions first answered with broken SQL."
+    )
+    context_window: int = Field(default=7000)
+    num_output: int = Field(default=2048)
+    n_calls: int = Field(default=0)
+
+    @classmethod
+    def class_name(cls):
+        return "FakeLLM"
+
+    @property
+    def metadata(self):
+        return LLMMetadata(
+            context_window=self.context_window,
+            num_output=self.num_output,
+            model_name="fake-llm",
+        )
+
+    @staticmethod
+    def get_question(prompt):
+        for pattern in (r"\[Question\]\s*\n(.*?)\n", r"\[Query\]\s*\n--\s*(.*?)\n"):
+            matches = re.findall(pattern, prompt)
+            if matches:
+                return matches[-1]
+        return prompt
+
+    def get_sql(self, prompt):
+        question = self.get_question(prompt)
+        is_refinement = "[SQLite error]" in prompt
+        if (
+            not is_refinement
+            and stable_hash(question) % 1000 < self.sql_error_rate * 1000
+        ):
+            return BROKEN_SQL
+        question = question.lower()
+        for keywords, sql_query in CANNED_SQL:
+            if any(keyword in question for keyword in keywords):
+                return sql_query
+        return DEFAULT_SQL
+
+    def respond(self, prompt):
+        if "SQLQuery:" in prompt:
+            # the query engine's text-to-SQL prompt
+            return f"SQLQuery: {self.get_sql(prompt)}\nSQLResult: "
+        if "derive basic insights" in prompt:
+            n_ques = int((re.findall(r"generate (\d+) questions", prompt) or [3])[0])
+            questions = [INSIGHT_QUESTIONS[i % len(INSIGHT_QUESTIONS)] for i in range(n_ques)]
+            return json.dumps(
+                {
+                    "response": {
+                        "questions": {f"q{i + 1}": q for i, (q, _) in enumerate(questions)},
+                        "approach": {f"q{i + 1}": a for i, (_, a) in enumerate(questions)},
+                    }
+                }
+            )
+        if "Question 1" in prompt:
+            return json.dumps(
+                {
+                    f"Question {i + 1}": question
+                    for i, (question, _) in enumerate(INSIGHT_QUESTIONS[:3])
+                }
+            )
+        return " ".join(["The results show a steady trend across the period."] * (
+            max(1, self.summary_tokens // 10)
+        ))
+
+    def wait(self, text):
+        n_tokens = len(TOKEN_PATTERN.findall(text))
+        time.sleep((self.latency_ms + self.ms_per_token * n_tokens) / 1000)
+
+    @llm_completion_callback()
+    def complete(self, prompt, formatted=False, **kwargs: Any):
+        self.n_calls += 1
+        text = self.respond(prompt)
+        self.wait(text)
+        return CompletionResponse(text=text)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt, formatted=False, **kwargs: Any):
+        self.n_calls += 1
+        text = self.respond(prompt)
+
+        def gen():
+            time.sleep(self.latency_ms / 1000)
+            response_text = ""
+            for token in re.findall(r"\S+\s*", text):
+                time.sleep(self.ms_per_token / 1000)
+                response_text += token
+                yield CompletionResponse(text=response_text, delta=token)
+
+        return gen()
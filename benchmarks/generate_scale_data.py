@@ -0,0 +1,127 @@
+# generate_scale_data.py
+"""
+Generates synthetic sales databases of several sizes (e.g. 1M, 10M and 100M rows) for scale testing.
+
+Every size goes into <data-dir>/rows_<n>/db/sales.db next to a config.ini that points the app at it
+(SLLM_CONFIG_FILE=<data-dir>/rows_<n>/config.ini python app.py). The data dictionary workbook, the pre-defined
+queries and the QnA templates are shared by all sizes, products.json lists the products most sold first.
+Time the template queries on the result with benchmarks/time_template_queries.py.
+
+Usage (from the repository root):
+    python -m benchmarks.generate_scale_data --rows 1M 10M 100M --data-dir data/scale
+"""
+import argparse
+import configparser
+import json
+import os
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+from benchmarks.synthetic_data import build_sales_database, write_data_files  # noqa: E402
+
+ROW_SUFFIXES = {"K": 1_000, "M": 1_000_000}
+
+
+def parse_rows(value):
+    """
+    Parses a row count such as 100000, 500K or 10M.
+    """
+    value = value.strip().upper().replace("_", "")
+    if value[-1:] in ROW_SUFFIXES:
+        return int(float(value[:-1]) * ROW_SUFFIXES[value[-1]])
+    return int(value)
+
+
+def get_size_directory(data_dir, n_rows):
+    return os.path.join(data_dir, f"rows_{n_rows}")
+
+
+def write_size_config(size_dir, database_directory, data_paths):
+    config = configparser.ConfigParser(interpolation=None)
+    config["paths"] = {
+        "database_directory": os.path.abspath(database_directory),
+        "index_storage_directory": os.path.abspath(os.path.join(size_dir, "storage")),
+        "schema_cache_directory": os.path.abspath(
+            os.path.join(size_dir, "storage", "schema_cache")
+        ),
+        **{key: os.path.abspath(value) for key, value in data_paths.items()},
+    }
+    config_file = os.path.join(size_dir, "config.ini")
+    with open(config_file, "w") as file:
+        config.write(file)
+    return config_file
+
+
+def print_progress(n_rows):
+    start_time = time.perf_counter()
+
+    def progress(n_written):
+        elapsed = time.perf_counter() - start_time
+        print(
+            f"\r  {n_written:,} / {n_rows:,} rows ({n_written / max(elapsed, 1e-9):,.0f} rows/s)",
+            end="",
+            file=sys.stderr,
+            flush=True,
+        )
+
+    return progress
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", nargs="+", type=parse_rows, default=[1_000_000, 10_000_000])
+    parser.add_argument("--data-dir", default="data/scale")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skus-per-brand", type=int, default=40, help="catalogue cardinality")
+    parser.add_argument("--chunk-rows", type=int, default=500_000)
+    parser.add_argument("--uniform", action="store_true", help="no popularity, state or seasonal skew")
+    parser.add_argument("--no-indexes", action="store_true", help="leave the sales table unindexed")
+    parser.add_argument("--overwrite", action="store_true", help="regenerate existing databases")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    data_paths = write_data_files(args.data_dir)
+
+    catalogue = None
+    for n_rows in sorted(args.rows):
+        size_dir = get_size_directory(args.data_dir, n_rows)
+        database_directory = os.path.join(size_dir, "db")
+        database_file = os.path.join(database_directory, "sales.db")
+        if os.path.exists(database_file) and not args.overwrite:
+            print(f"{database_file} exists, skipping (--overwrite regenerates it)")
+            continue
+        os.makedirs(database_directory, exist_ok=True)
+
+        print(f"generating {n_rows:,} rows into {database_file}")
+        start_time = time.perf_counter()
+        # the same seed gives every size the same catalogue and popularity ranking
+        catalogue = build_sales_database(
+            database_file,
+            n_rows=n_rows,
+            seed=args.seed,
+            chunk_rows=args.chunk_rows,
+            skus_per_brand=args.skus_per_brand,
+            skewed=not args.uniform,
+            create_indexes=not args.no_indexes,
+            progress=print_progress(n_rows),
+        )
+        print(
+            f"\n  done in {time.perf_counter() - start_time:,.1f}s, "
+            f"{os.path.getsize(database_file) / 1024**3:,.2f} GiB",
+            file=sys.stderr,
+        )
+        write_size_config(size_dir, database_directory, data_paths)
+
+    if catalogue is not None:
+        with open(os.path.join(args.data_dir, "products.json"), "w") as file:
+            json.dump(catalogue["zposdesc"].tolist(), file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
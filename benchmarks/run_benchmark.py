@@ -0,0 +1,334 @@
+# run_benchmark.py
+"""
+Offline load test of the app.py endpoints.
+
+Builds a synthetic sales database, points the app at it through an override config file, swaps the LLM,
+the embedding model and the tokenizer for deterministic fakes (no network, no GPU) and drives every endpoint
+through Flask's test client at the requested concurrency levels.
+Throughput, p50/p95/p99 latency and peak RSS per endpoint and concurrency level are written as JSON,
+pass --baseline with an earlier result file to print the change of every number.
+
+Usage (from the repository root):
+    python -m benchmarks.run_benchmark --concurrency 1 4 --requests 20 --output benchmark.json
+"""
+import argparse
+import configparser
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+from benchmarks.fakes import FakeEmbeddingService, FakeLLM, FakeTokenizer  # noqa: E402
+from benchmarks.synthetic_data import STATES, build_benchmark_data  # noqa: E402
+
+ENDPOINTS = ("qna", "fast-qna", "insights", "template-qna", "summary")
+QUESTIONS = [
+    "What are the top 5 states by total gross sales value?",
+    "What is the average price for each product family?",
+    "Which distribution center has the highest gross sales value?",
+    "What is the monthly gross sales trend?",
+    "Which brand has the highest gross sales value?",
+    "Which products sell the most units?",
+    "What is the total gross sales value?",
+]
+SUMMARY_INPUTS = ["brands", "monthly", "distributor", "show me the sales overview"]
+
+
+def get_rss_mb():
+    with open("/proc/self/statm") as file:
+        return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def get_peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RSSSampler:
+    """
+    Samples the process' resident set size while an endpoint is being driven.
+    """
+
+    def __init__(self, interval_seconds=0.05):
+        self.interval_seconds = interval_seconds
+        self.peak_rss_mb = 0.0
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while True:
+            self.peak_rss_mb = max(self.peak_rss_mb, get_rss_mb())
+            if self._stop_event.wait(self.interval_seconds):
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop_event.set()
+        self._thread.join()
+        self.peak_rss_mb = max(self.peak_rss_mb, get_rss_mb())
+
+
+def write_config_override(work_dir, data_paths, args):
+    storage_dir = os.path.join(work_dir, "storage")
+    settings = {
+        "paths": {
+            **{
+                key: value
+                for key, value in data_paths.items()
+                if key not in ("database_file", "product_names")
+            },
+            "index_storage_directory": storage_dir,
+            "schema_cache_directory": os.path.join(storage_dir, "schema_cache"),
+            "llm_state_directory": os.path.join(storage_dir, "llm_state"),
+            "faiss_index_directory": os.path.join(storage_dir, "faiss_index"),
+            "error_logfile_path": os.path.join(work_dir, "error_logs.log"),
+            "general_logfile_path": os.path.join(work_dir, "general_logs.log"),
+            "success_logfile_path": os.path.join(work_dir, "success_logs.log"),
+        },
+        "llm_params": {"prefix_cache_enabled": "False", "num_workers": "1"},
+        "cache_params": {
+            "sql_cache_enabled": str(not args.no_cache),
+            "semantic_cache_enabled": str(not args.no_cache),
+            "result_cache_enabled": str(not args.no_cache),
+            "sql_cache_path": os.path.join(storage_dir, "sql_cache.sqlite3"),
+            "semantic_cache_directory": os.path.join(storage_dir, "semantic_cache"),
+        },
+        # /api/insights computes the insights on every request instead of serving the snapshot
+        "insights_params": {
+            "snapshot_enabled": "False",
+            "snapshot_path": os.path.join(storage_dir, "insights_snapshot.json"),
+        },
+        "profiling_params": {"enabled": "False"},
+    }
+    if args.summary_mode:
+        # every endpoint summarises with the requested mode
+        settings["summary_params"] = {
+            key: args.summary_mode
+            for key in (
+                "default_mode",
+                "qna_mode",
+                "fast_qna_mode",
+                "insights_mode",
+                "summary_mode",
+                "template_qna_mode",
+                "fast_template_qna_mode",
+            )
+        }
+
+    # values are written verbatim, e.g. paths containing %
+    config = configparser.ConfigParser(interpolation=None)
+    for section, options in settings.items():
+        config[section] = options
+    config_file = os.path.join(work_dir, "benchmark_config.ini")
+    with open(config_file, "w") as file:
+        config.write(file)
+    return config_file
+
+
+def install_fakes(args):
+    """
+    Replaces the LLM, the embedding model and the tokenizer before app.py loads them.
+    """
+    from src.service_context import create_service_context, embedding_service
+    from src.utils.llm_loader import LLMLoader
+
+    embedding_service.EmbeddingService._instance = FakeEmbeddingService()
+    create_service_context.AutoTokenizer = FakeTokenizer
+    fake_llm = FakeLLM(
+        latency_ms=args.llm_latency_ms,
+        ms_per_token=args.llm_ms_per_token,
+        summary_tokens=args.summary_tokens,
+        sql_error_rate=args.sql_error_rate,
+    )
+    for model_name in LLMLoader.context_loader_instance.load_llm_models_config():
+        LLMLoader._llm_instances[model_name] = fake_llm
+    return fake_llm
+
+
+def get_request(endpoint, i, product_names):
+    """
+    Returns:
+        tuple: (HTTP method, path, JSON body) of the i-th request to the endpoint.
+    """
+    if endpoint in ("qna", "fast-qna"):
+        return "post", f"/api/{endpoint}", {"user_question": QUESTIONS[i % len(QUESTIONS)]}
+    if endpoint == "insights":
+        return "get", "/api/insights", None
+    if endpoint == "summary":
+        return "post", "/api/summary", {"user_question": SUMMARY_INPUTS[i % len(SUMMARY_INPUTS)]}
+    state_name, _, _ = STATES[i % len(STATES)]
+    return (
+        "post",
+        "/api/template-qna",
+        {
+            "Question_No": i % 4 + 1,
+            "Args": {
+                "period": "monthly",
+                "position": "top",
+                "sale_type": "value",
+                # the 10 most sold products, so the template queries find sales
+                "sku": product_names[i % min(10, len(product_names))],
+                "time_frame": "month",
+                "state": state_name,
+                "from": "2022-01-01",
+                "to": "2023-12-31",
+            },
+        },
+    )
+
+
+def run_endpoint(app, endpoint, concurrency, n_requests, product_names):
+    def send(i):
+        method, path, body = get_request(endpoint, i, product_names)
+        client = app.test_client()
+        start_time = time.perf_counter()
+        response = getattr(client, method)(path, json=body)
+        latency = time.perf_counter() - start_time
+        return latency, response.status_code
+
+    with RSSSampler() as rss_sampler:
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(send, range(n_requests)))
+        wall_seconds = time.perf_counter() - start_time
+
+    latencies_ms = np.array([latency for latency, _ in results]) * 1000
+    n_errors = sum(1 for _, status_code in results if status_code >= 400)
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "errors": n_errors,
+        "wall_seconds": round(wall_seconds, 4),
+        "throughput_rps": round(n_requests / wall_seconds, 4),
+        "latency_ms": {
+            "mean": round(float(latencies_ms.mean()), 3),
+            "p50": round(float(np.percentile(latencies_ms, 50)), 3),
+            "p95": round(float(np.percentile(latencies_ms, 95)), 3),
+            "p99": round(float(np.percentile(latencies_ms, 99)), 3),
+            "max": round(float(latencies_ms.max()), 3),
+        },
+        "peak_rss_mb": round(rss_sampler.peak_rss_mb, 1),
+    }
+
+
+def compare_with_baseline(results, baseline_file):
+    with open(baseline_file) as file:
+        baseline = json.load(file)
+    baseline_results = {
+        (result["endpoint"], result["concurrency"]): result
+        for result in baseline["results"]
+    }
+
+    def change(new, old):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    for result in results:
+        old = baseline_results.get((result["endpoint"], result["concurrency"]))
+        if old is None:
+            continue
+        print(
+            f"{result['endpoint']:>13} x{result['concurrency']:<3}"
+            f" throughput {change(result['throughput_rps'], old['throughput_rps'])}"
+            f" p50 {change(result['latency_ms']['p50'], old['latency_ms']['p50'])}"
+            f" p95 {change(result['latency_ms']['p95'], old['latency_ms']['p95'])}"
+            f" p99 {change(result['latency_ms']['p99'], old['latency_ms']['p99'])}"
+            f" peak rss {change(result['peak_rss_mb'], old['peak_rss_mb'])}"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4])
+    parser.add_argument("--requests", type=int, default=20, help="requests per endpoint and concurrency level")
+    parser.add_argument("--warmup", type=int, default=2, help="untimed requests per endpoint")
+    parser.add_argument("--rows", type=int, default=50_000, help="rows of the synthetic sales table")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-ms-per-token", type=float, default=0.0)
+    parser.add_argument("--summary-tokens", type=int, default=40)
+    parser.add_argument("--sql-error-rate", type=float, default=0.0, help="share of questions sent through the refiner")
+    parser.add_argument("--summary-mode", choices=("llm", "auto", "rules"), default=None)
+    parser.add_argument("--no-cache", action="store_true", help="disable the SQL, semantic and result caches")
+    parser.add_argument("--work-dir", default=None, help="defaults to a temporary directory")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=None, help="earlier result file to compare with")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="sllm-benchmark-")
+    os.makedirs(work_dir, exist_ok=True)
+
+    start_time = time.perf_counter()
+    data_paths = build_benchmark_data(
+        os.path.join(work_dir, "data"), n_rows=args.rows, seed=args.seed
+    )
+    data_seconds = time.perf_counter() - start_time
+
+    from src.config.config_creator import CONFIG_OVERRIDE_ENV_VAR
+
+    os.environ[CONFIG_OVERRIDE_ENV_VAR] = write_config_override(work_dir, data_paths, args)
+    fake_llm = install_fakes(args)
+
+    start_time = time.perf_counter()
+    from app import app
+
+    startup_seconds = time.perf_counter() - start_time
+    startup_rss_mb = get_rss_mb()
+
+    results = []
+    for endpoint in args.endpoints:
+        for i in range(args.warmup):
+            method, path, body = get_request(endpoint, i, data_paths["product_names"])
+            getattr(app.test_client(), method)(path, json=body)
+        for concurrency in args.concurrency:
+            result = run_endpoint(
+                app, endpoint, concurrency, args.requests, data_paths["product_names"]
+            )
+            results.append(result)
+            print(
+                f"{endpoint:>13} x{concurrency:<3} {result['throughput_rps']:8.2f} req/s"
+                f"  p50 {result['latency_ms']['p50']:9.1f} ms  p95 {result['latency_ms']['p95']:9.1f} ms"
+                f"  p99 {result['latency_ms']['p99']:9.1f} ms  errors {result['errors']}"
+            )
+
+    report = {
+        "settings": {key: value for key, value in vars(args).items() if key != "baseline"},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "data_generation_seconds": round(data_seconds, 3),
+        "startup_seconds": round(startup_seconds, 3),
+        "startup_rss_mb": round(startup_rss_mb, 1),
+        "peak_rss_mb": round(get_peak_rss_mb(), 1),
+        "llm_calls": fake_llm.n_calls,
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        compare_with_baseline(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+# synthetic_data.py
+"""
+Synthetic electronics sales data mirroring the schema the prompts and the QnA templates rely on: a SQLite
+database with a single `sales` table, its data dictionary workbook (the sheet DatabaseUtils reads the column
+descriptions from), the pre-defined SQL queries of NonLLMAPI and the SQL templates of TemplateBasedQAAPI.
+Everything is generated locally, chunk by chunk, so memory stays flat from thousands to 100M rows.
+
+Sales are skewed like real retail data: product popularity follows a Zipf law, a few states carry most of the
+volume, the festive season (October / November) sells the most and weekends outsell weekdays.
+"""
+import json
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+
+# (state, region code, share of the sales)
+STATES = [
+    ("Maharashtra", "MH", 0.19),
+    ("Delhi", "DEL", 0.14),
+    ("Karnataka", "KA", 0.13),
+    ("Tamil Nadu", "TN", 0.11),
+    ("Telangana", "TG", 0.09),
+    ("Gujarat", "GJ", 0.08),
+    ("Uttar Pradesh", "UP", 0.07),
+    ("West Bengal", "WB", 0.05),
+    ("Kerala", "KL", 0.04),
+    ("Rajasthan", "RJ", 0.03),
+    ("Punjab", "PB", 0.02),
+    ("Madhya Pradesh", "MP", 0.02),
+    ("Odisha", "OD", 0.01),
+    ("Assam", "AS", 0.01),
+    ("Bihar", "BR", 0.01),
+]
+# product family -> product brick -> (brand, base price in INR)
+PRODUCTS = {
+    "WIRELESS PHONE": {
+        "GSM HANDSETS IOS": [("Apple", 79900.0)],
+        "GSM HANDSETS ANDROID": [
+            ("Samsung", 24999.0),
+            ("Xiaomi", 13999.0),
+            ("OnePlus", 32999.0),
+            ("Vivo", 17999.0),
+            ("Oppo", 16999.0),
+        ],
+        "FEATURE PHONES": [("Nokia", 2499.0), ("Jio", 999.0)],
+    },
+    "TELEVISION": {
+        "LED TV": [("Samsung", 45999.0), ("LG", 42999.0), ("Sony", 64999.0)],
+        "SMART TV": [("Xiaomi", 27999.0), ("OnePlus", 34999.0), ("TCL", 22999.0)],
+    },
+    "COMPUTERS": {
+        "LAPTOPS": [("Dell", 58999.0), ("HP", 54999.0), ("Lenovo", 49999.0), ("Apple", 99900.0)],
+        "TABLETS": [("Apple", 44900.0), ("Samsung", 21999.0), ("Lenovo", 14999.0)],
+        "PRINTERS": [("HP", 12999.0), ("Canon", 9999.0), ("Epson", 14999.0)],
+    },
+    "AUDIO": {
+        "HEADPHONES": [("Sony", 7999.0), ("boAt", 1499.0), ("JBL", 4999.0)],
+        "SPEAKERS": [("JBL", 9999.0), ("boAt", 2499.0), ("Sony", 14999.0)],
+    },
+    "HOME APPLIANCES": {
+        "REFRIGERATORS": [("LG", 32999.0), ("Samsung", 29999.0), ("Whirlpool", 24999.0)],
+        "WASHING MACHINES": [("LG", 27999.0), ("Bosch", 34999.0), ("IFB", 29999.0)],
+        "AIR CONDITIONERS": [("Voltas", 36999.0), ("Daikin", 42999.0), ("LG", 39999.0)],
+    },
+    "ACCESSORIES": {
+        "CHARGERS": [("Apple", 1900.0), ("Samsung", 1299.0), ("Anker", 1499.0)],
+        "POWER BANKS": [("Mi", 1299.0), ("Anker", 2499.0)],
+        "MOBILE COVERS": [("Spigen", 999.0), ("Generic", 299.0)],
+    },
+}
+# sales share of every month, January first: festive season peak, monsoon dip
+MONTH_WEIGHTS = [0.8, 0.75, 0.85, 0.9, 1.0, 0.85, 0.8, 0.9, 1.05, 1.6, 1.5, 1.1]
+WEEKEND_UPLIFT = 1.35
+DISCOUNT_RATES = [0.0, 0.05, 0.1, 0.15]
+DISCOUNT_WEIGHTS = [0.55, 0.25, 0.15, 0.05]
+
+SKUS_PER_BRAND = 3
+DCS_PER_REGION = 3
+START_DATE = "2022-01-01"
+N_DAYS = 730
+ZIPF_EXPONENT = 1.1
+
+COLUMN_DESCRIPTIONS = {
+    "billing_date": "Date of the invoice (YYYY-MM-DD)",
+    "billing_date_month": "Month of the invoice (YYYY-MM)",
+    "STATE": "Name of the state the sale was billed in",
+    "Region": "Region code of the state, e.g. DEL for Delhi, TG for Telangana",
+    "DC": "Distribution center that shipped the order",
+    "level3_desc": "Product family, e.g. WIRELESS PHONE, TELEVISION",
+    "level5_desc": "Product brick, e.g. GSM HANDSETS IOS, LED TV",
+    "brand": "Brand of the product",
+    "article_code": "Article number of the product",
+    "zposdesc": "Name of the product (item)",
+    "quantity": "Number of units sold, unit: Units",
+    "RRP": "Recommended retail price of one unit, unit: INR",
+    "discount": "Discount given on the recommended retail price, unit: INR",
+    "Gross_sale": "Gross sales value of the invoice line (quantity x RRP - discount), unit: INR",
+}
+INDEXED_COLUMNS = ("billing_date", "billing_date_month", "Region", "zposdesc")
+
+
+def get_catalogue(skus_per_brand=SKUS_PER_BRAND):
+    """
+    Returns:
+        pandas.DataFrame: One row per product with its family, brick, brand, article code, name and RRP.
+    """
+    rows = []
+    for family, bricks in PRODUCTS.items():
+        for brick, brands in bricks.items():
+            for brand, base_price in brands:
+                for i in range(skus_per_brand):
+                    rows.append(
+                        {
+                            "level3_desc": family,
+                            "level5_desc": brick,
+                            "brand": brand,
+                            "article_code": f"{490000000 + len(rows)}",
+                            "zposdesc": f"{brand} {brick.title()} {i + 1}",
+                            # newer models of a line cost more
+                            "RRP": round(base_price * (1 + 0.15 * (i % 8)), 2),
+                        }
+                    )
+    return pd.DataFrame(rows)
+
+
+def get_sku_weights(rng, n_skus, zipf_exponent=ZIPF_EXPONENT):
+    """
+    Returns:
+        numpy.ndarray: Sampling probability of every catalogue row, Zipf distributed over a random ranking.
+    """
+    ranks = rng.permutation(n_skus) + 1
+    weights = 1.0 / ranks**zipf_exponent
+    return weights / weights.sum()
+
+
+def get_state_weights():
+    weights = np.array([share for _, _, share in STATES])
+    return weights / weights.sum()
+
+
+def get_day_weights():
+    """
+    Returns:
+        numpy.ndarray: Sampling probability of every day from START_DATE on, with seasonality and weekends.
+    """
+    days = np.datetime64(START_DATE) + np.arange(N_DAYS).astype("timedelta64[D]")
+    months = days.astype("datetime64[M]").astype(int) % 12
+    # 1970-01-01 was a Thursday
+    weekdays = (days.astype(int) + 3) % 7
+    weights = np.array(MONTH_WEIGHTS)[months] * np.where(weekdays >= 5, WEEKEND_UPLIFT, 1.0)
+    return weights / weights.sum()
+
+
+def generate_sales_chunk(
+    rng, n_rows, catalogue, sku_weights=None, state_weights=None, day_weights=None
+):
+    """
+    Generates n_rows invoice lines with NumPy, vectorised.
+    Args:
+        sku_weights (numpy.ndarray): Sampling probability of every catalogue row, uniform when None.
+        state_weights (numpy.ndarray): Sampling probability of every state, uniform when None.
+        day_weights (numpy.ndarray): Sampling probability of every day, uniform when None.
+    Returns:
+        pandas.DataFrame: The invoice lines, in the column order of the sales table.
+    """
+    sku_index = rng.choice(len(catalogue), size=n_rows, p=sku_weights)
+    state_index = rng.choice(len(STATES), size=n_rows, p=state_weights)
+    day_offsets = rng.choice(N_DAYS, size=n_rows, p=day_weights)
+    billing_dates = np.datetime64(START_DATE) + day_offsets.astype("timedelta64[D]")
+
+    state_names = np.array([name for name, _, _ in STATES], dtype=object)
+    region_codes = np.array([code for _, code, _ in STATES], dtype=object)
+    dc_names = np.array(
+        [
+            f"DC-{code}-{number}"
+            for _, code, _ in STATES
+            for number in range(1, DCS_PER_REGION + 1)
+        ],
+        dtype=object,
+    )
+    dc_index = state_index * DCS_PER_REGION + rng.integers(0, DCS_PER_REGION, size=n_rows)
+    # most invoice lines are a single unit
+    quantity = rng.geometric(0.7, size=n_rows)
+    rrp = catalogue["RRP"].to_numpy()[sku_index]
+    discount_rate = rng.choice(DISCOUNT_RATES, size=n_rows, p=DISCOUNT_WEIGHTS)
+    discount = np.round(quantity * rrp * discount_rate, 2)
+
+    return pd.DataFrame(
+        {
+            "billing_date": np.datetime_as_string(billing_dates, unit="D"),
+            "billing_date_month": np.datetime_as_string(billing_dates, unit="M"),
+            "STATE": state_names[state_index],
+            "Region": region_codes[state_index],
+            "DC": dc_names[dc_index],
+            "level3_desc": catalogue["level3_desc"].to_numpy()[sku_index],
+            "level5_desc": catalogue["level5_desc"].to_numpy()[sku_index],
+            "brand": catalogue["brand"].to_numpy()[sku_index],
+            "article_code": catalogue["article_code"].to_numpy()[sku_index],
+            "zposdesc": catalogue["zposdesc"].to_numpy()[sku_index],
+            "quantity": quantity,
+            "RRP": rrp,
+            "discount": discount,
+            "Gross_sale": np.round(quantity * rrp - discount, 2),
+        }
+    )
+
+
+def create_sales_table(conn):
+    conn.execute("DROP TABLE IF EXISTS sales")
+    conn.execute(
+        """CREATE TABLE sales (
+    billing_date TEXT,
+    billing_date_month TEXT,
+    STATE TEXT,
+    Region TEXT,
+    DC TEXT,
+    level3_desc TEXT,
+    level5_desc TEXT,
+    brand TEXT,
+    article_code TEXT,
+    zposdesc TEXT,
+    quantity INTEGER,
+    RRP REAL,
+    discount REAL,
+    Gross_sale REAL
+)"""
+    )
+
+
+def create_sales_indexes(conn):
+    for column_name in INDEXED_COLUMNS:
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_sales_{column_name.lower()} ON sales({column_name})"
+        )
+
+
+def build_sales_database(
+    database_file,
+    n_rows,
+    seed=0,
+    chunk_rows=500_000,
+    skus_per_brand=SKUS_PER_BRAND,
+    skewed=True,
+    create_indexes=True,
+    progress=None,
+):
+    """
+    Writes n_rows invoice lines into a new SQLite database, chunk_rows at a time.
+    Args:
+        skewed (bool): Zipf product popularity, state shares and seasonality, uniform sampling otherwise.
+        progress (callable): Called with the number of rows written after every chunk.
+    Returns:
+        pandas.DataFrame: The product catalogue, ordered by popularity (most sold first).
+    """
+    rng = np.random.default_rng(seed)
+    catalogue = get_catalogue(skus_per_brand)
+    sku_weights = get_sku_weights(rng, len(catalogue)) if skewed else None
+    state_weights = get_state_weights() if skewed else None
+    day_weights = get_day_weights() if skewed else None
+
+    if os.path.exists(database_file):
+        os.remove(database_file)
+    conn = sqlite3.connect(database_file)
+    try:
+        # bulk load: nothing to recover if the process dies half way
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        create_sales_table(conn)
+        for start in range(0, n_rows, chunk_rows):
+            chunk = generate_sales_chunk(
+                rng,
+                min(chunk_rows, n_rows - start),
+                catalogue,
+                sku_weights=sku_weights,
+                state_weights=state_weights,
+                day_weights=day_weights,
+            )
+            conn.executemany(
+                f"INSERT INTO sales VALUES ({', '.join('?' * len(chunk.columns))})",
+                chunk.itertuples(index=False, name=None),
+            )
+            conn.commit()
+            if progress is not None:
+                progress(start + len(chunk))
+        if create_indexes:
+            create_sales_indexes(conn)
+        conn.execute("ANALYZE")
+        conn.commit()
+        conn.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        conn.close()
+
+    if sku_weights is not None:
+        catalogue = catalogue.iloc[np.argsort(-sku_weights)].reset_index(drop=True)
+    return catalogue
+
+
+def write_data_dictionary(file_path):
+    data_dictionary = pd.DataFrame(
+        {
+            "COLUMN NAME": list(COLUMN_DESCRIPTIONS),
+            "COLUMN DESCRIPTION": list(COLUMN_DESCRIPTIONS.values()),
+        }
+    )
+    with pd.ExcelWriter(file_path) as writer:
+        data_dictionary.to_excel(writer, sheet_name="Columns description", index=False)
+
+
+def get_pre_defined_sql_queries():
+    return [
+        {"query": "SELECT STATE, SUM(Gross_sale) AS total_gross_sale FROM sales GROUP BY STATE ORDER BY total_gross_sale DESC"},
+        {"query": "SELECT brand, SUM(Gross_sale) AS total_gross_sale FROM sales GROUP BY brand ORDER BY total_gross_sale DESC"},
+        {"query": "SELECT DC, SUM(Gross_sale) AS total_gross_sale FROM sales GROUP BY DC ORDER BY total_gross_sale DESC"},
+        {"query": "SELECT level3_desc, SUM(Gross_sale) AS total_gross_sale FROM sales GROUP BY level3_desc ORDER BY total_gross_sale DESC"},
+        {"query": "SELECT zposdesc, SUM(quantity) AS total_quantity FROM sales GROUP BY zposdesc ORDER BY total_quantity DESC LIMIT 10"},
+        {"query": "SELECT billing_date_month, SUM(Gross_sale) AS gross_sales FROM sales GROUP BY billing_date_month ORDER BY billing_date_month"},
+        {"query": "SELECT strftime('%Y', billing_date) AS year, SUM(Gross_sale) AS gross_sales FROM sales GROUP BY year ORDER BY year"},
+        {"query": "SELECT level5_desc, AVG(RRP) AS average_price FROM sales GROUP BY level5_desc ORDER BY average_price DESC"},
+    ]
+
+
+def get_qna_template_sql_queries():
+    period_filter = (
+        "zposdesc = '{product_name}' AND Region = '{state_code}' "
+        "AND billing_date BETWEEN '{start_date}' AND '{end_date}'"
+    )
+    return {
+        "sql_queries": {
+            "avg_sales_template_sql": (
+                "SELECT {time_period} AS period, AVG({quantity_or_value}) AS average_sales FROM sales "
+                f"WHERE {period_filter} GROUP BY period ORDER BY period"
+            ),
+            "total_sales_template_sql": (
+                "SELECT {time_period} AS period, SUM({quantity_or_value}) AS total_sales FROM sales "
+                f"WHERE {period_filter} GROUP BY period ORDER BY period"
+            ),
+            "growth_rate_template_sql": (
+                "SELECT period, total_sales, ROUND((total_sales - LAG(total_sales) OVER (ORDER BY period)) * 100.0 "
+                "/ LAG(total_sales) OVER (ORDER BY period), 2) AS growth_rate FROM ("
+                "SELECT {time_period} AS period, SUM({quantity_or_value}) AS total_sales FROM sales "
+                f"WHERE {period_filter} GROUP BY period) ORDER BY period"
+            ),
+            "top_products_template_sql": (
+                "SELECT zposdesc, SUM({quantity_or_value}) AS total_sales FROM sales "
+                "WHERE Region = '{state_code}' AND {time_frame} = (SELECT MAX({time_frame}) FROM sales) "
+                "GROUP BY zposdesc ORDER BY total_sales {position} LIMIT 5"
+            ),
+        },
+        "time_period_map": {
+            "daily": "billing_date",
+            "monthly": "billing_date_month",
+            "yearly": "strftime('%Y', billing_date)",
+        },
+        "position_map": {"top": "DESC", "bottom": "ASC"},
+        "sales_type_map": {"quantity": "quantity", "value": "Gross_sale"},
+        "state_code_map": {name: code for name, code, _ in STATES},
+        "time_frame_map": {"day": "daily", "month": "monthly", "year": "yearly"},
+    }
+
+
+def write_data_files(data_dir):
+    """
+    Writes the data dictionary, the pre-defined queries and the QnA templates into data_dir.
+    Returns:
+        dict: Their paths, keyed like the [paths] config settings they go into.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    paths = {
+        "column_descriptions_file_path": os.path.join(data_dir, "data dictionary.xlsx"),
+        "pre_defined_sql_queries_path": os.path.join(
+            data_dir, "pre_defined_sql_queries.json"
+        ),
+        "pre_defined_qna_template_sql_queries_path": os.path.join(
+            data_dir, "qna_template_sql_queries.json"
+        ),
+    }
+    write_data_dictionary(paths["column_descriptions_file_path"])
+    with open(paths["pre_defined_sql_queries_path"], "w") as file:
+        json.dump(get_pre_defined_sql_queries(), file, indent=2)
+    with open(paths["pre_defined_qna_template_sql_queries_path"], "w") as file:
+        json.dump(get_qna_template_sql_queries(), file, indent=2)
+    return paths
+
+
+def build_benchmark_data(data_dir, n_rows=50_000, seed=0, **kwargs):
+    """
+    Writes the synthetic database and the data files the app reads into data_dir.
+    Returns:
+        dict: Paths of the generated files, keyed like the [paths] config settings they go into,
+            plus "database_file" and "product_names" (most sold first).
+    """
+    # DatabaseUtils opens the first *.db file of the directory
+    database_directory = os.path.join(data_dir, "db")
+    os.makedirs(database_directory, exist_ok=True)
+    database_file = os.path.join(database_directory, "sales.db")
+    catalogue = build_sales_database(database_file, n_rows=n_rows, seed=seed, **kwargs)
+    return {
+        "database_file": database_file,
+        "database_directory": database_directory,
+        "product_names": catalogue["zposdesc"].tolist(),
+        **write_data_files(data_dir),
+    }
@@ -0,0 +1,179 @@
+# time_template_queries.py
+"""
+Times every template query of TemplateBasedQAAPI against each database generated by generate_scale_data.py,
+to show how query latency grows with the data size.
+
+The SQL is built by the same TemplateSQLBuilder the API uses, for every time period, time frame and for both a
+best selling and a long tail product. Each query runs once cold and then --repeats times warm on a read-only
+connection, its query plan is recorded and the growth of its latency with the row count is fitted as
+latency ~ rows^exponent (about 1 for a full scan, about 0 for an index lookup of a fixed size result).
+
+Usage (from the repository root):
+    python -m benchmarks.time_template_queries --data-dir data/scale --output template_queries.json
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import statistics
+import sys
+import time
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+from src.utils.template_sql import QUESTION_TEMPLATES, TemplateSQLBuilder  # noqa: E402
+
+
+def get_cases(template_sql_builder, product_names, state, start_date, end_date):
+    """
+    Returns:
+        list: (case name, question number, user inputs) for every template question variant.
+    """
+    products = {"top_product": product_names[0], "tail_product": product_names[-1]}
+    cases = []
+    for question_num, template_name in QUESTION_TEMPLATES.items():
+        if template_name == "top_products_template_sql":
+            for time_frame in template_sql_builder.time_frame_map:
+                user_inputs = {
+                    "position": "top",
+                    "sale_type": "value",
+                    "time_frame": time_frame,
+                    "state": state,
+                }
+                cases.append((f"{template_name}/{time_frame}", question_num, user_inputs))
+            continue
+        for period in template_sql_builder.time_period_map:
+            for product_label, product_name in products.items():
+                user_inputs = {
+                    "period": period,
+                    "sale_type": "value",
+                    "sku": product_name,
+                    "state": state,
+                    "from": start_date,
+                    "to": end_date,
+                }
+                cases.append(
+                    (f"{template_name}/{period}/{product_label}", question_num, user_inputs)
+                )
+    return cases
+
+
+def get_query_plan(conn, sql_query):
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql_query}")]
+
+
+def time_query(conn, sql_query, repeats):
+    """
+    Returns:
+        dict: Cold and warm latencies in milliseconds and the number of result rows.
+    """
+    latencies = []
+    for _ in range(repeats + 1):
+        start_time = time.perf_counter()
+        n_result_rows = len(conn.execute(sql_query).fetchall())
+        latencies.append((time.perf_counter() - start_time) * 1000)
+    warm_latencies = latencies[1:] or latencies
+    return {
+        "cold_ms": round(latencies[0], 3),
+        "median_ms": round(statistics.median(warm_latencies), 3),
+        "min_ms": round(min(warm_latencies), 3),
+        "result_rows": n_result_rows,
+    }
+
+
+def get_databases(data_dir):
+    """
+    Returns:
+        list: (row count, database file) of every generated size, smallest first.
+    """
+    databases = []
+    for database_file in glob.glob(os.path.join(data_dir, "rows_*", "db", "*.db")):
+        match = re.search(r"rows_(\d+)", database_file)
+        databases.append((int(match.group(1)), database_file))
+    return sorted(databases)
+
+
+def fit_growth_exponent(row_counts, latencies_ms):
+    if len(row_counts) < 2:
+        return None
+    slope, _ = np.polyfit(np.log(row_counts), np.log(np.maximum(latencies_ms, 1e-3)), 1)
+    return round(float(slope), 3)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--data-dir", default="data/scale")
+    parser.add_argument("--repeats", type=int, default=3, help="warm runs per query")
+    parser.add_argument("--state", default="Delhi")
+    parser.add_argument("--from", dest="start_date", default="2022-01-01")
+    parser.add_argument("--to", dest="end_date", default="2023-12-31")
+    parser.add_argument("--output", default="template_query_timings.json")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    template_sql_builder = TemplateSQLBuilder.from_file(
+        os.path.join(args.data_dir, "qna_template_sql_queries.json")
+    )
+    with open(os.path.join(args.data_dir, "products.json")) as file:
+        product_names = json.load(file)
+    databases = get_databases(args.data_dir)
+    if not databases:
+        raise FileNotFoundError(f"No rows_<n>/db/*.db databases in {args.data_dir}")
+
+    cases = get_cases(
+        template_sql_builder, product_names, args.state, args.start_date, args.end_date
+    )
+    results = {case_name: {"timings": []} for case_name, _, _ in cases}
+    for n_rows, database_file in databases:
+        print(f"{n_rows:,} rows: {database_file}")
+        conn = sqlite3.connect(f"file:{database_file}?mode=ro", uri=True)
+        try:
+            for case_name, question_num, user_inputs in cases:
+                sql_query = template_sql_builder.build(user_inputs, question_num)
+                results[case_name]["sql_query"] = sql_query
+                timing = {
+                    "rows": n_rows,
+                    **time_query(conn, sql_query, args.repeats),
+                    "query_plan": get_query_plan(conn, sql_query),
+                }
+                results[case_name]["timings"].append(timing)
+                print(
+                    f"  {case_name:<55} cold {timing['cold_ms']:10.1f} ms"
+                    f"  median {timing['median_ms']:10.1f} ms  {timing['result_rows']} rows"
+                )
+        finally:
+            conn.close()
+
+    row_counts = [n_rows for n_rows, _ in databases]
+    print(f"\n{'query':<55} " + " ".join(f"{n_rows:>12,}" for n_rows in row_counts) + "  exponent")
+    for case_name, result in results.items():
+        latencies_ms = [timing["median_ms"] for timing in result["timings"]]
+        result["growth_exponent"] = fit_growth_exponent(row_counts, latencies_ms)
+        print(
+            f"{case_name:<55} "
+            + " ".join(f"{latency:>9.1f} ms" for latency in latencies_ms)
+            + f"  {result['growth_exponent']}"
+        )
+
+    with open(args.output, "w") as file:
+        json.dump(
+            {
+                "settings": vars(args),
+                "sizes": row_counts,
+                "cases": results,
+            },
+            file,
+            indent=2,
+        )
+    print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
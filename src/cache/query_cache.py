@@ -0,0 +1,102 @@
+# query_cache.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class SQLQueryCache:
+    """
+    Bounded LRU cache of natural language question -> SQL query that executed without a sqlite_error.
+    Optionally persisted to a local SQLite file so the cache survives restarts.
+    """
+
+    def __init__(self, max_entries: int = 1024, persist_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if persist_path:
+            self._open_persistent_store(persist_path)
+
+    def _open_persistent_store(self, persist_path):
+        persist_dir = os.path.dirname(persist_path)
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+        self._conn = sqlite3.connect(persist_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sql_cache "
+            "(cache_key TEXT PRIMARY KEY, sql_query TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        rows = self._conn.execute(
+            "SELECT cache_key, sql_query FROM sql_cache ORDER BY created_at DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        for cache_key, sql_query in reversed(rows):
+            self._entries[cache_key] = sql_query
+
+    @staticmethod
+    def normalise_question(question):
+        question = question.strip().lower()
+        question = re.sub(r"\s+", " ", question)
+        return question.rstrip("?.! ")
+
+    def make_key(self, question, evidence, template_name, schema_fingerprint):
+        key_str = "\x1f".join(
+            [
+                self.normalise_question(question),
+                (evidence or "").strip(),
+                template_name,
+                schema_fingerprint,
+            ]
+        )
+        return hashlib.sha256(key_str.encode("utf-8")).hexdigest()
+
+    def get(self, cache_key):
+        with self._lock:
+            sql_query = self._entries.get(cache_key)
+            if sql_query is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return sql_query
+
+    def put(self, cache_key, sql_query):
+        with self._lock:
+            self._entries[cache_key] = sql_query
+            self._entries.move_to_end(cache_key)
+            evicted_keys = []
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                evicted_keys.append(evicted_key)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sql_cache (cache_key, sql_query, created_at) VALUES (?, ?, ?)",
+                    (cache_key, sql_query, time.time()),
+                )
+                self._conn.executemany(
+                    "DELETE FROM sql_cache WHERE cache_key = ?",
+                    [(evicted_key,) for evicted_key in evicted_keys],
+                )
+                self._conn.commit()
+
+    def invalidate(self, cache_key):
+        with self._lock:
+            self._entries.pop(cache_key, None)
+            if self._conn is not None:
+                self._conn.execute(
+                    "DELETE FROM sql_cache WHERE cache_key = ?", (cache_key,)
+                )
+                self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
@@ -0,0 +1,73 @@
+# result_cache.py
+import re
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    LRU cache of SQL result DataFrames bounded by their memory footprint in bytes.
+    Every entry is tagged with the data version it was computed against;
+    when the data version changes all entries are dropped.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, max_entry_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data_version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalise_sql(sql_query):
+        sql_query = re.sub(r"\s+", " ", sql_query).strip()
+        return sql_query.rstrip("; ")
+
+    def _check_data_version(self, data_version):
+        if data_version != self._data_version:
+            self._entries.clear()
+            self.current_bytes = 0
+            self._data_version = data_version
+
+    def get(self, sql_query, data_version, fetch_options=None):
+        # the same SQL fetched with other row caps / modes is another result
+        key = (self.normalise_sql(sql_query), fetch_options)
+        with self._lock:
+            self._check_data_version(data_version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            result, _ = entry
+        # callers format and slice the result, never hand out the cached object
+        return result.copy()
+
+    def put(self, sql_query, data_version, result, fetch_options=None):
+        n_bytes = int(result.memory_usage(index=True, deep=True).sum())
+        if n_bytes > self.max_entry_bytes:
+            return
+        key = (self.normalise_sql(sql_query), fetch_options)
+        with self._lock:
+            self._check_data_version(data_version)
+            previous_entry = self._entries.pop(key, None)
+            if previous_entry is not None:
+                self.current_bytes -= previous_entry[1]
+            self._entries[key] = (result.copy(), n_bytes)
+            self.current_bytes += n_bytes
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "bytes": self.current_bytes,
+            }
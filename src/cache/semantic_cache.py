@@ -0,0 +1,276 @@
+# semantic_cache.py
+import atexit
+import json
+import os
+import re
+import threading
+import time
+import faiss
+import numpy as np
+
+# words fixing the direction of a ranking or sort, "top 5" and "bottom 5" need different SQL
+ORDER_PATTERNS = {
+    "desc": re.compile(
+        r"\b(?:top|highest|most|best|largest|biggest|maximum|max|descending|desc)\b",
+        re.IGNORECASE,
+    ),
+    "asc": re.compile(
+        r"\b(?:bottom|lowest|least|worst|smallest|fewest|minimum|min|ascending|asc)\b",
+        re.IGNORECASE,
+    ),
+}
+RELATIVE_PERIOD_PATTERN = re.compile(
+    r"\b(last|previous|past|this|current|next)\s+(?:\d+\s+)?(day|week|month|quarter|year)s?\b",
+    re.IGNORECASE,
+)
+RELATIVE_PERIOD_NAMES = {"previous": "last", "past": "last", "current": "this"}
+PERIOD_PATTERN = re.compile(
+    r"\b(today|yesterday|ytd|mtd|qtd|year to date|month to date|quarter to date"
+    r"|jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+    r"|sep(?:tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b",
+    re.IGNORECASE,
+)
+PERIOD_NAMES = {
+    "year to date": "ytd",
+    "month to date": "mtd",
+    "quarter to date": "qtd",
+    **{
+        month: month[:3]
+        for month in (
+            "january february march april june july august september october november december"
+        ).split()
+    },
+}
+GRANULARITY_PATTERN = re.compile(
+    r"\b(?:(daily|weekly|monthly|quarterly|yearly|annually)"
+    r"|(?:by|per|each|every)\s+(day|week|month|quarter|year))\b",
+    re.IGNORECASE,
+)
+GRANULARITY_NAMES = {
+    "daily": "day",
+    "weekly": "week",
+    "monthly": "month",
+    "quarterly": "quarter",
+    "yearly": "year",
+    "annually": "year",
+}
+
+
+class SemanticQueryCache:
+    """
+    Paraphrase tolerant question -> SQL cache.
+    Questions are embedded, normalised and searched by inner product (cosine similarity) in a FAISS index.
+    A stored SQL query is reused when a previously answered question of the same scope is similar enough
+    and mentions the same literals (numbers, quoted strings and upper case codes like DEL or TG), ordering
+    direction and time periods, so "top 5 states" never reuses the SQL of "top 10 states", "bottom 5 states"
+    or "top 5 states last month".
+    Adds and invalidations are persisted in the background, at most once per save_delay_seconds, and at exit.
+    """
+
+    index_file_name = "semantic_cache.faiss"
+    entries_file_name = "semantic_cache.json"
+
+    def __init__(
+        self,
+        embed_fn,
+        embedding_model_name,
+        threshold=0.92,
+        max_entries=5000,
+        persist_dir=None,
+        search_k=8,
+        save_delay_seconds=5.0,
+    ):
+        self._embed_fn = embed_fn
+        self.embedding_model_name = embedding_model_name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.search_k = search_k
+        self.save_delay_seconds = save_delay_seconds
+        self._persist_dir = persist_dir
+        self._lock = threading.Lock()
+        # keeps concurrent saves in order, an older snapshot never overwrites a newer one
+        self._save_lock = threading.Lock()
+        self._save_timer = None
+        self._index = None
+        self._entries = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        if persist_dir:
+            self.load()
+            atexit.register(self.flush)
+
+    @staticmethod
+    def get_literals(question):
+        numbers = re.findall(r"\d+(?:\.\d+)?", question)
+        quoted = re.findall(r"[\"']([^\"']+)[\"']", question)
+        # upper case keywords (YTD, MAX) are matched below
+        codes = [
+            code
+            for code in re.findall(r"\b[A-Z]{2,}\b", question)
+            if not any(
+                pattern.fullmatch(code)
+                for pattern in (*ORDER_PATTERNS.values(), PERIOD_PATTERN)
+            )
+        ]
+        keywords = [
+            f"order:{direction}"
+            for direction, pattern in ORDER_PATTERNS.items()
+            if pattern.search(question)
+        ]
+        for relation, unit in RELATIVE_PERIOD_PATTERN.findall(question):
+            relation = relation.lower()
+            keywords.append(
+                f"period:{RELATIVE_PERIOD_NAMES.get(relation, relation)} {unit.lower()}"
+            )
+        for period in PERIOD_PATTERN.findall(question):
+            period = period.lower()
+            keywords.append(f"period:{PERIOD_NAMES.get(period, period)}")
+        for adverb, unit in GRANULARITY_PATTERN.findall(question):
+            keywords.append(f"grain:{GRANULARITY_NAMES.get(adverb.lower(), unit.lower())}")
+        return sorted(
+            numbers + [value.lower() for value in quoted] + codes + sorted(set(keywords))
+        )
+
+    def embed(self, question):
+        embedding = np.asarray(self._embed_fn(question), dtype="float32").reshape(1, -1)
+        faiss.normalize_L2(embedding)
+        return embedding
+
+    def _create_index(self, dim):
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+
+    def lookup(self, question, scope):
+        """
+        Returns:
+            dict: {"id", "sql_query", "question", "score"} of the best matching entry, or None.
+        """
+        embedding = self.embed(question)
+        literals = self.get_literals(question)
+        with self._lock:
+            if self._index is None or self._index.ntotal == 0:
+                self.misses += 1
+                return None
+            scores, ids = self._index.search(
+                embedding, min(self.search_k, self._index.ntotal)
+            )
+            for score, entry_id in zip(scores[0], ids[0]):
+                if entry_id == -1 or score < self.threshold:
+                    break
+                entry = self._entries.get(int(entry_id))
+                if (
+                    entry is None
+                    or entry["scope"] != scope
+                    or entry["literals"] != literals
+                ):
+                    continue
+                entry["last_used"] = time.time()
+                self.hits += 1
+                return {
+                    "id": int(entry_id),
+                    "sql_query": entry["sql_query"],
+                    "question": entry["question"],
+                    "score": float(score),
+                }
+            self.misses += 1
+            return None
+
+    def add(self, question, scope, sql_query):
+        embedding = self.embed(question)
+        with self._lock:
+            if self._index is None:
+                self._index = self._create_index(embedding.shape[1])
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(embedding, np.array([entry_id], dtype="int64"))
+            self._entries[entry_id] = {
+                "question": question,
+                "scope": scope,
+                "literals": self.get_literals(question),
+                "sql_query": sql_query,
+                "last_used": time.time(),
+            }
+            self._evict()
+            self._schedule_save()
+
+    def invalidate(self, entry_id):
+        with self._lock:
+            if self._entries.pop(entry_id, None) is not None:
+                self._index.remove_ids(np.array([entry_id], dtype="int64"))
+                self._schedule_save()
+
+    def _evict(self):
+        overflow = len(self._entries) - self.max_entries
+        if overflow <= 0:
+            return
+        # least recently used entries go first
+        evicted_ids = sorted(
+            self._entries, key=lambda entry_id: self._entries[entry_id]["last_used"]
+        )[:overflow]
+        for entry_id in evicted_ids:
+            del self._entries[entry_id]
+        self._index.remove_ids(np.array(evicted_ids, dtype="int64"))
+
+    def _schedule_save(self):
+        # called with the lock held, the changes of the next save_delay_seconds are written together
+        if not self._persist_dir or self._save_timer is not None:
+            return
+        self._save_timer = threading.Timer(self.save_delay_seconds, self.flush)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    def flush(self):
+        """
+        Writes the index and the entries to persist_dir. The lock is only held while they are serialised,
+        lookups and adds do not wait for the disk.
+        """
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                if not self._persist_dir or self._index is None:
+                    return
+                index_bytes = faiss.serialize_index(self._index)
+                content = json.dumps(
+                    {
+                        "embedding_model_name": self.embedding_model_name,
+                        "next_id": self._next_id,
+                        "entries": self._entries,
+                    }
+                )
+            os.makedirs(self._persist_dir, exist_ok=True)
+            index_file = os.path.join(self._persist_dir, self.index_file_name)
+            entries_file = os.path.join(self._persist_dir, self.entries_file_name)
+            index_bytes.tofile(index_file + ".tmp")
+            with open(entries_file + ".tmp", "w") as file:
+                file.write(content)
+            os.replace(index_file + ".tmp", index_file)
+            os.replace(entries_file + ".tmp", entries_file)
+
+    def load(self):
+        index_file = os.path.join(self._persist_dir, self.index_file_name)
+        entries_file = os.path.join(self._persist_dir, self.entries_file_name)
+        if not (os.path.exists(index_file) and os.path.exists(entries_file)):
+            return
+        try:
+            with open(entries_file, "r") as file:
+                content = json.load(file)
+            if content.get("embedding_model_name") != self.embedding_model_name:
+                return
+            index = faiss.read_index(index_file)
+        except (OSError, ValueError, RuntimeError):
+            return
+        self._index = index
+        self._next_id = content["next_id"]
+        self._entries = {
+            int(entry_id): entry for entry_id, entry in content["entries"].items()
+        }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
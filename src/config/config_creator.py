@@ -1,5 +1,9 @@
 # config_creator.py
 import configparser
+import os
+
+# ini file whose settings override the defaults (e.g. the benchmark's synthetic data paths)
+CONFIG_OVERRIDE_ENV_VAR = "SLLM_CONFIG_FILE"
 
 
 class ConfigCreator:
@@ -7,6 +11,12 @@ class ConfigCreator:
 
     def __init__(self):
         self._config = self.create_default_config()
+        override_file = os.environ.get(CONFIG_OVERRIDE_ENV_VAR)
+        if override_file:
+            if not self._config.read(override_file):
+                raise FileNotFoundError(
+                    f"{CONFIG_OVERRIDE_ENV_VAR} points to {override_file}, which cannot be read"
+                )
 
     def create_default_config(self):
         # Create a default configuration with default values
@@ -18,6 +28,9 @@ class ConfigCreator:
         )
         config.set("paths", "database_directory", "data/db")
         config.set("paths", "index_storage_directory", "data/storage")
+        config.set("paths", "schema_cache_directory", "data/storage/schema_cache")
+        config.set("paths", "llm_state_directory", "data/storage/llm_state")
+        config.set("paths", "faiss_index_directory", "data/storage/faiss_index")
         config.set(
             "paths",
             "column_descriptions_file_path",
@@ -49,6 +62,24 @@ class ConfigCreator:
             "success_logs.log",
         )
 
+        config.add_section("embedding_params")
+        # torch | int8 | onnx
+        config.set("embedding_params", "backend", "torch")
+        config.set("embedding_params", "max_batch_size", "32")
+        config.set("embedding_params", "max_wait_ms", "5")
+        config.set("embedding_params", "max_length", "512")
+
+        config.add_section("faiss_params")
+        # flat | ivf | hnsw
+        config.set("faiss_params", "index_type", "flat")
+        config.set("faiss_params", "batch_size", "64")
+        config.set("faiss_params", "ivf_nlist", "256")
+        config.set("faiss_params", "ivf_nprobe", "16")
+        config.set("faiss_params", "hnsw_m", "32")
+        config.set("faiss_params", "use_mmap", "True")
+        config.set("faiss_params", "top_k", "5")
+        config.set("faiss_params", "min_score", "0.5")
+
         config.add_section("llm_params")
         config.set(
             "llm_params",
@@ -62,6 +93,167 @@ class ConfigCreator:
         config.set("llm_params", "verbose_flag", "False")
         config.set("llm_params", "n_gpu_layers", "-1")
         config.set("llm_params", "repeat_penalty", "1.1")
+        # number of llama.cpp worker processes, 1 keeps the model in process
+        config.set("llm_params", "num_workers", "1")
+        # 0 splits os.cpu_count() - 2 threads between the workers of all the configured LLMs
+        config.set("llm_params", "threads_per_worker", "0")
+        config.set("llm_params", "worker_start_method", "fork")
+        config.set("llm_params", "prefix_cache_enabled", "True")
+        config.set("llm_params", "prefix_cache_capacity_bytes", str(4 << 30))
+        config.set("llm_params", "prefix_cache_min_tokens", "256")
+        config.set(
+            "llm_params",
+            "prefix_cache_templates",
+            "decomposer_template,detail_template,refiner_template,summary_template",
+        )
+
+        config.add_section("scheduler_params")
+        # 0 admits one LLM call per LLM worker process
+        config.set("scheduler_params", "max_concurrency", "0")
+        config.set("scheduler_params", "max_queue_depth", "32")
+        config.set("scheduler_params", "retry_after_seconds", "10")
+        config.set("scheduler_params", "interactive_queue_timeout_seconds", "120")
+        config.set("scheduler_params", "default_queue_timeout_seconds", "300")
+        config.set("scheduler_params", "batch_queue_timeout_seconds", "1800")
+
+        config.add_section("cache_params")
+        config.set("cache_params", "sql_cache_enabled", "True")
+        config.set("cache_params", "sql_cache_max_entries", "1024")
+        config.set("cache_params", "sql_cache_persist", "True")
+        config.set(
+            "cache_params", "sql_cache_path", "data/storage/sql_cache.sqlite3"
+        )
+        config.set("cache_params", "semantic_cache_enabled", "True")
+        config.set("cache_params", "semantic_cache_threshold", "0.92")
+        config.set("cache_params", "semantic_cache_max_entries", "5000")
+        config.set(
+            "cache_params", "semantic_cache_directory", "data/storage/semantic_cache"
+        )
+        # new entries are written to disk together, at most once per delay (and at exit)
+        config.set("cache_params", "semantic_cache_save_delay_seconds", "5")
+        config.set("cache_params", "result_cache_enabled", "True")
+        config.set("cache_params", "result_cache_max_bytes", str(256 * 1024 * 1024))
+        config.set(
+            "cache_params", "result_cache_max_entry_bytes", str(64 * 1024 * 1024)
+        )
+
+        # result fetching: rows are read chunk_rows at a time and a result keeps at most max_rows rows /
+        # max_bytes bytes (DataFrame memory), larger results are truncated
+        config.add_section("fetch_params")
+        config.set("fetch_params", "chunk_rows", "10000")
+        config.set("fetch_params", "max_rows", "100000")
+        config.set("fetch_params", "max_bytes", str(64 * 1024 * 1024))
+
+        # guardrails of the LLM generated SQL: queries run on read-only connections, each within time_budget_seconds
+        # (0 = unlimited, checked every progress_handler_steps SQLite VM steps). The EXPLAIN QUERY PLAN preflight
+        # rejects, flags (logs) or lets through (off) full scans of tables of large_table_rows rows or more
+        # without WHERE, aggregation or LIMIT and nested loop joins over such full scans.
+        config.add_section("query_guard_params")
+        config.set("query_guard_params", "read_only", "True")
+        config.set("query_guard_params", "time_budget_seconds", "30")
+        config.set("query_guard_params", "progress_handler_steps", "10000")
+        config.set("query_guard_params", "preflight_action", "reject")
+        config.set("query_guard_params", "large_table_rows", "1000000")
+
+        config.add_section("job_params")
+        config.set("job_params", "max_workers", "1")
+        config.set("job_params", "max_pending_jobs", "16")
+        config.set("job_params", "job_ttl_seconds", "3600")
+
+        config.add_section("insights_params")
+        config.set("insights_params", "snapshot_enabled", "True")
+        config.set("insights_params", "snapshot_poll_seconds", "300")
+        config.set(
+            "insights_params",
+            "snapshot_path",
+            "data/storage/insights_snapshot.json",
+        )
+
+        # column level schema retrieval for decomposer_template, detail_template and refiner_template:
+        # only the tables / columns relevant to the question are put in the prompt
+        config.add_section("schema_params")
+        config.set("schema_params", "pruning_enabled", "True")
+        config.set("schema_params", "top_k_columns", "15")
+        # same number of tables as the query engine's table retriever
+        config.set("schema_params", "max_tables", "3")
+        config.set("schema_params", "include_key_columns", "True")
+
+        # token budget of every prompt template, 0 = the routed LLM's context_window - max_new_tokens.
+        # <template>_budget overrides default_budget, <template>_policy lists the overflow policies tried in order:
+        # trim_examples (drop few-shot examples), drop_value_examples (from the schema), reject.
+        config.add_section("token_budget_params")
+        config.set("token_budget_params", "enabled", "True")
+        config.set("token_budget_params", "default_budget", "0")
+        config.set("token_budget_params", "default_policy", "drop_value_examples")
+        config.set(
+            "token_budget_params",
+            "decomposer_template_policy",
+            "trim_examples,drop_value_examples,reject",
+        )
+        config.set(
+            "token_budget_params", "detail_template_policy", "drop_value_examples,reject"
+        )
+        config.set(
+            "token_budget_params", "refiner_template_policy", "drop_value_examples,reject"
+        )
+        config.set(
+            "token_budget_params",
+            "insights_question_generation_template_policy",
+            "drop_value_examples,reject",
+        )
+        config.set(
+            "token_budget_params",
+            "summary_questions_generation_template_policy",
+            "drop_value_examples,reject",
+        )
+        config.set(
+            "token_budget_params", "human_like_response_template_policy", "reject"
+        )
+
+        # opt-in per request profiling: send the trigger header (or query parameter) with cprofile or sampling
+        # (any other value uses default_mode), plus the token header when a token is set.
+        # The hooks are only installed when enabled.
+        config.add_section("profiling_params")
+        config.set("profiling_params", "enabled", "False")
+        config.set("profiling_params", "default_mode", "sampling")
+        config.set("profiling_params", "trigger_header", "X-Profile")
+        config.set("profiling_params", "trigger_query_param", "profile")
+        config.set("profiling_params", "token_header", "X-Profile-Token")
+        config.set("profiling_params", "token", "")
+        config.set("profiling_params", "sampling_interval_ms", "5")
+        config.set("profiling_params", "output_directory", "data/storage/profiles")
+        config.set("profiling_params", "max_artifacts", "100")
+
+        # how results are summarised: llm (summary_template), auto (rule based summary for simple results,
+        # the LLM otherwise) or rules (never the LLM). <endpoint>_mode overrides default_mode for one endpoint.
+        config.add_section("summary_params")
+        config.set("summary_params", "default_mode", "auto")
+        config.set("summary_params", "qna_mode", "auto")
+        config.set("summary_params", "fast_qna_mode", "auto")
+        config.set("summary_params", "insights_mode", "auto")
+        config.set("summary_params", "summary_mode", "auto")
+        config.set("summary_params", "template_qna_mode", "auto")
+        config.set("summary_params", "fast_template_qna_mode", "rules")
+        config.set("summary_params", "max_rows", "500")
+        config.set("summary_params", "max_columns", "4")
+        config.set("summary_params", "top_n", "3")
+        # relative slope per period under which a series is described as flat
+        config.set("summary_params", "flat_trend_threshold", "0.01")
+
+        # additional named LLMs, each configured in a llm_model_<name> section that overrides llm_params, e.g.
+        # [llm_models] names = small
+        # [llm_model_small] llm_model_file = models/<1-3B model>.gguf
+        config.add_section("llm_models")
+        config.set("llm_models", "names", "")
+
+        # prompt template -> named LLM, templates not listed use "default".
+        # decomposer_template, detail_template and refiner_template run through the query engine
+        # and always use the default LLM.
+        config.add_section("llm_routing")
+        config.set("llm_routing", "summary_template", "default")
+        config.set("llm_routing", "human_like_response_template", "default")
+        config.set("llm_routing", "summary_questions_generation_template", "default")
+        config.set("llm_routing", "insights_question_generation_template", "default")
 
         # config.add_section('custom_prompts')
         # config.set('custom_prompts', 'llm_context_qa_prompt','return chat')
@@ -8,10 +8,31 @@ class ConfigLoader:
     def __init__(self):
         self.config_obj = ConfigCreator().get_config()
 
-    def load_llm_config(self):
+    def load_llm_config(self, model_name="default"):
         # Load LLM configuration from a file or other source
+        # named models live in llm_model_<name> sections and inherit every setting they do not override
         llm_params = self.config_obj["llm_params"]
-        return llm_params
+        if model_name == "default":
+            return llm_params
+        model_params = self.config_obj[f"llm_model_{model_name}"]
+        for key, value in llm_params.items():
+            if not self.config_obj.has_option(f"llm_model_{model_name}", key):
+                model_params[key] = value
+        return model_params
+
+    def load_llm_models_config(self):
+        # Names of the LLMs that can be loaded, "default" is the one configured in llm_params
+        model_names = self.config_obj["llm_models"]["names"]
+        return ["default"] + [
+            name.strip()
+            for name in model_names.split(",")
+            if name.strip() and name.strip() != "default"
+        ]
+
+    def load_llm_routing_config(self):
+        # Load which named LLM serves which prompt template
+        llm_routing = self.config_obj["llm_routing"]
+        return llm_routing
 
     def load_path_config(self):
         # Load database configuration like data paths and index storage paths
@@ -27,3 +48,63 @@ class ConfigLoader:
         # Load template questions and approaches
         template_questions = self.config_obj["template_questions"]
         return template_questions
+
+    def load_cache_config(self):
+        # Load cache settings like sizes and persistence paths
+        cache_params = self.config_obj["cache_params"]
+        return cache_params
+
+    def load_job_config(self):
+        # Load background job executor settings
+        job_params = self.config_obj["job_params"]
+        return job_params
+
+    def load_insights_config(self):
+        # Load insights snapshot settings
+        insights_params = self.config_obj["insights_params"]
+        return insights_params
+
+    def load_faiss_config(self):
+        # Load pre-defined sql queries index settings
+        faiss_params = self.config_obj["faiss_params"]
+        return faiss_params
+
+    def load_embedding_config(self):
+        # Load shared embedding runtime settings
+        embedding_params = self.config_obj["embedding_params"]
+        return embedding_params
+
+    def load_schema_config(self):
+        # Load the schema pruning settings
+        schema_params = self.config_obj["schema_params"]
+        return schema_params
+
+    def load_token_budget_config(self):
+        # Load the per prompt template token budgets and overflow policies
+        token_budget_params = self.config_obj["token_budget_params"]
+        return token_budget_params
+
+    def load_profiling_config(self):
+        # Load the request profiling settings
+        profiling_params = self.config_obj["profiling_params"]
+        return profiling_params
+
+    def load_fetch_config(self):
+        # Load the chunk size and row / byte caps of query result fetching
+        fetch_params = self.config_obj["fetch_params"]
+        return fetch_params
+
+    def load_query_guard_config(self):
+        # Load the read-only, time budget and query plan preflight settings of query execution
+        query_guard_params = self.config_obj["query_guard_params"]
+        return query_guard_params
+
+    def load_summary_config(self):
+        # Load the result summariser mode per endpoint and its thresholds
+        summary_params = self.config_obj["summary_params"]
+        return summary_params
+
+    def load_scheduler_config(self):
+        # Load LLM admission queue settings
+        scheduler_params = self.config_obj["scheduler_params"]
+        return scheduler_params
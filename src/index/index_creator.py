@@ -2,7 +2,9 @@ from sqlalchemy import create_engine, MetaData
 from glob import glob
 from llama_index import (
     SQLDatabase,
+    StorageContext,
     VectorStoreIndex,
+    load_index_from_storage,
 )
 from llama_index.indices.struct_store import SQLTableRetrieverQueryEngine
 from llama_index.objects import (
@@ -11,16 +13,27 @@ from llama_index.objects import (
     SQLTableSchema,
 )
 from src.config.config_loader import ConfigLoader
+from src.service_context.embedding_service import (
+    EmbeddingService,
+    get_embedding_model_id,
+)
 import faiss
-from transformers import AutoTokenizer, AutoModel
+import hashlib
 import json
-import torch
+import numpy as np
+import os
+import shutil
+
+# tables the text-to-SQL query engine retrieves for a question
+TABLE_RETRIEVER_TOP_K = 3
 
 
 class IndexCreator:
     def __init__(self):
         paths = ConfigLoader().load_path_config()
         self._database_dir = paths["database_directory"]
+        self._index_storage_dir = paths["index_storage_directory"]
+        self._embedding_model_id = get_embedding_model_id()
 
     def build_database_schema(self):
         file_name = glob(pathname=str(self._database_dir) + "/*.db")[0]
@@ -30,8 +43,56 @@ class IndexCreator:
         self._metadata.reflect(engine)
         self._sql_database = SQLDatabase(engine=engine)
 
+    def get_schema_fingerprint(self):
+        """
+        Hash of the reflected database schema and the embedding model used for the table index.
+        Any change to tables, columns, column types, foreign keys or the embedding model changes the fingerprint.
+        """
+        hasher = hashlib.sha256()
+        hasher.update(self._embedding_model_id.encode("utf-8"))
+        for table_name in sorted(self._metadata.tables.keys()):
+            table = self._metadata.tables[table_name]
+            hasher.update(f"table:{table_name}".encode("utf-8"))
+            for column in table.columns:
+                hasher.update(f"column:{column.name}:{column.type}".encode("utf-8"))
+            for foreign_key in sorted(fk.target_fullname for fk in table.foreign_keys):
+                hasher.update(f"fk:{foreign_key}".encode("utf-8"))
+        return hasher.hexdigest()[:16]
+
+    def get_object_index_dir(self):
+        return os.path.join(
+            self._index_storage_dir, "object_index", self.get_schema_fingerprint()
+        )
+
+    def load_object_index(self, table_node_mapping):
+        persist_dir = self.get_object_index_dir()
+        if not os.path.exists(os.path.join(persist_dir, "docstore.json")):
+            return None
+        try:
+            storage_context = StorageContext.from_defaults(persist_dir=persist_dir)
+            index = load_index_from_storage(storage_context)
+        except Exception:
+            # unreadable or partially written index, rebuild it
+            shutil.rmtree(persist_dir, ignore_errors=True)
+            return None
+        return ObjectIndex(index=index, object_node_mapping=table_node_mapping)
+
+    def persist_object_index(self):
+        persist_dir = self.get_object_index_dir()
+        # write into a temporary directory first so a crash never leaves a half written index behind
+        tmp_dir = persist_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        self._object_index._index.storage_context.persist(persist_dir=tmp_dir)
+        shutil.rmtree(persist_dir, ignore_errors=True)
+        os.replace(tmp_dir, persist_dir)
+
     def build_object_index(self):
         table_node_mapping = SQLTableNodeMapping(sql_database=self._sql_database)
+        object_index = self.load_object_index(table_node_mapping)
+        if object_index is not None:
+            self._object_index = object_index
+            return
+
         table_schema_objects = []
         for table_name in self._metadata.tables.keys():
             table_schema_objects.append(SQLTableSchema(table_name=table_name))
@@ -41,13 +102,17 @@ class IndexCreator:
             table_node_mapping,
             VectorStoreIndex,
         )
+        self.persist_object_index()
 
     def create_query_engine(self):
-        self.build_database_schema()
+        if not hasattr(self, "_sql_database"):
+            self.build_database_schema()
         self.build_object_index()
         query_engine = SQLTableRetrieverQueryEngine(
             self._sql_database,
-            self._object_index.as_retriever(similarity_top_k=3, verbose=False),
+            self._object_index.as_retriever(
+                similarity_top_k=TABLE_RETRIEVER_TOP_K, verbose=False
+            ),
             sql_only=True,
             synthesize_response=False,
         )
@@ -56,14 +121,25 @@ class IndexCreator:
 
 
 class FAISSIndex:
+    catalogue_file_name = "catalogue.json"
+    index_file_name = "sql_queries.faiss"
+
     def __init__(self):
         config_loader = ConfigLoader()
         paths = config_loader.load_path_config()
-        embedding_model_path = paths["embedding_model_path"]
-        embedding_tokenizer_path = paths["embedding_model_path"]
+        faiss_params = config_loader.load_faiss_config()
         sql_queries_path = paths["pre_defined_sql_queries_path"]
-        self.tokenizer = AutoTokenizer.from_pretrained(embedding_tokenizer_path)
-        self.embed_model = AutoModel.from_pretrained(embedding_model_path)
+        self._embedding_model_id = get_embedding_model_id()
+        self._index_dir = paths["faiss_index_directory"]
+        self.index_type = faiss_params["index_type"]
+        self.batch_size = faiss_params.getint("batch_size")
+        self.ivf_nlist = faiss_params.getint("ivf_nlist")
+        self.ivf_nprobe = faiss_params.getint("ivf_nprobe")
+        self.hnsw_m = faiss_params.getint("hnsw_m")
+        self.use_mmap = faiss_params.getboolean("use_mmap")
+        self.top_k = faiss_params.getint("top_k")
+        self.min_score = faiss_params.getfloat("min_score")
+        self._embedding_service = EmbeddingService()
 
         with open(sql_queries_path, mode="rb") as file:
             content = file.read()
@@ -74,25 +150,124 @@ class FAISSIndex:
                 self.sql_queries_list.append(sql_query)
         self.build_faiss_index()
 
-    def build_faiss_index(self):
-        # Tokenize and obtain embeddings
-        inputs = self.tokenizer(
-            self.sql_queries_list, return_tensors="pt", padding=True, truncation=True
-        )
-        with torch.no_grad():
-            outputs = self.embed_model(**inputs)
+    def embed(self, texts):
+        """
+        Embeds texts in chunks of batch_size through the shared embedding service,
+        with attention mask aware mean pooling so an embedding does not depend on the batch it was computed in.
+        Returns:
+            numpy.ndarray: float32 array of L2 normalised embeddings, one row per text.
+        """
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            embeddings.append(
+                self._embedding_service.embed(
+                    texts[start : start + self.batch_size], pooling="mean"
+                )
+            )
+        return np.concatenate(embeddings, axis=0)
 
-        # Extract embeddings from the last layer
-        sentence_embeddings = outputs.last_hidden_state.mean(dim=1).numpy()
+    def get_index_key(self):
+        index_params = [
+            self._embedding_model_id,
+            self.index_type,
+            self.ivf_nlist,
+            self.hnsw_m,
+            "masked-mean-l2norm",
+        ]
+        return hashlib.sha256(
+            "|".join(str(param) for param in index_params).encode("utf-8")
+        ).hexdigest()[:16]
 
-        # Assuming vectors from the model with a specific dimensionality
-        d = sentence_embeddings.shape[1]
+    def create_faiss_index(self, embeddings):
+        d = embeddings.shape[1]
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(d, self.hnsw_m)
+        elif self.index_type == "ivf":
+            # faiss wants ~39 training points per list
+            nlist = max(1, min(self.ivf_nlist, len(embeddings) // 39))
+            index = faiss.IndexIVFFlat(faiss.IndexFlatL2(d), d, nlist)
+            index.train(embeddings)
+        else:
+            index = faiss.IndexFlatL2(d)
+        index.add(embeddings)
+        return index
 
-        # Create FAISS index
-        self.index = faiss.IndexFlatL2(d)
-        self.index.add(sentence_embeddings)
+    def load_faiss_index(self, writable):
+        index_file = os.path.join(self._index_dir, self.index_file_name)
+        if self.use_mmap and not writable:
+            try:
+                return faiss.read_index(
+                    index_file, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+                )
+            except RuntimeError:
+                # not every index type can be memory mapped
+                pass
+        return faiss.read_index(index_file)
 
-    def match_question(self, question):
+    def load_catalogue(self):
+        catalogue_file = os.path.join(self._index_dir, self.catalogue_file_name)
+        index_file = os.path.join(self._index_dir, self.index_file_name)
+        if not (os.path.exists(catalogue_file) and os.path.exists(index_file)):
+            return None
+        try:
+            with open(catalogue_file, "r") as file:
+                catalogue = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if catalogue.get("index_key") != self.get_index_key():
+            return None
+        return catalogue
+
+    def persist_faiss_index(self, sql_queries):
+        os.makedirs(self._index_dir, exist_ok=True)
+        index_file = os.path.join(self._index_dir, self.index_file_name)
+        catalogue_file = os.path.join(self._index_dir, self.catalogue_file_name)
+        faiss.write_index(self.index, index_file + ".tmp")
+        with open(catalogue_file + ".tmp", "w") as file:
+            json.dump({"index_key": self.get_index_key(), "queries": sql_queries}, file)
+        os.replace(index_file + ".tmp", index_file)
+        os.replace(catalogue_file + ".tmp", catalogue_file)
+
+    def build_faiss_index(self):
+        """
+        Loads the persisted index and only embeds queries that are not in it yet.
+        The index is rebuilt from scratch when queries were removed or the index settings changed.
+        """
+        catalogue = self.load_catalogue()
+        if catalogue is not None:
+            indexed_queries = catalogue["queries"]
+            current_queries = set(self.sql_queries_list)
+            indexed_query_set = set(indexed_queries)
+            if indexed_query_set.issubset(current_queries):
+                new_queries = [
+                    query
+                    for query in dict.fromkeys(self.sql_queries_list)
+                    if query not in indexed_query_set
+                ]
+                self.index = self.load_faiss_index(writable=bool(new_queries))
+                if new_queries:
+                    self.index.add(self.embed(new_queries))
+                    indexed_queries = indexed_queries + new_queries
+                    self.persist_faiss_index(indexed_queries)
+                self.sql_queries_list = indexed_queries
+                self.set_search_params()
+                return
+
+        sql_queries = list(dict.fromkeys(self.sql_queries_list))
+        self.index = self.create_faiss_index(self.embed(sql_queries))
+        self.sql_queries_list = sql_queries
+        self.persist_faiss_index(sql_queries)
+        self.set_search_params()
+
+    def set_search_params(self):
+        if self.index_type == "ivf":
+            faiss.extract_index_ivf(self.index).nprobe = self.ivf_nprobe
+
+    def match_questions(self, question, k=None):
+        """
+        Returns:
+            list: up to k {"sql_query", "score"} dicts, best first. score is the cosine similarity.
+        """
         # data specific string handling
         question = question.replace("product", "zposdesc").replace("item", "zposdesc")
         question = question.replace("category", "level3_desc")
@@ -101,16 +276,28 @@ class FAISSIndex:
             .replace("distribution center", "DC")
             .replace("supplier", "DC")
         )
-        # Tokenize and obtain embedding for the query
-        query_input = self.tokenizer(
-            question, return_tensors="pt", padding=True, truncation=True
-        )
-        with torch.no_grad():
-            query_output = self.embed_model(**query_input)
+        query_embedding = self.embed([question])
 
-        # Extract embedding from the last layer
-        query_embedding = query_output.last_hidden_state.mean(dim=1).numpy()
+        # Perform similarity search, distances are squared L2 between unit vectors
+        distances, indices = self.index.search(query_embedding, k or self.top_k)
+        matches = []
+        for distance, index in zip(distances[0], indices[0]):
+            if index == -1:
+                continue
+            matches.append(
+                {
+                    "sql_query": self.sql_queries_list[index],
+                    "score": float(1 - distance / 2),
+                }
+            )
+        return matches
 
-        # Perform similarity search
-        distances, indices = self.index.search(query_embedding, k=1)
-        return self.sql_queries_list[indices[0][0]]
+    def match_question(self, question):
+        """
+        Returns:
+            str: The sql query of the best match, None when its score is below min_score.
+        """
+        matches = self.match_questions(question, k=1)
+        if not matches or matches[0]["score"] < self.min_score:
+            return None
+        return matches[0]["sql_query"]
@@ -0,0 +1,137 @@
+# schema_retriever.py
+import hashlib
+import os
+import numpy as np
+
+
+class SchemaColumnRetriever:
+    """
+    Column level retrieval over the database schema, so the SQL prompts only carry the tables and columns
+    relevant to the question instead of the whole schema.
+    Every column is embedded once as "table.column: description" (persisted next to the schema cache, keyed
+    on the schema fingerprint and the embedding model so data loads reuse the embeddings) and a question is scored against all columns with a single matrix product.
+    The tables of the top_k_columns best columns are kept (at most max_tables of them), each with its
+    matching columns plus its primary / foreign key columns so the kept tables can still be joined.
+    """
+
+    def __init__(
+        self,
+        database_utils,
+        embed_model,
+        embedding_model_name,
+        schema_fingerprint,
+        persist_dir,
+        top_k_columns=15,
+        max_tables=3,
+        include_key_columns=True,
+    ):
+        self._database_utils = database_utils
+        self._embed_model = embed_model
+        self.embedding_model_name = embedding_model_name
+        self.schema_fingerprint = schema_fingerprint
+        self.persist_dir = persist_dir
+        self.top_k_columns = top_k_columns
+        self.max_tables = max_tables
+        self.include_key_columns = include_key_columns
+
+        self._schema_entries = database_utils.get_schema_entries()
+        self._foreign_keys = database_utils.get_foreign_keys()
+        self._key_columns = (
+            database_utils.get_key_columns() if include_key_columns else {}
+        )
+        self._columns = [
+            (table_name, position)
+            for table_name, table_entries in self._schema_entries.items()
+            for position in range(len(table_entries))
+        ]
+        self._embeddings = self.load_embeddings()
+
+    @staticmethod
+    def get_column_document(table_name, column_entry):
+        column_name, column_description, _ = column_entry
+        return f"{table_name}.{column_name}: {column_description}"
+
+    def get_column_documents(self):
+        return [
+            self.get_column_document(
+                table_name, self._schema_entries[table_name][position]
+            )
+            for table_name, position in self._columns
+        ]
+
+    def get_embeddings_file(self, documents):
+        # the column descriptions come from the data dictionary, which can change without the schema
+        key_parts = [self.schema_fingerprint, self.embedding_model_name, *documents]
+        key = hashlib.sha256(
+            "|".join(str(part) for part in key_parts).encode("utf-8")
+        ).hexdigest()[:16]
+        return os.path.join(self.persist_dir, f"columns-{key}.npy")
+
+    def load_embeddings(self):
+        documents = self.get_column_documents()
+        embeddings_file = self.get_embeddings_file(documents)
+        if os.path.exists(embeddings_file):
+            try:
+                embeddings = np.load(embeddings_file)
+                if embeddings.shape[0] == len(self._columns):
+                    return embeddings
+            except (OSError, ValueError):
+                pass
+
+        embeddings = np.asarray(
+            self._embed_model.get_text_embedding_batch(documents), dtype="float32"
+        )
+        embeddings /= np.maximum(
+            np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12
+        )
+        os.makedirs(self.persist_dir, exist_ok=True)
+        tmp_file = embeddings_file + ".tmp.npy"
+        np.save(tmp_file, embeddings)
+        os.replace(tmp_file, embeddings_file)
+        return embeddings
+
+    def retrieve(self, question):
+        """
+        Returns:
+            dict: table name -> list of the kept [column_name, column_description, value_examples_str],
+                tables and columns in schema order.
+        """
+        if len(self._columns) <= self.top_k_columns:
+            return self._schema_entries
+
+        query_embedding = np.asarray(
+            self._embed_model.get_query_embedding(question), dtype="float32"
+        )
+        scores = self._embeddings @ query_embedding
+        top_columns = np.argsort(-scores, kind="stable")[: self.top_k_columns]
+
+        selected = {}
+        for column_index in top_columns:
+            table_name, position = self._columns[column_index]
+            if table_name not in selected and len(selected) >= self.max_tables:
+                continue
+            selected.setdefault(table_name, set()).add(position)
+
+        schema_entries = {}
+        for table_name, table_entries in self._schema_entries.items():
+            if table_name not in selected:
+                continue
+            key_columns = self._key_columns.get(table_name, set())
+            schema_entries[table_name] = [
+                column_entry
+                for position, column_entry in enumerate(table_entries)
+                if position in selected[table_name] or column_entry[0] in key_columns
+            ]
+        return schema_entries
+
+    def get_schema_strings(self, question):
+        """
+        Returns:
+            tuple: (schema_str, fk_str) restricted to the tables and columns relevant to the question.
+        """
+        schema_entries = self.retrieve(question)
+        schema_str = self._database_utils.render_schema_str(schema_entries)
+        fk_str = self._database_utils.render_fk_str(
+            self._foreign_keys, table_names=set(schema_entries)
+        )
+        return schema_str, fk_str
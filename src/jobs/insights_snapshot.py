@@ -0,0 +1,128 @@
+# insights_snapshot.py
+import hashlib
+import json
+import os
+import threading
+import time
+from src.utils.llm_scheduler import llm_priority
+from src.utils.metrics import metrics_endpoint
+from src.utils.result_summariser import summary_mode
+
+
+class InsightsSnapshotService:
+    """
+    Materialises the insights of the template questions into a versioned snapshot.
+    The snapshot is computed in the background at startup and again whenever the database's data version
+    (or the template questions) change, persisted to disk and served from memory.
+    Insights whose question failed are stored with an "error" flag, the others are still served.
+    """
+
+    def __init__(
+        self,
+        insights_api,
+        database_utils,
+        snapshot_path,
+        poll_interval_seconds=300,
+        result_summary_mode="auto",
+    ):
+        self._insights_api = insights_api
+        self._database_utils = database_utils
+        self.snapshot_path = snapshot_path
+        self.poll_interval_seconds = poll_interval_seconds
+        self.result_summary_mode = result_summary_mode
+        self._snapshot = None
+        self._refresh_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._load()
+
+    def get_version(self):
+        hasher = hashlib.sha256()
+        hasher.update(str(self._database_utils.get_data_version()).encode("utf-8"))
+        hasher.update(self._insights_api.get_insight_questions_key().encode("utf-8"))
+        return hasher.hexdigest()[:16]
+
+    def _load(self):
+        if not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, "r") as file:
+                self._snapshot = json.load(file)
+        except (OSError, ValueError):
+            self._snapshot = None
+
+    def _save(self, snapshot):
+        snapshot_dir = os.path.dirname(self.snapshot_path)
+        if snapshot_dir:
+            os.makedirs(snapshot_dir, exist_ok=True)
+        with open(self.snapshot_path + ".tmp", "w") as file:
+            json.dump(snapshot, file)
+        os.replace(self.snapshot_path + ".tmp", self.snapshot_path)
+
+    def get_snapshot(self):
+        """
+        Returns:
+            dict: {"version", "computed_at", "insights"} of the latest snapshot, None before the first one exists.
+        """
+        return self._snapshot
+
+    def is_current(self):
+        return self._snapshot is not None and self._snapshot["version"] == self.get_version()
+
+    def refresh(self, force=False, progress_callback=None):
+        """
+        Computes a new snapshot unless the current one already matches the data version.
+        Concurrent callers wait for the computation in progress instead of starting another one.
+        Args:
+            progress_callback (callable, optional): Passed on to InsightsAPI.get_insights.
+        """
+        with self._refresh_lock:
+            version = self.get_version()
+            if not force and self._snapshot is not None:
+                if self._snapshot["version"] == version:
+                    return self._snapshot
+            response_dict = self._insights_api.get_insights(
+                progress_callback=progress_callback
+            )
+            failed_questions = [
+                insight["question"]
+                for insight in response_dict["insights"]
+                if insight.get("error")
+            ]
+            if failed_questions:
+                self._insights_api.logger_instance.warning(
+                    f"insights snapshot {version}: {len(failed_questions)} of "
+                    f"{len(response_dict['insights'])} questions failed - {', '.join(failed_questions)}"
+                )
+            snapshot = {
+                "version": version,
+                "computed_at": time.time(),
+                "insights": response_dict["insights"],
+                "failed_questions": len(failed_questions),
+            }
+            self._save(snapshot)
+            self._snapshot = snapshot
+            return snapshot
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                with llm_priority("batch"), summary_mode(
+                    self.result_summary_mode
+                ), metrics_endpoint("insights_snapshot"):
+                    self.refresh()
+            except Exception as er:
+                self._insights_api.logger_instance.error(
+                    f"insights snapshot refresh failed - error: {er}"
+                )
+            self._stop_event.wait(self.poll_interval_seconds)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="insights-snapshot", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,128 @@
+# job_manager.py
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+class Job:
+    """
+    State of one background job: overall status, per item progress and the results completed so far.
+    """
+
+    def __init__(self, job_type):
+        self.job_id = uuid.uuid4().hex
+        self.job_type = job_type
+        self.status = "queued"
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._items = {}
+        self._results = {}
+        self._result = None
+        self._lock = threading.Lock()
+
+    def update_progress(self, index, name, status, result=None):
+        with self._lock:
+            self._items[index] = {"index": index, "name": name, "status": status}
+            if result is not None:
+                self._results[index] = result
+
+    def set_result(self, result):
+        with self._lock:
+            self._result = result
+
+    def is_finished(self):
+        return self.status in ("completed", "failed")
+
+    def get_status(self):
+        with self._lock:
+            items = [self._items[index] for index in sorted(self._items)]
+            return {
+                "job_id": self.job_id,
+                "job_type": self.job_type,
+                "status": self.status,
+                "error": self.error,
+                "submitted_at": self.submitted_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "progress": {
+                    "completed": sum(item["status"] == "completed" for item in items),
+                    "total": len(items),
+                    "items": items,
+                },
+            }
+
+    def get_result(self):
+        """
+        Returns the final result once the job completed, otherwise the item results completed so far.
+        """
+        with self._lock:
+            if self._result is not None:
+                return self._result
+            return [self._results[index] for index in sorted(self._results)]
+
+
+class JobManager:
+    """
+    Runs jobs on a bounded background thread pool and keeps their state for polling.
+    Submitting fails with JobQueueFullError when max_pending_jobs jobs are already queued or running.
+    Finished jobs are forgotten after job_ttl_seconds.
+    """
+
+    def __init__(self, max_workers=1, max_pending_jobs=16, job_ttl_seconds=3600):
+        self.max_pending_jobs = max_pending_jobs
+        self.job_ttl_seconds = job_ttl_seconds
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="job-worker"
+        )
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _prune_finished_jobs(self):
+        expiry_time = time.time() - self.job_ttl_seconds
+        for job_id, job in list(self._jobs.items()):
+            if job.is_finished() and job.finished_at < expiry_time:
+                del self._jobs[job_id]
+
+    def submit(self, job_type, task):
+        """
+        Args:
+            job_type (str): Name of the kind of job, reported back in the status.
+            task (callable): Called as task(job) on a worker thread, its return value becomes the job result.
+                The task reports per item progress through job.update_progress.
+        Returns:
+            Job: The submitted job.
+        """
+        with self._lock:
+            self._prune_finished_jobs()
+            pending_jobs = sum(not job.is_finished() for job in self._jobs.values())
+            if pending_jobs >= self.max_pending_jobs:
+                raise JobQueueFullError(
+                    f"{pending_jobs} jobs are already queued or running"
+                )
+            job = Job(job_type)
+            self._jobs[job.job_id] = job
+        self._executor.submit(self._run, job, task)
+        return job
+
+    def _run(self, job, task):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.set_result(task(job))
+            job.status = "completed"
+        except Exception as er:
+            job.error = f"{er.__class__.__name__}: {er}"
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    def get_job(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
@@ -1,8 +1,8 @@
 # create_service_context.py
 from src.utils.llm_loader import LLMLoader
 from llama_index import ServiceContext, set_global_tokenizer, set_global_service_context
-from llama_index.embeddings import HuggingFaceEmbedding
 from src.config.config_loader import ConfigLoader
+from src.service_context.embedding_service import SharedHuggingFaceEmbedding
 from transformers import AutoTokenizer
 
 
@@ -13,7 +13,7 @@ class ServiceContextCreator:
         embedding_model_path = paths["embedding_model_path"]
         tokenizer_path = paths["tokenizer_path"]
         self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
-        self.embed_model = HuggingFaceEmbedding(embedding_model_path)
+        self.embed_model = SharedHuggingFaceEmbedding(model_name=embedding_model_path)
 
     def create_service_context(self):
         # Logic to create service context using the loaded LLM instance
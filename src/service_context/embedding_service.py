@@ -0,0 +1,205 @@
+# embedding_service.py
+import queue
+import threading
+from concurrent.futures import Future
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModel
+from llama_index.bridge.pydantic import PrivateAttr
+from llama_index.embeddings.base import BaseEmbedding
+from llama_index.embeddings.huggingface_utils import format_query, format_text
+from src.config.config_loader import ConfigLoader
+
+
+def get_embedding_model_id():
+    """
+    Identifies the embedding model together with the backend that runs it,
+    used to key every persisted index built from its embeddings.
+    """
+    config_loader = ConfigLoader()
+    embedding_model_path = config_loader.load_path_config()["embedding_model_path"]
+    backend = config_loader.load_embedding_config()["backend"]
+    return f"{embedding_model_path}:{backend}"
+
+
+class EmbeddingService:
+    """
+    The process' single embedding model.
+    Backends: "torch" (default), "int8" (torch dynamic quantisation of the linear layers)
+    and "onnx" (onnxruntime through optimum, optional dependency).
+    Concurrent embed calls are queued and coalesced by a worker thread into one forward pass
+    of up to max_batch_size texts, waiting at most max_wait_ms for more calls to arrive.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    instance = super(EmbeddingService, cls).__new__(cls)
+                    instance._load()
+                    cls._instance = instance
+        return cls._instance
+
+    def _load(self):
+        config_loader = ConfigLoader()
+        embedding_model_path = config_loader.load_path_config()["embedding_model_path"]
+        embedding_params = config_loader.load_embedding_config()
+        self.backend = embedding_params["backend"]
+        self.max_batch_size = embedding_params.getint("max_batch_size")
+        self.max_wait_seconds = embedding_params.getfloat("max_wait_ms") / 1000
+        self.max_length = embedding_params.getint("max_length")
+        self.tokenizer = AutoTokenizer.from_pretrained(embedding_model_path)
+        if self.backend == "onnx":
+            try:
+                from optimum.onnxruntime import ORTModelForFeatureExtraction
+            except ImportError as er:
+                raise ImportError(
+                    "The onnx embedding backend needs `pip install optimum[onnxruntime]`"
+                ) from er
+            self.embed_model = ORTModelForFeatureExtraction.from_pretrained(
+                embedding_model_path, export=True
+            )
+        else:
+            self.embed_model = AutoModel.from_pretrained(embedding_model_path)
+            self.embed_model.eval()
+            if self.backend == "int8":
+                self.embed_model = torch.quantization.quantize_dynamic(
+                    self.embed_model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+        self.n_forward_passes = 0
+        self.n_texts = 0
+        self._requests = queue.Queue()
+        self._worker = threading.Thread(
+            target=self._run, name="embedding-service", daemon=True
+        )
+        self._worker.start()
+
+    def embed(self, texts, pooling="cls", normalize=True):
+        """
+        Args:
+            texts (list): Texts to embed.
+            pooling (str): "cls" for the first token's hidden state, "mean" for the attention mask aware mean.
+            normalize (bool): L2 normalise the embeddings.
+        Returns:
+            numpy.ndarray: float32 array, one row per text.
+        """
+        if not texts:
+            return np.zeros((0, self.embed_model.config.hidden_size), dtype="float32")
+        future = Future()
+        self._requests.put((list(texts), pooling, normalize, future))
+        return future.result()
+
+    def _collect_batch(self):
+        batch = [self._requests.get()]
+        n_texts = len(batch[0][0])
+        while n_texts < self.max_batch_size:
+            try:
+                request = self._requests.get(timeout=self.max_wait_seconds)
+            except queue.Empty:
+                break
+            batch.append(request)
+            n_texts += len(request[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                texts = []
+                specs = []
+                for request_texts, pooling, normalize, _ in batch:
+                    texts.extend(request_texts)
+                    specs.extend([(pooling, normalize)] * len(request_texts))
+                embeddings = self._forward(texts, specs)
+                offset = 0
+                for request_texts, _, _, future in batch:
+                    end = offset + len(request_texts)
+                    future.set_result(embeddings[offset:end])
+                    offset = end
+            except Exception as er:
+                for request in batch:
+                    if not request[3].done():
+                        request[3].set_exception(er)
+
+    def _forward(self, texts, specs):
+        embeddings = []
+        # one coalesced call can still carry more texts than fit in a batch
+        for start in range(0, len(texts), self.max_batch_size):
+            chunk_specs = specs[start : start + self.max_batch_size]
+            inputs = self.tokenizer(
+                texts[start : start + self.max_batch_size],
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+            )
+            with torch.no_grad():
+                outputs = self.embed_model(**inputs)
+            pooled = {
+                spec: self._pool(
+                    outputs.last_hidden_state, inputs["attention_mask"], *spec
+                )
+                for spec in set(chunk_specs)
+            }
+            embeddings.extend(
+                pooled[spec][position] for position, spec in enumerate(chunk_specs)
+            )
+            self.n_forward_passes += 1
+        self.n_texts += len(texts)
+        return np.stack(embeddings)
+
+    @staticmethod
+    def _pool(hidden_states, attention_mask, pooling, normalize):
+        if pooling == "mean":
+            mask = attention_mask.unsqueeze(-1).float()
+            embeddings = (hidden_states * mask).sum(dim=1) / mask.sum(dim=1).clamp(
+                min=1
+            )
+        else:
+            embeddings = hidden_states[:, 0]
+        if normalize:
+            embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1)
+        return embeddings.numpy().astype("float32")
+
+    def stats(self):
+        return {
+            "backend": self.backend,
+            "forward_passes": self.n_forward_passes,
+            "texts": self.n_texts,
+            "queued_requests": self._requests.qsize(),
+        }
+
+
+class SharedHuggingFaceEmbedding(BaseEmbedding):
+    """
+    llama_index embedding backed by the shared EmbeddingService,
+    a drop-in replacement for HuggingFaceEmbedding (cls pooling, normalised, bge query instruction).
+    """
+
+    _service: EmbeddingService = PrivateAttr()
+
+    def __init__(self, model_name, **kwargs):
+        super().__init__(model_name=model_name, **kwargs)
+        self._service = EmbeddingService()
+
+    @classmethod
+    def class_name(cls):
+        return "SharedHuggingFaceEmbedding"
+
+    def _get_query_embedding(self, query):
+        query = format_query(query, self.model_name)
+        return self._service.embed([query])[0].tolist()
+
+    async def _aget_query_embedding(self, query):
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text):
+        text = format_text(text, self.model_name)
+        return self._service.embed([text])[0].tolist()
+
+    def _get_text_embeddings(self, texts):
+        texts = [format_text(text, self.model_name) for text in texts]
+        return self._service.embed(texts).tolist()
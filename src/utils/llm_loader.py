@@ -1,29 +1,82 @@
 # llm_loader.py
 import os
+import threading
+from typing import Any
+from llama_index.bridge.pydantic import PrivateAttr
 from llama_index.llms import LlamaCPP
 from llama_index.llms.llama_utils import (
     messages_to_prompt,
     completion_to_prompt,
 )
 from src.config.config_loader import ConfigLoader
+from src.utils.llm_worker_pool import LLMWorkerPool, LlamaCPPWorkerPoolLLM
+from src.utils.prompt_cache import PromptPrefixCache
+
+DEFAULT_MODEL_NAME = "default"
+
+
+class PrefixCachedLlamaCPP(LlamaCPP):
+    """
+    LlamaCPP that loads the model state of the registered static prompt prefix before every completion,
+    so only the request specific part of the prompt is evaluated.
+    """
+
+    _prefix_cache: Any = PrivateAttr(default=None)
+
+    def set_prefix_cache(self, prefix_cache):
+        self._prefix_cache = prefix_cache
+
+    def _restore_prompt_prefix(self, prompt, formatted):
+        if not formatted:
+            prompt = self.completion_to_prompt(prompt)
+        if self._prefix_cache is not None:
+            self._prefix_cache.restore(prompt)
+        return prompt
+
+    def complete(self, prompt, formatted=False, **kwargs):
+        prompt = self._restore_prompt_prefix(prompt, formatted)
+        return super().complete(prompt, formatted=True, **kwargs)
+
+    def stream_complete(self, prompt, formatted=False, **kwargs):
+        prompt = self._restore_prompt_prefix(prompt, formatted)
+        return super().stream_complete(prompt, formatted=True, **kwargs)
 
 
 class LLMLoader:
     _instance = None
     _llm_instance = None
+    _llm_instances = {}
+    _prefix_caches = {}
+    _worker_pools = {}
+    _load_lock = threading.Lock()
     context_loader_instance = ConfigLoader()
 
     def __new__(cls):
         if not cls._instance:
             cls._instance = super(LLMLoader, cls).__new__(cls)
-            cls._llm_instance = cls._load_llm()
+            cls._llm_instance = cls._load_llm(DEFAULT_MODEL_NAME)
         return cls._instance
 
     @classmethod
-    def _load_llm(cls):
-        # Logic to load LLM instance from storage to memory
-        llm_params = cls.context_loader_instance.load_llm_config()
-        llm_instance = LlamaCPP(
+    def get_threads_per_worker(cls, llm_params):
+        threads_per_worker = llm_params.getint("threads_per_worker")
+        if threads_per_worker > 0:
+            return threads_per_worker
+        # the workers of every configured LLM share the CPU threads
+        total_workers = sum(
+            cls.context_loader_instance.load_llm_config(model_name).getint("num_workers")
+            for model_name in cls.context_loader_instance.load_llm_models_config()
+        )
+        return max(1, (os.cpu_count() - 2) // total_workers)
+
+    @classmethod
+    def build_llama_cpp(cls, llm_params, n_threads):
+        """
+        Loads a llama.cpp model with its prompt prefix cache.
+        Returns:
+            tuple: (PrefixCachedLlamaCPP instance, PromptPrefixCache or None)
+        """
+        llm_instance = PrefixCachedLlamaCPP(
             model_path=llm_params["llm_model_file"],
             temperature=int(llm_params["temperature"]),
             max_new_tokens=int(llm_params["max_new_tokens"]),
@@ -32,13 +85,104 @@ class LLMLoader:
             completion_to_prompt=completion_to_prompt,
             model_kwargs={
                 "n_gpu_layers": int(llm_params["n_gpu_layers"]),
-                "n_threads": os.cpu_count() - 2,
+                "n_threads": n_threads,
                 "repeat-penalty": float(llm_params["repeat_penalty"]),
+                # weights are memory mapped, so worker processes share them through the page cache
+                "use_mmap": True,
             },
             verbose=bool(llm_params["verbose_flag"]),
         )
 
-        return llm_instance
+        prefix_cache = None
+        if llm_params.getboolean("prefix_cache_enabled"):
+            paths = cls.context_loader_instance.load_path_config()
+            prefix_cache = PromptPrefixCache(
+                model=llm_instance._model,
+                model_path=llm_params["llm_model_file"],
+                capacity_bytes=llm_params.getint("prefix_cache_capacity_bytes"),
+                state_dir=paths["llm_state_directory"],
+                min_prefix_tokens=llm_params.getint("prefix_cache_min_tokens"),
+                completion_to_prompt=completion_to_prompt,
+            )
+            # restored explicitly before each completion, a llama_cpp cache (set_cache) would
+            # copy the whole model state after every completion
+            llm_instance.set_prefix_cache(prefix_cache)
+
+        return llm_instance, prefix_cache
+
+    @classmethod
+    def _load_llm(cls, model_name):
+        # Logic to load LLM instance from storage to memory
+        with cls._load_lock:
+            if model_name in cls._llm_instances:
+                return cls._llm_instances[model_name]
+
+            llm_params = cls.context_loader_instance.load_llm_config(model_name)
+            num_workers = llm_params.getint("num_workers")
+            n_threads = cls.get_threads_per_worker(llm_params)
+            if num_workers > 1:
+                cls._worker_pools[model_name] = LLMWorkerPool(
+                    num_workers=num_workers,
+                    n_threads=n_threads,
+                    model_name=model_name,
+                    start_method=llm_params["worker_start_method"],
+                )
+                llm_instance = LlamaCPPWorkerPoolLLM(
+                    pool=cls._worker_pools[model_name],
+                    model_name=llm_params["llm_model_file"],
+                    context_window=int(llm_params["context_window"]),
+                    num_output=int(llm_params["max_new_tokens"]),
+                    messages_to_prompt=messages_to_prompt,
+                    completion_to_prompt=completion_to_prompt,
+                )
+            else:
+                llm_instance, prefix_cache = cls.build_llama_cpp(llm_params, n_threads)
+                if prefix_cache is not None:
+                    cls._prefix_caches[model_name] = prefix_cache
+
+            cls._llm_instances[model_name] = llm_instance
+            return llm_instance
+
+    def get_model_name(self, template_name=None):
+        """
+        Returns:
+            str: Name of the LLM the prompt template is routed to, "default" when it is not routed.
+        """
+        if template_name is None:
+            return DEFAULT_MODEL_NAME
+        model_name = self.context_loader_instance.load_llm_routing_config().get(
+            template_name, DEFAULT_MODEL_NAME
+        )
+        if model_name not in self.context_loader_instance.load_llm_models_config():
+            raise ValueError(
+                f"Prompt template {template_name} is routed to unknown LLM {model_name}"
+            )
+        return model_name
+
+    def register_prompt_prefix(self, name, static_text):
+        model_name = self.get_model_name(name)
+        self.get_llm_instance(model_name)
+        if model_name in self._worker_pools:
+            self._worker_pools[model_name].register_prompt_prefix(name, static_text)
+        elif model_name in self._prefix_caches:
+            self._prefix_caches[model_name].register_prefix(name, static_text)
+
+    def get_concurrency(self, model_name=DEFAULT_MODEL_NAME):
+        self.get_llm_instance(model_name)
+        if model_name in self._worker_pools:
+            return self._worker_pools[model_name].num_workers
+        return 1
+
+    def get_worker_pool_stats(self):
+        return {
+            model_name: worker_pool.stats()
+            for model_name, worker_pool in self._worker_pools.items()
+        }
+
+    def get_llm_instance(self, model_name=DEFAULT_MODEL_NAME):
+        if model_name == DEFAULT_MODEL_NAME:
+            return self._llm_instance
+        return self._llm_instances.get(model_name) or self._load_llm(model_name)
 
-    def get_llm_instance(self):
-        return self._llm_instance
+    def get_llm_for_template(self, template_name):
+        return self.get_llm_instance(self.get_model_name(template_name))
@@ -0,0 +1,181 @@
+# llm_scheduler.py
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from src.config.config_loader import ConfigLoader
+from src.utils.llm_loader import DEFAULT_MODEL_NAME, LLMLoader
+
+PRIORITY_CLASSES = {"interactive": 0, "default": 1, "batch": 2}
+
+_request_priority = contextvars.ContextVar("llm_request_priority", default="default")
+
+
+class LLMQueueFullError(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMQueueTimeoutError(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def set_request_priority(priority):
+    """
+    Sets the priority class of the LLM calls made by the current request (thread / context).
+    """
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown LLM priority class {priority}")
+    return _request_priority.set(priority)
+
+
+@contextmanager
+def llm_priority(priority):
+    token = set_request_priority(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+class LLMScheduler:
+    """
+    Admission queue in front of one LLM, llama.cpp is not safe for concurrent use. There is one queue per named LLM.
+    At most max_concurrency calls run at once (by default one per LLM worker process), waiting calls are admitted by priority class and then in arrival order.
+    A call is rejected with LLMQueueFullError when max_queue_depth calls are already waiting,
+    and gives up with LLMQueueTimeoutError when it waited longer than its priority class' queue timeout.
+    A thread that already holds a slot passes straight through, so nested calls never deadlock.
+    """
+
+    _instances = {}
+    _instance_lock = threading.Lock()
+
+    def __new__(cls, model_name=DEFAULT_MODEL_NAME):
+        if model_name not in cls._instances:
+            with cls._instance_lock:
+                if model_name not in cls._instances:
+                    instance = super(LLMScheduler, cls).__new__(cls)
+                    instance._load(model_name)
+                    cls._instances[model_name] = instance
+        return cls._instances[model_name]
+
+    @classmethod
+    def for_template(cls, template_name):
+        return cls(LLMLoader().get_model_name(template_name))
+
+    @classmethod
+    def all_stats(cls):
+        return {
+            model_name: scheduler.stats()
+            for model_name, scheduler in list(cls._instances.items())
+        }
+
+    def _load(self, model_name):
+        scheduler_params = ConfigLoader().load_scheduler_config()
+        self.model_name = model_name
+        self.max_concurrency = scheduler_params.getint("max_concurrency")
+        if self.max_concurrency <= 0:
+            self.max_concurrency = LLMLoader().get_concurrency(model_name)
+        self.max_queue_depth = scheduler_params.getint("max_queue_depth")
+        self.retry_after_seconds = scheduler_params.getint("retry_after_seconds")
+        self.queue_timeouts = {
+            priority: scheduler_params.getfloat(f"{priority}_queue_timeout_seconds")
+            for priority in PRIORITY_CLASSES
+        }
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._active = 0
+        self._holder = threading.local()
+        self._stats = {
+            priority: {
+                "admitted": 0,
+                "rejected": 0,
+                "timed_out": 0,
+                "wait_seconds_total": 0.0,
+                "wait_seconds_max": 0.0,
+            }
+            for priority in PRIORITY_CLASSES
+        }
+
+    def _can_admit(self, ticket):
+        return self._active < self.max_concurrency and self._waiting[0] is ticket
+
+    def acquire(self, priority=None, timeout=None):
+        priority = priority or _request_priority.get()
+        timeout = self.queue_timeouts[priority] if timeout is None else timeout
+        stats = self._stats[priority]
+        start_time = time.perf_counter()
+        with self._condition:
+            if len(self._waiting) >= self.max_queue_depth:
+                stats["rejected"] += 1
+                raise LLMQueueFullError(
+                    f"LLM queue is full ({len(self._waiting)} requests waiting)",
+                    retry_after=self.retry_after_seconds,
+                )
+            ticket = [PRIORITY_CLASSES[priority], next(self._sequence)]
+            heapq.heappush(self._waiting, ticket)
+            deadline = start_time + timeout
+            while not self._can_admit(ticket):
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    stats["timed_out"] += 1
+                    self._condition.notify_all()
+                    raise LLMQueueTimeoutError(
+                        f"Waited {timeout}s for the LLM without being admitted",
+                        retry_after=self.retry_after_seconds,
+                    )
+                self._condition.wait(remaining)
+            heapq.heappop(self._waiting)
+            self._active += 1
+            wait_seconds = time.perf_counter() - start_time
+            stats["admitted"] += 1
+            stats["wait_seconds_total"] += wait_seconds
+            stats["wait_seconds_max"] = max(stats["wait_seconds_max"], wait_seconds)
+            # the next waiter may be admissible too when max_concurrency > 1
+            self._condition.notify_all()
+        return wait_seconds
+
+    def release(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, priority=None, timeout=None):
+        if getattr(self._holder, "depth", 0) > 0:
+            self._holder.depth += 1
+            try:
+                yield
+            finally:
+                self._holder.depth -= 1
+            return
+
+        self.acquire(priority=priority, timeout=timeout)
+        self._holder.depth = 1
+        try:
+            yield
+        finally:
+            self._holder.depth = 0
+            self.release()
+
+    def stats(self):
+        with self._condition:
+            return {
+                "model_name": self.model_name,
+                "active": self._active,
+                "queue_depth": len(self._waiting),
+                "max_concurrency": self.max_concurrency,
+                "max_queue_depth": self.max_queue_depth,
+                "priorities": {
+                    priority: dict(priority_stats)
+                    for priority, priority_stats in self._stats.items()
+                },
+            }
@@ -0,0 +1,255 @@
+# llm_worker_pool.py
+import atexit
+import itertools
+import multiprocessing
+import queue
+import threading
+from typing import Any
+from llama_index.bridge.pydantic import Field, PrivateAttr
+from llama_index.llms import CustomLLM
+from llama_index.llms.base import llm_completion_callback
+from llama_index.llms.types import CompletionResponse, LLMMetadata
+
+
+def run_llm_worker(worker_id, n_threads, model_name, request_queue, response_queue):
+    """
+    Entry point of an LLM worker process: loads its own llama.cpp context and serves completions
+    until it receives a "stop" message.
+    """
+    # imported here, llm_loader imports this module
+    from src.utils.llm_loader import LLMLoader
+
+    llm_params = LLMLoader.context_loader_instance.load_llm_config(model_name)
+    llm_instance, prefix_cache = LLMLoader.build_llama_cpp(llm_params, n_threads)
+    response_queue.put(("ready", worker_id, None))
+    while True:
+        message = request_queue.get()
+        if message[0] == "stop":
+            break
+        if message[0] == "register_prefix":
+            if prefix_cache is not None:
+                prefix_cache.register_prefix(message[1], message[2])
+            continue
+
+        _, request_id, prompt, formatted, stream = message
+        try:
+            if stream:
+                text = ""
+                for response in llm_instance.stream_complete(
+                    prompt, formatted=formatted
+                ):
+                    if response.delta:
+                        response_queue.put(("delta", request_id, response.delta))
+                    text = response.text
+            else:
+                text = llm_instance.complete(prompt, formatted=formatted).text
+            response_queue.put(("done", request_id, text))
+        except Exception as er:
+            response_queue.put(
+                ("error", request_id, f"{er.__class__.__name__}: {er}")
+            )
+
+
+class LLMWorkerPool:
+    """
+    Pool of LLM worker processes, each with its own llama.cpp context and n_threads threads.
+    The GGUF weights are memory mapped, so the processes share one copy through the page cache.
+    Completions go to the worker with the fewest requests in flight;
+    a dispatcher thread routes the workers' responses back to the waiting callers.
+    """
+
+    def __init__(self, num_workers, n_threads, model_name="default", start_method="fork"):
+        self.num_workers = num_workers
+        self.n_threads = n_threads
+        self.model_name = model_name
+        # "spawn" and "forkserver" import the main module again in every worker,
+        # only use them when the entry point does not build the APIs at import time
+        context = multiprocessing.get_context(start_method)
+        self._response_queue = context.Queue()
+        self._request_queues = [context.Queue() for _ in range(num_workers)]
+        self._processes = [
+            context.Process(
+                target=run_llm_worker,
+                args=(
+                    worker_id,
+                    n_threads,
+                    model_name,
+                    self._request_queues[worker_id],
+                    self._response_queue,
+                ),
+                name=f"llm-worker-{model_name}-{worker_id}",
+                daemon=True,
+            )
+            for worker_id in range(num_workers)
+        ]
+        self._in_flight = [0] * num_workers
+        self._completed = [0] * num_workers
+        self._pending = {}
+        self._request_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._ready = [threading.Event() for _ in range(num_workers)]
+        self._closed = False
+        for process in self._processes:
+            process.start()
+        self._dispatcher = threading.Thread(
+            target=self._dispatch, name="llm-pool-dispatcher", daemon=True
+        )
+        self._dispatcher.start()
+        atexit.register(self.close)
+        for worker_id, ready in enumerate(self._ready):
+            while not ready.wait(timeout=1):
+                if not self._processes[worker_id].is_alive():
+                    self.close()
+                    raise RuntimeError(f"LLM worker {worker_id} died while loading the model")
+
+    def _dispatch(self):
+        while True:
+            # a busy response queue must not hide a worker that died with requests in flight
+            self._fail_dead_workers()
+            try:
+                kind, request_id, payload = self._response_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            if kind == "ready":
+                self._ready[request_id].set()
+                continue
+            with self._lock:
+                pending = self._pending.get(request_id)
+                if pending is None:
+                    continue
+                worker_id, responses = pending
+                if kind in ("done", "error"):
+                    del self._pending[request_id]
+                    self._in_flight[worker_id] -= 1
+                    self._completed[worker_id] += 1
+            responses.put((kind, payload))
+
+    def _fail_dead_workers(self):
+        with self._lock:
+            dead_workers = {
+                worker_id
+                for worker_id, _ in self._pending.values()
+                if not self._processes[worker_id].is_alive()
+            }
+            if not dead_workers:
+                return
+            for request_id, (worker_id, responses) in list(self._pending.items()):
+                if worker_id in dead_workers:
+                    del self._pending[request_id]
+                    self._in_flight[worker_id] -= 1
+                    responses.put(("error", f"LLM worker {worker_id} died"))
+
+    def _submit(self, prompt, formatted, stream):
+        responses = queue.Queue()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The LLM worker pool is closed")
+            alive_workers = [
+                worker_id
+                for worker_id, process in enumerate(self._processes)
+                if process.is_alive()
+            ]
+            if not alive_workers:
+                raise RuntimeError("No LLM worker process is alive")
+            worker_id = min(
+                alive_workers, key=lambda worker_id: self._in_flight[worker_id]
+            )
+            request_id = next(self._request_ids)
+            self._pending[request_id] = (worker_id, responses)
+            self._in_flight[worker_id] += 1
+        self._request_queues[worker_id].put(
+            ("complete", request_id, prompt, formatted, stream)
+        )
+        return responses
+
+    def complete(self, prompt, formatted=False):
+        kind, payload = self._submit(prompt, formatted, stream=False).get()
+        if kind == "error":
+            raise RuntimeError(payload)
+        return payload
+
+    def stream_complete(self, prompt, formatted=False):
+        responses = self._submit(prompt, formatted, stream=True)
+        while True:
+            kind, payload = responses.get()
+            if kind == "error":
+                raise RuntimeError(payload)
+            if kind == "done":
+                return
+            yield payload
+
+    def register_prompt_prefix(self, name, static_text):
+        for request_queue in self._request_queues:
+            request_queue.put(("register_prefix", name, static_text))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "model_name": self.model_name,
+                "num_workers": self.num_workers,
+                "threads_per_worker": self.n_threads,
+                "in_flight": list(self._in_flight),
+                "completed": list(self._completed),
+                "alive": [process.is_alive() for process in self._processes],
+            }
+
+    def close(self):
+        """
+        Stops the worker processes, called at exit. Workers that do not stop in time are terminated.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        atexit.unregister(self.close)
+        for worker_id, request_queue in enumerate(self._request_queues):
+            if self._processes[worker_id].is_alive():
+                request_queue.put(("stop",))
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+
+class LlamaCPPWorkerPoolLLM(CustomLLM):
+    """
+    llama_index LLM that sends its completions to an LLMWorkerPool.
+    Prompts are wrapped with completion_to_prompt by the worker's LlamaCPP, exactly like the in-process model.
+    """
+
+    model_name: str = Field(description="The GGUF model file served by the pool.")
+    context_window: int = Field(description="The context window of the model.")
+    num_output: int = Field(description="The maximum number of generated tokens.")
+
+    _pool: Any = PrivateAttr()
+
+    def __init__(self, pool, **kwargs):
+        super().__init__(**kwargs)
+        self._pool = pool
+
+    @classmethod
+    def class_name(cls):
+        return "LlamaCPPWorkerPoolLLM"
+
+    @property
+    def metadata(self):
+        return LLMMetadata(
+            context_window=self.context_window,
+            num_output=self.num_output,
+            model_name=self.model_name,
+        )
+
+    @llm_completion_callback()
+    def complete(self, prompt, formatted=False, **kwargs):
+        return CompletionResponse(text=self._pool.complete(prompt, formatted=formatted))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt, formatted=False, **kwargs):
+        def gen():
+            text = ""
+            for delta in self._pool.stream_complete(prompt, formatted=formatted):
+                text += delta
+                yield CompletionResponse(text=text, delta=delta)
+
+        return gen()
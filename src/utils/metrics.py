@@ -0,0 +1,212 @@
+# metrics.py
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+
+_metrics_endpoint = contextvars.ContextVar("metrics_endpoint", default="none")
+
+
+def set_metrics_endpoint(endpoint):
+    """
+    Sets the endpoint label of the metrics recorded by the current request (thread / context).
+    """
+    return _metrics_endpoint.set(endpoint or "none")
+
+
+@contextmanager
+def metrics_endpoint(endpoint):
+    token = set_metrics_endpoint(endpoint)
+    try:
+        yield
+    finally:
+        _metrics_endpoint.reset(token)
+
+
+def get_metrics_endpoint():
+    return _metrics_endpoint.get()
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.append(
+                f"{self.name}{format_labels(self.label_names, label_values)} {value}"
+            )
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self, name, documentation, label_names=(), buckets=DEFAULT_LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> [per bucket counts (+Inf last), sum]
+        self._values = {}
+
+    def observe(self, value, *label_values):
+        bucket_index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = [[0] * (len(self.buckets) + 1), 0.0]
+                self._values[label_values] = series
+            series[0][bucket_index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start_time, *label_values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = sorted(
+                (label_values, list(counts), total)
+                for label_values, (counts, total) in self._values.items()
+            )
+        for label_values, counts, total in values:
+            cumulative = 0
+            for upper_bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if upper_bound == float("inf") else repr(upper_bound)
+                labels = format_labels(self.label_names, label_values, ("le", le))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "sql_assistant_request_duration_seconds",
+    "End to end latency of the API requests.",
+    label_names=("endpoint",),
+)
+STAGE_LATENCY = Histogram(
+    "sql_assistant_stage_duration_seconds",
+    "Latency of the stages of answering a question (cache lookup, schema retrieval, SQL generation, "
+    "SQL refinement, SQL execution, result formatting, summary, ...).",
+    label_names=("endpoint", "stage"),
+)
+REFINER_RETRIES = Counter(
+    "sql_assistant_refiner_retries_total",
+    "SQL queries sent back to the LLM with refiner_template after a SQLite error.",
+    label_names=("endpoint",),
+)
+QUERY_ERRORS = Counter(
+    "sql_assistant_query_errors_total",
+    "Questions answered with 'Could not process query.'.",
+    label_names=("endpoint",),
+)
+CACHE_REQUESTS = Counter(
+    "sql_assistant_cache_requests_total",
+    "Lookups in the SQL, semantic and result caches.",
+    label_names=("cache", "outcome"),
+)
+GUARDED_QUERIES = Counter(
+    "sql_assistant_guarded_queries_total",
+    "Queries stopped (time_budget_exceeded), rejected (expensive_query) or flagged by the SQL guardrails.",
+    label_names=("endpoint", "outcome"),
+)
+SUMMARIES = Counter(
+    "sql_assistant_summaries_total",
+    "Results summarised, by summariser (rules or llm).",
+    label_names=("endpoint", "summariser"),
+)
+
+ALL_METRICS = (
+    REQUEST_LATENCY,
+    STAGE_LATENCY,
+    REFINER_RETRIES,
+    QUERY_ERRORS,
+    CACHE_REQUESTS,
+    GUARDED_QUERIES,
+    SUMMARIES,
+)
+
+
+@contextmanager
+def observe_stage(stage):
+    """
+    Times a stage of the current request into STAGE_LATENCY, labelled with the request's endpoint.
+    """
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(
+            time.perf_counter() - start_time, _metrics_endpoint.get(), stage
+        )
+
+
+def observe_stage_items(stage, items):
+    """
+    Yields the items of a generator (e.g. streamed LLM tokens), timing into STAGE_LATENCY only the time
+    spent producing them, not the time the consumer (e.g. a client reading a stream) takes between items.
+    """
+    elapsed = 0.0
+    iterator = iter(items)
+    try:
+        while True:
+            start_time = time.perf_counter()
+            try:
+                item = next(iterator)
+            finally:
+                elapsed += time.perf_counter() - start_time
+            yield item
+    except StopIteration:
+        return
+    finally:
+        STAGE_LATENCY.observe(elapsed, _metrics_endpoint.get(), stage)
+
+
+def render_metrics():
+    """
+    Returns:
+        str: Every metric in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
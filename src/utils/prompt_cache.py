@@ -0,0 +1,205 @@
+# prompt_cache.py
+import copy
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from string import Formatter
+from llama_cpp import Llama
+
+# splits a wrapped prompt where its static prefix ends
+PREFIX_END_MARKER = "\x00prefix-end\x00"
+
+
+def get_static_prefix(template, static_fields):
+    """
+    Renders the part of a prompt template that is identical for every request:
+    everything before the first placeholder that is not in static_fields (e.g. query, evidence, result).
+    Args:
+        template (str): The prompt template.
+        static_fields (dict): Values of the placeholders that do not change between requests.
+    Returns:
+        str: The rendered static prefix.
+    """
+    static_prefix = ""
+    for literal_text, field_name, _, _ in Formatter().parse(template):
+        static_prefix += literal_text
+        if field_name is None:
+            continue
+        if field_name not in static_fields:
+            break
+        static_prefix += str(static_fields[field_name])
+    return static_prefix
+
+
+def get_prompt_prefix(static_text, completion_to_prompt=None):
+    """
+    Returns:
+        str: The start of the prompt the model receives for a prompt starting with static_text,
+            i.e. static_text wrapped by completion_to_prompt up to its end.
+    """
+    if completion_to_prompt is None:
+        return static_text
+    wrapped_prompt = completion_to_prompt(static_text + PREFIX_END_MARKER)
+    return wrapped_prompt.split(PREFIX_END_MARKER)[0]
+
+
+class PromptPrefixCache:
+    """
+    Model states right after the static prefix of each registered prompt template, keyed by the prefix tokens.
+    Before a completion, restore looks up the longest registered prefix the prompt tokens start with and loads
+    its state, so llama_cpp only evaluates the question specific suffix. Nothing is saved after completions.
+    States are computed the first time a prefix is used and saved to disk, so warm restarts skip the prefill.
+    """
+
+    def __init__(
+        self,
+        model: Llama,
+        model_path,
+        capacity_bytes=4 << 30,
+        state_dir=None,
+        min_prefix_tokens=256,
+        completion_to_prompt=None,
+    ):
+        self._model = model
+        self.capacity_bytes = capacity_bytes
+        self._state_dir = state_dir
+        self.min_prefix_tokens = min_prefix_tokens
+        self._completion_to_prompt = completion_to_prompt
+        self._prefix_tokens = {}
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        model_stat = os.stat(model_path)
+        self._model_id = "|".join(
+            [
+                os.path.realpath(model_path),
+                str(model_stat.st_size),
+                str(model_stat.st_mtime_ns),
+                str(model.n_ctx()),
+            ]
+        )
+
+    def tokenize(self, text):
+        # the same tokenization llama_cpp applies to completion prompts
+        return tuple(self._model.tokenize(text.encode("utf-8"), special=True))
+
+    def register_prefix(self, name, static_text):
+        prefix_text = get_prompt_prefix(static_text, self._completion_to_prompt)
+        # the last token may merge with the start of the variable part of the prompt
+        prefix_tokens = self.tokenize(prefix_text)[:-1]
+        if len(prefix_tokens) >= self.min_prefix_tokens:
+            self._prefix_tokens[name] = prefix_tokens
+
+    @property
+    def cache_size(self):
+        return sum(self._get_state_size(state) for state in self._states.values())
+
+    @staticmethod
+    def _get_state_size(state):
+        return state.llama_state_size + state.scores.nbytes
+
+    def find_prefix(self, prompt_tokens):
+        """
+        Returns:
+            tuple: Tokens of the longest registered prefix the prompt starts with, None if none matches.
+        """
+        longest_prefix = None
+        for prefix_tokens in self._prefix_tokens.values():
+            if (
+                len(prefix_tokens) < len(prompt_tokens)
+                and prompt_tokens[: len(prefix_tokens)] == prefix_tokens
+                and (longest_prefix is None or len(prefix_tokens) > len(longest_prefix))
+            ):
+                longest_prefix = prefix_tokens
+        return longest_prefix
+
+    def _get_state_file(self, key):
+        hasher = hashlib.sha256(self._model_id.encode("utf-8"))
+        hasher.update(str(key).encode("utf-8"))
+        return os.path.join(self._state_dir, f"{hasher.hexdigest()[:32]}.pkl")
+
+    def _load_state(self, key):
+        if not self._state_dir:
+            return None
+        state_file = self._get_state_file(key)
+        if not os.path.exists(state_file):
+            return None
+        try:
+            with open(state_file, "rb") as file:
+                return pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _save_state(self, key, state):
+        if not self._state_dir:
+            return
+        os.makedirs(self._state_dir, exist_ok=True)
+        state_file = self._get_state_file(key)
+        with open(state_file + ".tmp", "wb") as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(state_file + ".tmp", state_file)
+
+    def _compute_state(self, key):
+        self._model.reset()
+        self._model.eval(list(key))
+        state = copy.copy(self._model.save_state())
+        # the logits of the prefix positions are never sampled from, keep the last row only.
+        # load_state broadcasts it over the prefix rows.
+        state.scores = state.scores[-1:].copy()
+        return state
+
+    def _store(self, key, state):
+        self._states[key] = state
+        while self.cache_size > self.capacity_bytes and len(self._states) > 1:
+            self._states.popitem(last=False)
+
+    def _get_state(self, key):
+        state = self._states.get(key)
+        if state is None:
+            state = self._load_state(key)
+            if state is None:
+                state = self._compute_state(key)
+                self._save_state(key, state)
+            self._store(key, state)
+        self._states.move_to_end(key)
+        return state
+
+    def _holds_prefix(self, prefix_tokens):
+        n_tokens = len(prefix_tokens)
+        return (
+            self._model.n_tokens >= n_tokens
+            and tuple(self._model.input_ids[:n_tokens].tolist()) == prefix_tokens
+        )
+
+    def restore(self, prompt):
+        """
+        Loads the model state of the longest registered prefix of the (formatted) prompt, unless the model
+        context already starts with it. Called right before the completion.
+        Returns:
+            int: Number of prompt tokens covered by the prefix, 0 if no registered prefix matches.
+        """
+        if not self._prefix_tokens:
+            return 0
+        prefix_tokens = self.find_prefix(self.tokenize(prompt))
+        if prefix_tokens is None:
+            return 0
+        with self._lock:
+            self.hits += 1
+            # llama_cpp reuses the matching start of its context by itself
+            if not self._holds_prefix(prefix_tokens):
+                self._model.load_state(self._get_state(prefix_tokens))
+                self.loads += 1
+        return len(prefix_tokens)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "prefixes": len(self._prefix_tokens),
+                "states": len(self._states),
+                "bytes": self.cache_size,
+                "hits": self.hits,
+                "loads": self.loads,
+            }
@@ -0,0 +1,221 @@
+# query_guard.py
+import re
+import time
+from contextlib import contextmanager
+
+PREFLIGHT_ACTIONS = ("reject", "flag", "off")
+AGGREGATION_PATTERN = re.compile(
+    r"\b(count|sum|avg|min|max|total|group_concat)\s*\(|\bgroup\s+by\b|\bdistinct\b",
+    re.IGNORECASE,
+)
+LIMIT_PATTERN = re.compile(r"\blimit\s+\d+", re.IGNORECASE)
+WHERE_PATTERN = re.compile(r"\bwhere\b", re.IGNORECASE)
+# FROM / JOIN / , <table> [AS] <alias>, query plans name tables by their alias
+TABLE_ALIAS_PATTERN = re.compile(
+    r"(?:\bfrom|\bjoin|,)\s+[\"`\[]?(\w+)[\"`\]]?(?:\s+(?:as\s+)?"
+    r"(?!(?:from|where|join|on|using|group|order|limit|left|right|inner|outer|cross|natural|union|except|intersect)\b)(\w+))?",
+    re.IGNORECASE,
+)
+SCAN_PATTERN = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+UNAVAILABLE_DATABASE_PATTERN = re.compile(
+    r"database is locked|unable to open database|disk i/o error|database disk image is malformed",
+    re.IGNORECASE,
+)
+
+
+class QueryGuardError(Exception):
+    """
+    A query stopped or refused by the guardrails. to_error_dict() has the shape of the sqlite_error dicts
+    run_sql_query returns, plus the error type and whether the refiner can fix the SQL.
+    """
+
+    error_type = "query_guard"
+    refinable = True
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.details = details or {}
+
+    def to_error_dict(self):
+        return {
+            "sqlite_error": " ".join(str(arg) for arg in self.args),
+            "exception_class": str(self.__class__),
+            "error_type": self.error_type,
+            "refinable": self.refinable,
+            "details": self.details,
+        }
+
+
+class QueryTimeBudgetExceededError(QueryGuardError):
+    error_type = "time_budget_exceeded"
+
+
+class QueryCostRejectedError(QueryGuardError):
+    error_type = "expensive_query"
+
+
+def get_sqlite_error_dict(er):
+    message = " ".join(str(arg) for arg in er.args)
+    return {
+        "sqlite_error": message,
+        "exception_class": str(er.__class__),
+        "error_type": "sqlite_error",
+        # nothing wrong with the SQL when the database itself is unavailable
+        "refinable": UNAVAILABLE_DATABASE_PATTERN.search(message) is None,
+        "details": {},
+    }
+
+
+class QueryGuard:
+    """
+    Guardrails of the LLM generated queries:
+        a time budget per query, enforced by a SQLite progress handler that interrupts the statement once it is spent
+        an EXPLAIN QUERY PLAN preflight that rejects (or flags) full scans of large tables without
+        filter or aggregation and nested loop joins over full scans of large tables (cartesian joins)
+    """
+
+    def __init__(self, guard_params):
+        self.time_budget_seconds = guard_params.getfloat("time_budget_seconds")
+        self.progress_handler_steps = guard_params.getint("progress_handler_steps")
+        self.preflight_action = guard_params["preflight_action"]
+        self.large_table_rows = guard_params.getint("large_table_rows")
+        if self.preflight_action not in PREFLIGHT_ACTIONS:
+            raise ValueError(f"Unknown preflight action {self.preflight_action}")
+        self._table_row_counts = None
+        self._table_row_counts_version = None
+
+    @contextmanager
+    def time_budget(self, dbapi_connection, time_budget_seconds=None):
+        """
+        Limits the statements run on the sqlite3 connection inside the block, fetching included,
+        to the time budget. Raises QueryTimeBudgetExceededError when they are stopped.
+        """
+        budget = time_budget_seconds or self.time_budget_seconds
+        deadline = time.monotonic() + budget
+
+        def progress_handler():
+            # a non zero return value interrupts the statement
+            return int(time.monotonic() > deadline)
+
+        if budget > 0:
+            dbapi_connection.set_progress_handler(
+                progress_handler, self.progress_handler_steps
+            )
+        try:
+            yield
+        except Exception as er:
+            if budget > 0 and time.monotonic() > deadline:
+                raise QueryTimeBudgetExceededError(
+                    f"The query was stopped after its time budget of {budget:g} seconds. "
+                    "Make it cheaper: filter with WHERE on the needed values, aggregate with GROUP BY "
+                    "and join tables only on their key columns.",
+                    details={"time_budget_seconds": budget},
+                ) from er
+            raise
+        finally:
+            dbapi_connection.set_progress_handler(None, 0)
+
+    def get_table_row_counts(self, dbapi_connection, data_version):
+        """
+        Row count of every table, from the ANALYZE statistics when present, else the largest rowid
+        (an estimate that costs a single index lookup). Recomputed when the data version changes.
+        """
+        if self._table_row_counts_version == data_version:
+            return self._table_row_counts
+        table_names = [
+            row[0]
+            for row in dbapi_connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+            )
+        ]
+        row_counts = {}
+        try:
+            for table_name, stat in dbapi_connection.execute(
+                "SELECT tbl, stat FROM sqlite_stat1"
+            ):
+                row_counts[table_name] = int(stat.split()[0])
+        except Exception:
+            # no ANALYZE statistics
+            pass
+        for table_name in table_names:
+            if table_name in row_counts:
+                continue
+            try:
+                row_counts[table_name] = (
+                    dbapi_connection.execute(
+                        f'SELECT MAX(rowid) FROM "{table_name}"'
+                    ).fetchone()[0]
+                    or 0
+                )
+            except Exception:
+                # WITHOUT ROWID table
+                row_counts[table_name] = 0
+        self._table_row_counts = row_counts
+        self._table_row_counts_version = data_version
+        return row_counts
+
+    @staticmethod
+    def get_table_aliases(sql_query):
+        aliases = {}
+        for table_name, alias in TABLE_ALIAS_PATTERN.findall(sql_query):
+            aliases[table_name] = table_name
+            if alias:
+                aliases[alias] = table_name
+        return aliases
+
+    def preflight(self, dbapi_connection, sql_query, data_version):
+        """
+        Checks the query plan of a query before it runs.
+        Returns:
+            list: Reasons the query is expensive, empty when it looks fine.
+        Raises:
+            QueryCostRejectedError: When the query is expensive and preflight_action is reject.
+        """
+        if self.preflight_action == "off":
+            return []
+        try:
+            plan = list(dbapi_connection.execute(f"EXPLAIN QUERY PLAN {sql_query}"))
+        except Exception:
+            # invalid SQL, running it reports the error
+            return []
+        row_counts = self.get_table_row_counts(dbapi_connection, data_version)
+        aliases = self.get_table_aliases(sql_query)
+
+        # parent id of the plan node -> large tables fully scanned under it
+        large_scans = {}
+        for _, parent, _, detail in plan:
+            match = SCAN_PATTERN.match(detail)
+            if match is None:
+                continue
+            table_name = aliases.get(match.group(1), match.group(1))
+            if row_counts.get(table_name, 0) >= self.large_table_rows:
+                large_scans.setdefault(parent, []).append(table_name)
+
+        reasons = []
+        scanned_tables = sorted({t for tables in large_scans.values() for t in tables})
+        # a scan returning the whole table, filtered scans and aggregations return far fewer rows
+        if scanned_tables and not (
+            AGGREGATION_PATTERN.search(sql_query)
+            or LIMIT_PATTERN.search(sql_query)
+            or WHERE_PATTERN.search(sql_query)
+        ):
+            reasons.append(
+                f"it returns every row of {', '.join(scanned_tables)} "
+                f"({', '.join(f'{row_counts[t]:,}' for t in scanned_tables)} rows) without filtering, aggregating or limiting them"
+            )
+        for tables in large_scans.values():
+            if len(tables) > 1:
+                reasons.append(
+                    f"it joins full scans of {' and '.join(tables)} in nested loops (a join without an indexed join condition)"
+                )
+        if reasons and self.preflight_action == "reject":
+            raise QueryCostRejectedError(
+                "The query was rejected before running because "
+                + "; ".join(reasons)
+                + ". Filter with WHERE, aggregate with GROUP BY or add a LIMIT, and join tables on their key columns.",
+                details={
+                    "reasons": reasons,
+                    "query_plan": [detail for _, _, _, detail in plan],
+                },
+            )
+        return reasons
@@ -0,0 +1,215 @@
+# request_profiler.py
+import cProfile
+import glob
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILER_MODES = ("cprofile", "sampling")
+# request ids end up in file names
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def get_request_id(request_id=None):
+    if request_id and REQUEST_ID_PATTERN.match(request_id):
+        return request_id
+    return uuid.uuid4().hex
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread every interval and counts the collapsed stacks
+    ("outer;...;inner count" lines, the input format of flamegraph.pl and speedscope).
+    Only the sampler thread does any work, the profiled thread runs at full speed.
+    """
+
+    def __init__(self, thread_id, interval_seconds=0.005):
+        self.thread_id = thread_id
+        self.interval_seconds = interval_seconds
+        self._stacks = Counter()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def get_frame_name(frame):
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            stack.append(self.get_frame_name(frame))
+            frame = frame.f_back
+        if stack:
+            self._stacks[";".join(reversed(stack))] += 1
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval_seconds):
+            self.sample()
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="request-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+
+    def write(self, file_path):
+        with open(file_path, "w") as file:
+            for stack, count in self._stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+class RequestProfiler:
+    """
+    Opt-in profiling of single requests: a request carrying the trigger header or query parameter
+    (and the shared token, when one is configured) runs under cProfile (a .pstats artifact) or under the
+    sampling profiler (a .folded collapsed stack artifact), written to output_directory and named after
+    the request id. Only the thread handling the request is profiled.
+    """
+
+    def __init__(self, profiling_params):
+        self.default_mode = profiling_params["default_mode"]
+        self.trigger_header = profiling_params["trigger_header"]
+        self.trigger_query_param = profiling_params["trigger_query_param"]
+        self.token_header = profiling_params["token_header"]
+        self.token = profiling_params["token"]
+        self.sampling_interval_seconds = (
+            profiling_params.getfloat("sampling_interval_ms") / 1000
+        )
+        self.output_directory = profiling_params["output_directory"]
+        self.max_artifacts = profiling_params.getint("max_artifacts")
+        if self.default_mode not in PROFILER_MODES:
+            raise ValueError(f"Unknown profiler mode {self.default_mode}")
+
+    def get_requested_mode(self, headers, args):
+        """
+        Returns:
+            str: The profiler mode the request asked for, None when it is not to be profiled.
+        """
+        requested = headers.get(self.trigger_header) or args.get(self.trigger_query_param)
+        if not requested or requested.lower() in ("0", "false", "no"):
+            return None
+        if self.token and not hmac.compare_digest(
+            headers.get(self.token_header, ""), self.token
+        ):
+            return None
+        requested = requested.lower()
+        return requested if requested in PROFILER_MODES else self.default_mode
+
+    def start(self, mode):
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                return profiler
+            except ValueError:
+                # only one deterministic profiler can be active at a time, sample this request instead
+                pass
+        profiler = SamplingProfiler(
+            thread_id=threading.get_ident(),
+            interval_seconds=self.sampling_interval_seconds,
+        )
+        profiler.start()
+        return profiler
+
+    def stop(self, profiler, request_id, label=""):
+        """
+        Stops the profiler and writes its artifact.
+        Returns:
+            str: Path of the artifact.
+        """
+        os.makedirs(self.output_directory, exist_ok=True)
+        name = "-".join(
+            part
+            for part in (time.strftime("%Y%m%dT%H%M%S"), label, request_id)
+            if part
+        )
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+            artifact_path = os.path.join(self.output_directory, f"{name}.pstats")
+            profiler.dump_stats(artifact_path)
+        else:
+            profiler.stop()
+            artifact_path = os.path.join(self.output_directory, f"{name}.folded")
+            profiler.write(artifact_path)
+        self.remove_old_artifacts()
+        return artifact_path
+
+    def remove_old_artifacts(self):
+        artifacts = sorted(
+            glob.glob(os.path.join(self.output_directory, "*.pstats"))
+            + glob.glob(os.path.join(self.output_directory, "*.folded")),
+            key=os.path.getmtime,
+        )
+        for artifact_path in artifacts[: max(0, len(artifacts) - self.max_artifacts)]:
+            try:
+                os.remove(artifact_path)
+            except OSError:
+                pass
+
+    @contextmanager
+    def profile(self, request_id=None, mode=None, label=""):
+        """
+        Profiles the enclosed block, e.g. an api.api call chain run outside of Flask.
+        Yields:
+            dict: "request_id", and "artifact_path" once the block is done.
+        """
+        session = {"request_id": get_request_id(request_id), "artifact_path": None}
+        profiler = self.start(mode or self.default_mode)
+        try:
+            yield session
+        finally:
+            session["artifact_path"] = self.stop(
+                profiler, session["request_id"], label=label
+            )
+
+
+def register_request_profiler(app, profiling_params):
+    """
+    Installs the request profiling hooks on the Flask app. Only called when profiling is enabled,
+    so requests pay nothing for it otherwise.
+    """
+    from flask import g, request
+
+    request_profiler = RequestProfiler(profiling_params)
+
+    @app.before_request
+    def start_request_profiler():
+        mode = request_profiler.get_requested_mode(request.headers, request.args)
+        if mode is None:
+            return
+        g.profile_request_id = get_request_id(request.headers.get("X-Request-ID"))
+        g.request_profiler = request_profiler.start(mode)
+
+    @app.after_request
+    def add_profile_headers(response):
+        if "request_profiler" in g:
+            response.headers["X-Request-ID"] = g.profile_request_id
+            response.headers["X-Profile-Id"] = g.profile_request_id
+        return response
+
+    # teardown runs once a streamed response has been fully generated too
+    @app.teardown_request
+    def stop_request_profiler(er=None):
+        profiler = g.pop("request_profiler", None)
+        if profiler is None:
+            return
+        artifact_path = request_profiler.stop(
+            profiler, g.profile_request_id, label=request.endpoint or ""
+        )
+        app.logger.info(
+            f"request {g.profile_request_id} profile written to {artifact_path}"
+        )
+
+    return request_profiler
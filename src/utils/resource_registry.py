@@ -0,0 +1,222 @@
+# resource_registry.py
+import threading
+from src.cache.query_cache import SQLQueryCache
+from src.cache.semantic_cache import SemanticQueryCache
+from src.config.config_loader import ConfigLoader
+from src.index.index_creator import TABLE_RETRIEVER_TOP_K, IndexCreator
+from src.index.schema_retriever import SchemaColumnRetriever
+from src.service_context.embedding_service import get_embedding_model_id
+from src.utils.llm_loader import LLMLoader
+from src.utils.prompt_cache import get_static_prefix
+from src.utils.token_budget import (
+    QUERY_ENGINE_TEMPLATES,
+    PromptBudget,
+    get_query_engine_overhead,
+)
+from src.utils.utils import DatabaseUtils, Logger
+
+# name the query engine's text-to-SQL prompt prefix is registered under, routed to the default LLM
+TEXT_TO_SQL_PREFIX_NAME = "text_to_sql_prompt"
+
+
+class ResourceRegistry:
+    """
+    Process-wide registry of the expensive resources shared by every API class.
+    Each resource is created lazily on first access and then handed out to all callers,
+    so the database is reflected, the query engine is built and the schema string is rendered only once.
+    """
+
+    _instance = None
+    _lock = threading.RLock()
+
+    def __new__(cls):
+        if not cls._instance:
+            with cls._lock:
+                if not cls._instance:
+                    cls._instance = super(ResourceRegistry, cls).__new__(cls)
+                    cls._instance._resources = {}
+        return cls._instance
+
+    def _get_or_create(self, name, factory):
+        resource = self._resources.get(name)
+        if resource is None:
+            with self._lock:
+                resource = self._resources.get(name)
+                if resource is None:
+                    resource = factory()
+                    self._resources[name] = resource
+        return resource
+
+    @property
+    def index_creator(self):
+        def factory():
+            index_creator_instance = IndexCreator()
+            index_creator_instance.build_database_schema()
+            return index_creator_instance
+
+        return self._get_or_create("index_creator", factory)
+
+    @property
+    def engine(self):
+        return self.index_creator._sql_database.engine
+
+    @property
+    def metadata(self):
+        return self.index_creator._metadata
+
+    @property
+    def query_engine(self):
+        return self._get_or_create(
+            "query_engine", lambda: self.index_creator.create_query_engine()
+        )
+
+    @property
+    def database_utils(self):
+        return self._get_or_create(
+            "database_utils",
+            lambda: DatabaseUtils(
+                index_creator_instance=self.index_creator, logger=self.logger
+            ),
+        )
+
+    @property
+    def schema_str(self):
+        return self._get_or_create(
+            "schema_str", lambda: self.database_utils.get_schema_str()
+        )
+
+    @property
+    def fk_str(self):
+        return self._get_or_create("fk_str", lambda: self.database_utils.get_fk_str())
+
+    @property
+    def schema_fingerprint(self):
+        return self._get_or_create(
+            "schema_fingerprint", lambda: self.index_creator.get_schema_fingerprint()
+        )
+
+    @property
+    def sql_cache(self):
+        def factory():
+            cache_params = ConfigLoader().load_cache_config()
+            if not cache_params.getboolean("sql_cache_enabled"):
+                return False
+            persist_path = (
+                cache_params["sql_cache_path"]
+                if cache_params.getboolean("sql_cache_persist")
+                else None
+            )
+            return SQLQueryCache(
+                max_entries=cache_params.getint("sql_cache_max_entries"),
+                persist_path=persist_path,
+            )
+
+        # a disabled cache is registered as False so the config is only read once
+        return self._get_or_create("sql_cache", factory) or None
+
+    @property
+    def semantic_cache(self):
+        def factory():
+            cache_params = ConfigLoader().load_cache_config()
+            if not cache_params.getboolean("semantic_cache_enabled"):
+                return False
+            embed_model = self.query_engine.service_context.embed_model
+            return SemanticQueryCache(
+                embed_fn=embed_model.get_text_embedding,
+                embedding_model_name=get_embedding_model_id(),
+                threshold=cache_params.getfloat("semantic_cache_threshold"),
+                max_entries=cache_params.getint("semantic_cache_max_entries"),
+                persist_dir=cache_params["semantic_cache_directory"],
+                save_delay_seconds=cache_params.getfloat(
+                    "semantic_cache_save_delay_seconds"
+                ),
+            )
+
+        return self._get_or_create("semantic_cache", factory) or None
+
+    @property
+    def schema_retriever(self):
+        def factory():
+            config_loader = ConfigLoader()
+            schema_params = config_loader.load_schema_config()
+            if not schema_params.getboolean("pruning_enabled"):
+                return False
+            return SchemaColumnRetriever(
+                database_utils=self.database_utils,
+                embed_model=self.query_engine.service_context.embed_model,
+                embedding_model_name=get_embedding_model_id(),
+                schema_fingerprint=self.schema_fingerprint,
+                persist_dir=config_loader.load_path_config()["schema_cache_directory"],
+                top_k_columns=schema_params.getint("top_k_columns"),
+                max_tables=schema_params.getint("max_tables"),
+                include_key_columns=schema_params.getboolean("include_key_columns"),
+            )
+
+        return self._get_or_create("schema_retriever", factory) or None
+
+    @property
+    def prompt_budget(self):
+        return self._get_or_create(
+            "prompt_budget",
+            lambda: PromptBudget(
+                prompt_templates=ConfigLoader().load_prompt_config(),
+                logger=self.logger,
+                # the query engine sends these prompts inside its text-to-SQL prompt with the retrieved tables
+                prompt_overheads=dict.fromkeys(
+                    QUERY_ENGINE_TEMPLATES,
+                    get_query_engine_overhead(
+                        self.query_engine,
+                        self.index_creator._sql_database,
+                        TABLE_RETRIEVER_TOP_K,
+                    ),
+                ),
+            ),
+        )
+
+    def register_prompt_prefixes(self):
+        """
+        Hands the static prefix of every configured prompt template to the LLM's prefix state cache.
+        The query engine's templates reach the LLM inside its text-to-SQL prompt, after the retrieved tables,
+        so for them the instructions of that prompt are registered instead.
+        """
+
+        def factory():
+            config_loader = ConfigLoader()
+            llm_params = config_loader.load_llm_config()
+            prompt_templates = config_loader.load_prompt_config()
+            static_fields = {"schema_str": self.schema_str, "fk_str": self.fk_str}
+            llm_loader = LLMLoader()
+            template_names = [
+                name.strip()
+                for name in llm_params["prefix_cache_templates"].split(",")
+                if name.strip()
+            ]
+            for template_name in template_names:
+                if template_name in QUERY_ENGINE_TEMPLATES:
+                    continue
+                llm_loader.register_prompt_prefix(
+                    template_name,
+                    get_static_prefix(prompt_templates[template_name], static_fields),
+                )
+            if set(template_names) & set(QUERY_ENGINE_TEMPLATES):
+                text_to_sql_prompt = self.query_engine.sql_retriever.get_prompts()[
+                    "text_to_sql_prompt"
+                ]
+                llm_loader.register_prompt_prefix(
+                    TEXT_TO_SQL_PREFIX_NAME,
+                    get_static_prefix(
+                        text_to_sql_prompt.get_template(),
+                        {"dialect": self.index_creator._sql_database.dialect},
+                    ),
+                )
+            return template_names
+
+        return self._get_or_create("prompt_prefixes", factory)
+
+    @property
+    def logger(self):
+        return self._get_or_create("logger", Logger)
+
+    def reset(self):
+        with self._lock:
+            self._resources = {}
@@ -0,0 +1,265 @@
+# result_summariser.py
+import contextvars
+import re
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from src.config.config_loader import ConfigLoader
+
+SUMMARY_MODES = ("llm", "auto", "rules")
+PERIOD_KEYWORDS = ("date", "day", "week", "month", "quarter", "year", "period", "time")
+# integer columns named like identifiers are labels, not measures
+ID_NAME_PATTERN = re.compile(
+    r"(?:^|_)(?:id|key|code|sku|no|num|number|zip|pin|pincode)$", re.IGNORECASE
+)
+
+_summary_mode = contextvars.ContextVar("summary_mode", default=None)
+
+
+def set_summary_mode(mode):
+    """
+    Sets how the results of the current request (thread / context) are summarised:
+        "llm": always by the LLM with summary_template
+        "auto": by the rule based summariser when the result shape is simple, by the LLM otherwise
+        "rules": never by the LLM, complex results are rendered as a table
+    """
+    if mode not in SUMMARY_MODES:
+        raise ValueError(f"Unknown summary mode {mode}")
+    return _summary_mode.set(mode)
+
+
+@contextmanager
+def summary_mode(mode):
+    token = set_summary_mode(mode)
+    try:
+        yield
+    finally:
+        _summary_mode.reset(token)
+
+
+def format_value(value):
+    if isinstance(value, (int, np.integer)):
+        return f"{value:,}"
+    if isinstance(value, (float, np.floating)):
+        if float(value).is_integer():
+            return f"{int(value):,}"
+        return f"{value:,.2f}"
+    return str(value)
+
+
+def format_column_name(column_name):
+    return str(column_name).replace("_", " ")
+
+
+class ResultSummariser:
+    """
+    Describes simple query results (a single value, a single row, a labelled ranking or a time series)
+    in plain sentences with pandas / NumPy, so they do not need an LLM call.
+    describe returns None when the result shape is too complex for the rules.
+    """
+
+    def __init__(self):
+        summary_params = ConfigLoader().load_summary_config()
+        self.default_mode = summary_params["default_mode"]
+        self.max_rows = summary_params.getint("max_rows")
+        self.max_columns = summary_params.getint("max_columns")
+        self.top_n = summary_params.getint("top_n")
+        self.flat_trend_threshold = summary_params.getfloat("flat_trend_threshold")
+
+    def get_mode(self):
+        return _summary_mode.get() or self.default_mode
+
+    def summarise(self, result, mode=None):
+        """
+        Args:
+            result (pandas.DataFrame): The raw (unformatted) query result.
+            mode (str): Overrides the summary mode of the current request.
+        Returns:
+            str: The rule based summary, None when the LLM should summarise the result.
+        """
+        mode = mode or self.get_mode()
+        if mode == "llm":
+            return None
+        summary = self.describe(result)
+        if summary is None and mode == "rules":
+            summary = self.describe_table(result)
+        return summary
+
+    @staticmethod
+    def is_period_column(df, column_name):
+        if pd.api.types.is_datetime64_any_dtype(df[column_name]):
+            return True
+        name = str(column_name).lower()
+        return any(keyword in name for keyword in PERIOD_KEYWORDS)
+
+    @staticmethod
+    def is_id_column(df, column_name):
+        return pd.api.types.is_integer_dtype(df[column_name]) and bool(
+            ID_NAME_PATTERN.search(str(column_name))
+        )
+
+    def split_columns(self, df):
+        """
+        Integer columns named like identifiers or codes are labels. Years are period columns by name.
+        Integer columns with a distinct value on every row are labels too, unless no other measure remains.
+        Returns:
+            tuple: (period columns, numeric measure columns, label columns)
+        """
+        period_columns, numeric_columns, label_columns = [], [], []
+        for column_name in df.columns:
+            if self.is_period_column(df, column_name):
+                period_columns.append(column_name)
+            elif self.is_id_column(df, column_name):
+                label_columns.append(column_name)
+            elif pd.api.types.is_numeric_dtype(df[column_name]) and not (
+                pd.api.types.is_bool_dtype(df[column_name])
+            ):
+                numeric_columns.append(column_name)
+            else:
+                label_columns.append(column_name)
+        # keys have a distinct value on every row, measures rarely do
+        unique_integer_columns = [
+            column_name
+            for column_name in numeric_columns
+            if pd.api.types.is_integer_dtype(df[column_name]) and df[column_name].is_unique
+        ]
+        if len(df) > 1 and len(unique_integer_columns) < len(numeric_columns):
+            for column_name in unique_integer_columns:
+                numeric_columns.remove(column_name)
+                label_columns.append(column_name)
+            label_columns.sort(key=list(df.columns).index)
+        return period_columns, numeric_columns, label_columns
+
+    def describe(self, df):
+        if df.empty:
+            return "The query returned no results."
+        if len(df.columns) > self.max_columns or len(df) > self.max_rows:
+            return None
+        if len(df) == 1:
+            return self.describe_row(df)
+
+        period_columns, numeric_columns, label_columns = self.split_columns(df)
+        if not numeric_columns or len(period_columns) > 1:
+            return None
+        if df[numeric_columns].isna().to_numpy().any():
+            return None
+        if period_columns and not label_columns:
+            return self.describe_series(df, period_columns[0], numeric_columns)
+        if label_columns and not period_columns and len(numeric_columns) == 1:
+            return self.describe_ranking(df, label_columns, numeric_columns[0])
+        if not label_columns and not period_columns:
+            return self.describe_numeric(df, numeric_columns)
+        return None
+
+    def describe_row(self, df):
+        row = df.iloc[0]
+        if len(df.columns) == 1:
+            return f"The {format_column_name(df.columns[0])} is {format_value(row.iloc[0])}."
+        parts = [
+            f"{format_column_name(column_name)}: {format_value(row[column_name])}"
+            for column_name in df.columns
+        ]
+        return "The result is " + ", ".join(parts) + "."
+
+    def describe_numeric(self, df, numeric_columns):
+        values = df[numeric_columns].to_numpy(dtype=float)
+        totals = np.nansum(values, axis=0)
+        minimums = np.nanmin(values, axis=0)
+        maximums = np.nanmax(values, axis=0)
+        means = np.nanmean(values, axis=0)
+        sentences = [
+            f"Across {len(df):,} rows, {format_column_name(column_name)} totals {format_value(totals[i])}, "
+            f"ranging from {format_value(minimums[i])} to {format_value(maximums[i])} "
+            f"with an average of {format_value(means[i])}."
+            for i, column_name in enumerate(numeric_columns)
+        ]
+        return " ".join(sentences)
+
+    def describe_ranking(self, df, label_columns, value_column):
+        labels = df[label_columns].astype(str).agg(" / ".join, axis=1).to_numpy()
+        values = df[value_column].to_numpy(dtype=float)
+        # a result sorted ascending answers a question about the lowest values
+        ascending = bool(values[0] < values[-1] and np.all(np.diff(values) >= 0))
+        order = np.argsort(values if ascending else -values, kind="stable")
+        first, last = ("lowest", "highest") if ascending else ("highest", "lowest")
+        total = np.nansum(values)
+        name = format_column_name(value_column)
+
+        top = order[: self.top_n]
+        ranking = ", ".join(
+            f"{labels[i]} ({format_value(values[i])})" for i in top
+        )
+        sentences = [
+            f"Across {len(df):,} {format_column_name(' / '.join(map(str, label_columns)))} values, "
+            f"the total {name} is {format_value(total)}.",
+            f"The {first} {name} is for {ranking}.",
+        ]
+        if not ascending and total > 0 and values[order[0]] > 0:
+            share = values[order[0]] / total * 100
+            sentences.append(f"{labels[order[0]]} accounts for {share:.1f}% of the total.")
+        if len(df) > self.top_n:
+            other_end = order[-1]
+            sentences.append(
+                f"The {last} is {labels[other_end]} ({format_value(values[other_end])})."
+            )
+        return " ".join(sentences)
+
+    def describe_series(self, df, period_column, numeric_columns):
+        periods = df[period_column]
+        if not pd.api.types.is_datetime64_any_dtype(periods):
+            parsed_periods = pd.to_datetime(periods.astype(str), errors="coerce")
+            if parsed_periods.notna().all():
+                df = df.iloc[np.argsort(parsed_periods.to_numpy(), kind="stable")]
+        else:
+            df = df.sort_values(period_column, kind="stable")
+        periods = df[period_column].astype(str).to_numpy()
+
+        sentences = [
+            f"From {periods[0]} to {periods[-1]} ({len(df):,} {format_column_name(period_column)} values):"
+        ]
+        for column_name in numeric_columns:
+            sentences.append(
+                self.describe_series_column(
+                    periods, df[column_name].to_numpy(dtype=float), column_name
+                )
+            )
+        return " ".join(sentences)
+
+    def describe_series_column(self, periods, values, column_name):
+        name = format_column_name(column_name)
+        first, last, previous = values[0], values[-1], values[-2]
+        highest, lowest = np.nanargmax(values), np.nanargmin(values)
+
+        slope = np.polyfit(np.arange(len(values)), np.nan_to_num(values), 1)[0]
+        scale = np.nanmean(np.abs(values))
+        if scale == 0 or abs(slope) / scale < self.flat_trend_threshold:
+            trend = "broadly flat"
+        else:
+            trend = "increasing" if slope > 0 else "decreasing"
+
+        sentences = [
+            f"{name.capitalize()} totals {format_value(np.nansum(values))} and is {trend} overall, "
+            f"moving from {format_value(first)} to {format_value(last)}"
+            + (f" ({self.describe_change(first, last)})." if first != 0 else ".")
+        ]
+        if previous != 0:
+            sentences.append(
+                f"The latest period ({periods[-1]}) is {self.describe_change(previous, last)} "
+                f"on the previous one ({periods[-2]})."
+            )
+        sentences.append(
+            f"The highest {name} was {format_value(values[highest])} in {periods[highest]} "
+            f"and the lowest was {format_value(values[lowest])} in {periods[lowest]}."
+        )
+        return " ".join(sentences)
+
+    @staticmethod
+    def describe_change(old_value, new_value):
+        change = (new_value - old_value) / abs(old_value) * 100
+        if change == 0:
+            return "unchanged"
+        return f"{'up' if change > 0 else 'down'} {abs(change):.1f}%"
+
+    @staticmethod
+    def describe_table(df, n=10):
+        return f"Here are the results: \n{df.head(n).to_string(index=False)}"
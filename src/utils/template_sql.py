@@ -0,0 +1,57 @@
+# template_sql.py
+import json
+
+# Question_No of /api/template-qna -> SQL template in pre_defined_qna_template_sql_queries_path
+QUESTION_TEMPLATES = {
+    1: "avg_sales_template_sql",
+    2: "total_sales_template_sql",
+    3: "growth_rate_template_sql",
+    4: "top_products_template_sql",
+}
+
+
+class TemplateSQLBuilder:
+    """
+    Fills the SQL templates of TemplateBasedQAAPI from the user inputs of a template question.
+    Kept free of the LLM stack so the templates can be timed against a database on their own.
+    """
+
+    def __init__(self, qna_config):
+        self.sql_query_templates_map = qna_config.get("sql_queries")
+        self.time_period_map = qna_config.get("time_period_map")
+        self.position_map = qna_config.get("position_map")
+        self.sales_type_map = qna_config.get("sales_type_map")
+        self.state_codes_map = qna_config.get("state_code_map")
+        self.time_frame_map = qna_config.get("time_frame_map")
+
+    @classmethod
+    def from_file(cls, template_sql_config_filepath):
+        with open(template_sql_config_filepath, mode="rb") as file:
+            return cls(json.loads(file.read()))
+
+    def get_template_name(self, question_num):
+        # any other question number is the top products question
+        return QUESTION_TEMPLATES.get(question_num, QUESTION_TEMPLATES[4])
+
+    def build(self, user_inputs, question_num):
+        """
+        Args:
+            user_inputs (dict): "Args" of the request: period, position, sale_type, sku, time_frame,
+                state, from and to.
+            question_num (int): "Question_No" of the request.
+        Returns:
+            str: The SQL query answering the question.
+        """
+        template = self.sql_query_templates_map[self.get_template_name(question_num)]
+        return template.format(
+            quantity_or_value=self.sales_type_map.get(user_inputs.get("sale_type", ""), ""),
+            time_period=self.time_period_map.get(user_inputs.get("period", ""), ""),
+            product_name=user_inputs.get("sku", ""),
+            state_code=self.state_codes_map.get(user_inputs.get("state", ""), ""),
+            time_frame=self.time_period_map.get(
+                self.time_frame_map.get(user_inputs.get("time_frame", ""), "")
+            ),
+            start_date=user_inputs.get("from", ""),
+            end_date=user_inputs.get("to", ""),
+            position=self.position_map.get(user_inputs.get("position", ""), ""),
+        )
@@ -0,0 +1,283 @@
+# token_budget.py
+import contextvars
+import re
+import threading
+from llama_index.utils import get_tokenizer
+from src.config.config_loader import ConfigLoader
+from src.utils.llm_loader import LLMLoader
+
+OVERFLOW_POLICIES = ("trim_examples", "drop_value_examples", "reject")
+# few-shot examples of a prompt template are separated by this line
+EXAMPLE_SEPARATOR = "=========="
+VALUE_EXAMPLES_PATTERN = re.compile(r", Value Examples: .*\)$", re.MULTILINE)
+# prompts sent through SQLTableRetrieverQueryEngine, which wraps them in its own text-to-SQL prompt
+QUERY_ENGINE_TEMPLATES = ("decomposer_template", "detail_template", "refiner_template")
+
+_request_token_usage = contextvars.ContextVar("request_token_usage", default=None)
+
+
+class PromptBudgetExceededError(Exception):
+    def __init__(self, template_name, n_tokens, budget):
+        super().__init__(
+            f"Prompt for {template_name} needs {n_tokens} tokens, its budget is {budget} tokens"
+        )
+        self.template_name = template_name
+        self.n_tokens = n_tokens
+        self.budget = budget
+
+
+def start_request_token_usage():
+    """
+    Starts counting the prompt / completion tokens of the current request (thread / context).
+    """
+    return _request_token_usage.set(
+        {"prompt_tokens": 0, "completion_tokens": 0, "templates": {}}
+    )
+
+
+def get_request_token_usage():
+    """
+    Returns:
+        dict: Prompt and completion tokens used by the current request so far, per template and in total.
+            None when the current context is not counting.
+    """
+    usage = _request_token_usage.get()
+    if usage is None:
+        return None
+    return {
+        "prompt_tokens": usage["prompt_tokens"],
+        "completion_tokens": usage["completion_tokens"],
+        "templates": {
+            template_name: dict(template_usage)
+            for template_name, template_usage in usage["templates"].items()
+        },
+    }
+
+
+class PromptBudget:
+    """
+    Builds every prompt from its template, counts its tokens with the global tokenizer
+    and keeps it within the template's token budget.
+    A prompt over budget goes through the template's overflow policies in order until it fits:
+        "trim_examples": drops the template's few-shot examples, last one first
+        "drop_value_examples": removes the value examples from the schema
+        "reject": raises PromptBudgetExceededError
+    A prompt that is still over budget once the policies are exhausted is sent as is and logged.
+    Budgets default to the routed LLM's context_window minus max_new_tokens. prompt_overheads reserves
+    the tokens added around a built prompt before it reaches the LLM (e.g. by the query engine).
+    """
+
+    def __init__(self, prompt_templates, logger=None, prompt_overheads=None):
+        budget_params = ConfigLoader().load_token_budget_config()
+        self.enabled = budget_params.getboolean("enabled")
+        self._prompt_templates = prompt_templates
+        self._logger = logger
+        self._overheads = dict(prompt_overheads or {})
+        self._budgets = {}
+        self._policies = {}
+        for template_name in prompt_templates:
+            self._budgets[template_name] = budget_params.getint(
+                f"{template_name}_budget", fallback=budget_params.getint("default_budget")
+            ) or self.get_default_budget(template_name)
+            policies = budget_params.get(
+                f"{template_name}_policy", fallback=budget_params["default_policy"]
+            )
+            self._policies[template_name] = [
+                policy.strip() for policy in policies.split(",") if policy.strip()
+            ]
+            for policy in self._policies[template_name]:
+                if policy not in OVERFLOW_POLICIES:
+                    raise ValueError(
+                        f"Unknown overflow policy {policy} for prompt template {template_name}"
+                    )
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    @staticmethod
+    def get_default_budget(template_name):
+        llm_loader = LLMLoader()
+        llm_params = llm_loader.context_loader_instance.load_llm_config(
+            llm_loader.get_model_name(template_name)
+        )
+        return llm_params.getint("context_window") - llm_params.getint("max_new_tokens")
+
+    def get_budget(self, template_name):
+        """
+        Returns:
+            int: Tokens left for the built prompt once the overhead added around it is reserved.
+        """
+        return self._budgets[template_name] - self._overheads.get(template_name, 0)
+
+    @staticmethod
+    def count_tokens(text):
+        return len(get_tokenizer()(text))
+
+    @staticmethod
+    def trim_examples(template):
+        """
+        Returns:
+            str: The template without its last few-shot example, None when it has no example left.
+        """
+        sections = template.split(EXAMPLE_SEPARATOR)
+        # instructions, example 1, ..., example n, the question
+        if len(sections) <= 2:
+            return None
+        return EXAMPLE_SEPARATOR.join(sections[:-2] + sections[-1:])
+
+    @staticmethod
+    def drop_value_examples(fields):
+        """
+        Returns:
+            dict: The prompt fields with the value examples removed from the schema, None when there are none.
+        """
+        if "schema_str" not in fields:
+            return None
+        schema_str = VALUE_EXAMPLES_PATTERN.sub(")", str(fields["schema_str"]))
+        if schema_str == fields["schema_str"]:
+            return None
+        return {**fields, "schema_str": schema_str}
+
+    def build(self, template_name, **fields):
+        """
+        Formats the prompt template with the fields, enforcing its token budget.
+        Returns:
+            str: The prompt.
+        """
+        template = self._prompt_templates[template_name]
+        prompt = template.format(**fields)
+        if not self.enabled:
+            return prompt
+
+        budget = self.get_budget(template_name)
+        n_tokens = self.count_tokens(prompt)
+        applied_policies = []
+        for policy in self._policies[template_name]:
+            if n_tokens <= budget:
+                break
+            if policy == "reject":
+                self.record_prompt(template_name, n_tokens, applied_policies, rejected=True)
+                raise PromptBudgetExceededError(template_name, n_tokens, budget)
+            if policy == "trim_examples":
+                trimmed_template = self.trim_examples(template)
+                if trimmed_template is None:
+                    continue
+                while trimmed_template is not None and n_tokens > budget:
+                    template = trimmed_template
+                    prompt = template.format(**fields)
+                    n_tokens = self.count_tokens(prompt)
+                    trimmed_template = self.trim_examples(template)
+            elif policy == "drop_value_examples":
+                trimmed_fields = self.drop_value_examples(fields)
+                if trimmed_fields is None:
+                    continue
+                fields = trimmed_fields
+                prompt = template.format(**fields)
+                n_tokens = self.count_tokens(prompt)
+            applied_policies.append(policy)
+
+        if n_tokens > budget and self._logger is not None:
+            self._logger.info(
+                f"prompt for {template_name} is over budget: {n_tokens} > {budget} tokens"
+            )
+        self.record_prompt(template_name, n_tokens, applied_policies)
+        return prompt
+
+    def get_template_stats(self, template_name):
+        if template_name not in self._stats:
+            self._stats[template_name] = {
+                "prompts": 0,
+                "prompt_tokens": 0,
+                "prompt_tokens_max": 0,
+                "completions": 0,
+                "completion_tokens": 0,
+                "over_budget": 0,
+                "rejected": 0,
+                "policies_applied": {policy: 0 for policy in OVERFLOW_POLICIES},
+            }
+        return self._stats[template_name]
+
+    @staticmethod
+    def get_request_template_usage(template_name):
+        usage = _request_token_usage.get()
+        if usage is None:
+            return None, None
+        template_usage = usage["templates"].setdefault(
+            template_name, {"prompt_tokens": 0, "completion_tokens": 0, "calls": 0}
+        )
+        return usage, template_usage
+
+    def record_prompt(self, template_name, n_tokens, applied_policies, rejected=False):
+        with self._lock:
+            stats = self.get_template_stats(template_name)
+            if rejected:
+                stats["rejected"] += 1
+                return
+            stats["prompts"] += 1
+            stats["prompt_tokens"] += n_tokens
+            stats["prompt_tokens_max"] = max(stats["prompt_tokens_max"], n_tokens)
+            if n_tokens > self.get_budget(template_name):
+                stats["over_budget"] += 1
+            for policy in applied_policies:
+                stats["policies_applied"][policy] += 1
+
+        usage, template_usage = self.get_request_template_usage(template_name)
+        if usage is not None:
+            usage["prompt_tokens"] += n_tokens
+            template_usage["prompt_tokens"] += n_tokens
+            template_usage["calls"] += 1
+
+    def record_completion(self, template_name, completion):
+        if not self.enabled:
+            return
+        n_tokens = self.count_tokens(str(completion))
+        with self._lock:
+            stats = self.get_template_stats(template_name)
+            stats["completions"] += 1
+            stats["completion_tokens"] += n_tokens
+
+        usage, template_usage = self.get_request_template_usage(template_name)
+        if usage is not None:
+            usage["completion_tokens"] += n_tokens
+            template_usage["completion_tokens"] += n_tokens
+
+    def stats(self):
+        with self._lock:
+            templates = {
+                template_name: {
+                    **template_stats,
+                    "budget": self._budgets[template_name],
+                    "overhead": self._overheads.get(template_name, 0),
+                    "policies_applied": dict(template_stats["policies_applied"]),
+                }
+                for template_name, template_stats in self._stats.items()
+            }
+        return {
+            "enabled": self.enabled,
+            "prompt_tokens": sum(stats["prompt_tokens"] for stats in templates.values()),
+            "completion_tokens": sum(
+                stats["completion_tokens"] for stats in templates.values()
+            ),
+            "templates": templates,
+        }
+
+
+def get_query_engine_overhead(query_engine, sql_database, n_tables):
+    """
+    Upper bound of the tokens SQLTableRetrieverQueryEngine adds around the prompt it is queried with:
+    its text-to-SQL prompt and the info of the n_tables largest tables, the most its table retriever returns.
+    """
+    text_to_sql_prompt = query_engine.sql_retriever.get_prompts()["text_to_sql_prompt"]
+    table_infos = sorted(
+        (
+            sql_database.get_single_table_info(table_name)
+            for table_name in sql_database.get_usable_table_names()
+        ),
+        key=PromptBudget.count_tokens,
+        reverse=True,
+    )
+    engine_prompt = text_to_sql_prompt.format(
+        query_str="",
+        schema="\n\n".join(table_infos[:n_tables]),
+        dialect=sql_database.dialect,
+    )
+    return PromptBudget.count_tokens(engine_prompt)
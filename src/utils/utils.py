@@ -1,9 +1,21 @@
 import pandas as pd
 import numpy as np
-from sqlalchemy import text
+from sqlalchemy import create_engine, select, text
 from src.index.index_creator import IndexCreator
 from src.config.config_loader import ConfigLoader
+from src.cache.result_cache import ResultCache
+from src.utils.metrics import CACHE_REQUESTS, GUARDED_QUERIES, get_metrics_endpoint
+from src.utils.query_guard import QueryGuard, QueryGuardError, get_sqlite_error_dict
+from collections import deque
+from urllib.parse import quote
+import hashlib
+import json
 import logging
+import os
+from typing import Optional
+
+
+FETCH_MODES = ("all", "head", "tail")
 
 
 class MyFilter(object):
@@ -65,48 +77,288 @@ class Logger:
     def info(self, msg):
         logging.info(msg)
 
+    def warning(self, msg):
+        logging.warning(msg)
+
 
 class DatabaseUtils:
-    def __init__(self):
-        index_creator_instance = IndexCreator()
-        index_creator_instance.build_database_schema()  # builds sql_database object with the schema using the database
+    def __init__(
+        self,
+        index_creator_instance: Optional[IndexCreator] = None,
+        logger: Optional[Logger] = None,
+    ):
+        self._logger = logger or Logger()
+        if index_creator_instance is None:
+            index_creator_instance = IndexCreator()
+            index_creator_instance.build_database_schema()  # builds sql_database object with the schema using the database
         self._metadata = index_creator_instance._metadata
         self._engine = index_creator_instance._sql_database.engine
+        self._schema_cache_dir = ConfigLoader().load_path_config()[
+            "schema_cache_directory"
+        ]
+        self._column_descriptions = None
+        self._schema_strings = None
+        cache_params = ConfigLoader().load_cache_config()
+        self._result_cache = (
+            ResultCache(
+                max_bytes=cache_params.getint("result_cache_max_bytes"),
+                max_entry_bytes=cache_params.getint("result_cache_max_entry_bytes"),
+            )
+            if cache_params.getboolean("result_cache_enabled")
+            else None
+        )
+        fetch_params = ConfigLoader().load_fetch_config()
+        self._chunk_rows = fetch_params.getint("chunk_rows")
+        self._max_rows = fetch_params.getint("max_rows")
+        self._max_bytes = fetch_params.getint("max_bytes")
+        query_guard_params = ConfigLoader().load_query_guard_config()
+        self._query_guard = QueryGuard(query_guard_params)
+        # generated SQL runs on its own read-only connections, schema reflection keeps the default engine
+        if query_guard_params.getboolean("read_only"):
+            database_uri = quote(os.path.abspath(self.get_database_file()), safe="/:")
+            self._execution_engine = create_engine(
+                f"sqlite:///file:{database_uri}?mode=ro&uri=true"
+            )
+        else:
+            self._execution_engine = self._engine
 
-    def run_sql_query(self, sql_query):
-        with self._engine.connect() as con:
+    def get_data_version(self):
+        """
+        Cheap version stamp of the database contents: modification time and size of the database file
+        and of its write-ahead log, if any. Changes whenever the nightly load writes to the database.
+        """
+        database_file = self.get_database_file()
+        data_version = []
+        for file_path in (database_file, database_file + "-wal"):
+            if os.path.exists(file_path):
+                stat = os.stat(file_path)
+                data_version.extend([stat.st_mtime_ns, stat.st_size])
+        return tuple(data_version)
+
+    def get_result_cache_stats(self):
+        if self._result_cache is None:
+            return None
+        return self._result_cache.stats()
+
+    def run_sql_query(self, sql_query, keep="all", n_rows=None):
+        """
+        Runs a query, streaming its result chunk by chunk so memory stays bounded whatever the result size.
+        Args:
+            keep (str): "all" keeps every row up to the max_rows / max_bytes caps, "head" the first n_rows rows
+                and "tail" the last n_rows rows (the whole result is read through a rolling buffer).
+            n_rows (int): Rows kept by "head" and "tail", capped at (and defaulting to) max_rows.
+        Returns:
+            pandas.DataFrame: The kept rows. attrs["truncated"] tells whether rows of the result were dropped,
+                attrs["total_rows"] is the row count of the whole result (None when it was not read to the end).
+            dict: "sqlite_error", "exception_class", "error_type" (sqlite_error, time_budget_exceeded
+                or expensive_query), "refinable" and "details" when the query failed or was refused.
+        """
+        if keep not in FETCH_MODES:
+            raise ValueError(f"Unknown fetch mode {keep}")
+        if keep == "all" or n_rows is None:
+            n_rows = self._max_rows
+        n_rows = min(n_rows, self._max_rows)
+        fetch_options = (keep, n_rows, self._max_bytes)
+        data_version = self.get_data_version()
+        if self._result_cache is not None:
+            result = self._result_cache.get(sql_query, data_version, fetch_options)
+            CACHE_REQUESTS.inc("result", "miss" if result is None else "hit")
+            if result is not None:
+                return result
+
+        with self._execution_engine.connect() as con:
             try:
-                result = pd.read_sql_query(sql_query, con)
+                dbapi_connection = con.connection.dbapi_connection
+                preflight_warnings = self._query_guard.preflight(
+                    dbapi_connection, sql_query, data_version
+                )
+                if preflight_warnings:
+                    GUARDED_QUERIES.inc(get_metrics_endpoint(), "flagged")
+                    self._logger.warning(
+                        f"Expensive query: {'; '.join(preflight_warnings)}\nSQL: {sql_query}"
+                    )
+                with self._query_guard.time_budget(dbapi_connection):
+                    result = self.fetch_result(con, sql_query, keep, n_rows)
+                result.attrs["preflight_warnings"] = preflight_warnings
+                if self._result_cache is not None:
+                    self._result_cache.put(
+                        sql_query, data_version, result, fetch_options
+                    )
                 return result
+            except QueryGuardError as er:
+                GUARDED_QUERIES.inc(get_metrics_endpoint(), er.error_type)
+                self._logger.error(
+                    f"Query stopped by the guardrails ({er.error_type}): {' '.join(er.args)}\nSQL: {sql_query}"
+                )
+                return er.to_error_dict()
             except Exception as er:
                 print(er)
                 print("Error: ", " ".join(er.args))
                 print("Exception Class: ", str(er.__class__))
-                return {
-                    "sqlite_error": " ".join(er.args),
-                    "exception_class": str(er.__class__),
-                }
+                return get_sqlite_error_dict(er)
             finally:
                 if con:
                     con.close()
 
-    def get_fk_str(self):
-        fk_str = ""
+    def fetch_result(self, con, sql_query, keep, n_rows):
+        # head needs one row more than it keeps to know whether the result goes on
+        chunk_rows = (
+            min(self._chunk_rows, n_rows + 1) if keep == "head" else self._chunk_rows
+        )
+        chunk_iterator = pd.read_sql_query(sql_query, con, chunksize=chunk_rows)
+        chunks = deque()
+        columns = None
+        n_read, n_kept, n_bytes = 0, 0, 0
+        truncated = False
+        try:
+            for chunk in chunk_iterator:
+                columns = chunk.columns
+                if keep == "tail":
+                    n_read += len(chunk)
+                    chunk_bytes = int(chunk.memory_usage(index=True, deep=True).sum())
+                    chunks.append((chunk, chunk_bytes))
+                    n_kept += len(chunk)
+                    n_bytes += chunk_bytes
+                    # drop the oldest chunks once the newer ones hold the last n_rows rows or the bytes overflow
+                    while len(chunks) > 1 and (
+                        n_kept - len(chunks[0][0]) >= n_rows or n_bytes > self._max_bytes
+                    ):
+                        dropped_chunk, dropped_bytes = chunks.popleft()
+                        n_kept -= len(dropped_chunk)
+                        n_bytes -= dropped_bytes
+                    continue
+
+                if n_kept >= n_rows:
+                    truncated = True
+                    break
+                n_read += len(chunk)
+                if n_kept + len(chunk) > n_rows:
+                    chunk = chunk.iloc[: n_rows - n_kept]
+                    truncated = True
+                chunk_bytes = int(chunk.memory_usage(index=True, deep=True).sum())
+                if n_bytes + chunk_bytes > self._max_bytes:
+                    n_fitting_rows = int(
+                        len(chunk) * max(self._max_bytes - n_bytes, 0) / chunk_bytes
+                    )
+                    chunk = chunk.iloc[:n_fitting_rows]
+                    chunk_bytes = int(chunk.memory_usage(index=True, deep=True).sum())
+                    truncated = True
+                chunks.append((chunk, chunk_bytes))
+                n_kept += len(chunk)
+                n_bytes += chunk_bytes
+                if truncated:
+                    break
+        finally:
+            chunk_iterator.close()
+
+        if chunks:
+            result = pd.concat([chunk for chunk, _ in chunks], ignore_index=True)
+        else:
+            result = pd.DataFrame(columns=columns)
+        if keep == "tail":
+            result = result.tail(n_rows)
+            # same index as the tail of the whole result
+            result.index = pd.RangeIndex(n_read - len(result), n_read)
+            truncated = len(result) < n_read
+        result.attrs["fetch_mode"] = keep
+        result.attrs["truncated"] = truncated
+        result.attrs["total_rows"] = None if truncated and keep != "tail" else n_read
+        return result
+
+    def get_database_file(self):
+        return self._engine.url.database
+
+    def get_schema_cache_key(self):
+        """
+        Identity of the database file (path, device, inode, size, modification time), its PRAGMA schema_version
+        and the data dictionary file. Restarts against unchanged data produce the same key.
+        """
+        database_file = os.path.realpath(self.get_database_file())
+        stat = os.stat(database_file)
+        with self._engine.connect() as conn:
+            schema_version = conn.execute(text("PRAGMA schema_version")).scalar()
+        column_descriptions_file = ConfigLoader().load_path_config()[
+            "column_descriptions_file_path"
+        ]
+        descriptions_mtime = (
+            os.stat(column_descriptions_file).st_mtime_ns
+            if os.path.exists(column_descriptions_file)
+            else 0
+        )
+        key_parts = [
+            database_file,
+            stat.st_dev,
+            stat.st_ino,
+            stat.st_size,
+            stat.st_mtime_ns,
+            schema_version,
+            column_descriptions_file,
+            descriptions_mtime,
+        ]
+        return hashlib.sha256(
+            "|".join(str(part) for part in key_parts).encode("utf-8")
+        ).hexdigest()[:16]
+
+    def get_foreign_keys(self):
+        """
+        Returns:
+            list: (table, column, referenced table, referenced column) for every foreign key column.
+        """
+        foreign_keys = []
         for table_name, table in self._metadata.tables.items():
             for column in table.columns:
                 if column.foreign_keys:
-                    foreign_key_info = (
-                        column.foreign_keys.pop()
+                    foreign_key_info = next(
+                        iter(column.foreign_keys)
                     )  # Assuming a column has at most one foreign key
                     referenced_table = foreign_key_info.column.table.name
-                    fk_str += f"{table_name}.`{column.name}` -> {referenced_table}.`{foreign_key_info.column.name}`\n"
+                    foreign_keys.append(
+                        (
+                            table_name,
+                            column.name,
+                            referenced_table,
+                            foreign_key_info.column.name,
+                        )
+                    )
+        return foreign_keys
+
+    def get_key_columns(self):
+        """
+        Returns:
+            dict: table name -> primary key and foreign key columns, which are needed to join the table.
+        """
+        key_columns = {
+            table_name: {column.name for column in table.primary_key.columns}
+            for table_name, table in self._metadata.tables.items()
+        }
+        for table_name, column_name, referenced_table, referenced_column in (
+            self.get_foreign_keys()
+        ):
+            key_columns[table_name].add(column_name)
+            key_columns.setdefault(referenced_table, set()).add(referenced_column)
+        return key_columns
+
+    def render_fk_str(self, foreign_keys, table_names=None):
+        fk_str = ""
+        for table_name, column_name, referenced_table, referenced_column in foreign_keys:
+            if table_names is not None and not (
+                table_name in table_names and referenced_table in table_names
+            ):
+                continue
+            fk_str += f"{table_name}.`{column_name}` -> {referenced_table}.`{referenced_column}`\n"
         return fk_str
 
+    def build_fk_str(self):
+        return self.render_fk_str(self.get_foreign_keys())
+
     def get_column_descriptions(self):
         """
         Logic currently works for column description details for single table data.
         todo: Fix this later.
         """
+        if self._column_descriptions is not None:
+            return self._column_descriptions
+
         paths = ConfigLoader().load_path_config()
         transaction_data_col_desc = pd.read_excel(
             paths["column_descriptions_file_path"], sheet_name="Columns description"
@@ -126,34 +378,59 @@ class DatabaseUtils:
 
             column_descriptions[table_name] = column_descriptions_dict
 
+        self._column_descriptions = column_descriptions
         return column_descriptions
 
-    def get_schema_str(self):
-        schema_str = ""
+    def get_value_examples(self, conn, table_name, n_examples=4):
+        """
+        Fetches value examples for every column of a table in a single statement.
+        Returns:
+            dict: column name -> list of up to n_examples values.
+        """
+        table = self._metadata.tables[table_name]
+        result = conn.execute(select(*table.columns).limit(n_examples))
+        rows = result.fetchall()
+        return {
+            column_name: [row[position] for row in rows]
+            for position, column_name in enumerate(table.columns.keys())
+        }
+
+    def build_schema_entries(self):
+        """
+        Collects (column name, column description, value examples) for every column of every table.
+        Returns:
+            dict: table name -> list of [column_name, column_description, value_examples_str].
+        """
         column_descriptions = self.get_column_descriptions()
-        for table_name in self._metadata.tables:
+        schema_entries = {}
+        with self._engine.connect() as conn:
+            for table_name in self._metadata.tables:
+                value_examples = self.get_value_examples(conn, table_name)
+                table_entries = []
+                for column_name in self._metadata.tables[table_name].columns.keys():
+                    column_description = column_descriptions.get(table_name, {}).get(
+                        column_name, ""
+                    )
+                    table_entries.append(
+                        [
+                            column_name,
+                            str(column_description),
+                            str(value_examples.get(column_name, [])),
+                        ]
+                    )
+                schema_entries[table_name] = table_entries
+        return schema_entries
+
+    def render_schema_str(self, schema_entries):
+        schema_str = ""
+        for table_name, table_entries in schema_entries.items():
             table_template = """
 # Table: {table_name}
 [
 {table_info}]
 """
             table_info = ""
-            for column_name, _ in list(
-                self._metadata.tables[table_name].columns.items()
-            ):
-                column_description = column_descriptions.get(table_name, {}).get(
-                    column_name, ""
-                )
-                column_values = []
-                with self._engine.connect() as conn:
-                    result = conn.execute(
-                        text(f"SELECT {column_name} from {table_name} LIMIT 4")
-                    )
-                    for row in result:
-                        column_values.append(row[0])
-                    column_values = str(column_values)
-                    conn.close()
-
+            for column_name, column_description, column_values in table_entries:
                 table_info += f"\t({column_name}, {column_description}, Value Examples: {column_values})\n"
             table_template = table_template.format(
                 table_name=table_name, table_info=table_info
@@ -163,6 +440,46 @@ class DatabaseUtils:
 
         return schema_str
 
+    def load_schema_strings(self):
+        """
+        Returns the rendered schema and foreign key strings, building them only when the on-disk cache
+        does not match the current database file and schema version.
+        """
+        if self._schema_strings is not None:
+            return self._schema_strings
+
+        cache_key = self.get_schema_cache_key()
+        cache_file = os.path.join(self._schema_cache_dir, f"{cache_key}.json")
+        if os.path.exists(cache_file):
+            try:
+                with open(cache_file, "r") as file:
+                    self._schema_strings = json.load(file)
+                return self._schema_strings
+            except (OSError, ValueError):
+                pass
+
+        schema_entries = self.build_schema_entries()
+        self._schema_strings = {
+            "schema_entries": schema_entries,
+            "schema_str": self.render_schema_str(schema_entries),
+            "fk_str": self.build_fk_str(),
+        }
+        os.makedirs(self._schema_cache_dir, exist_ok=True)
+        tmp_file = cache_file + ".tmp"
+        with open(tmp_file, "w") as file:
+            json.dump(self._schema_strings, file)
+        os.replace(tmp_file, cache_file)
+        return self._schema_strings
+
+    def get_fk_str(self):
+        return self.load_schema_strings()["fk_str"]
+
+    def get_schema_str(self):
+        return self.load_schema_strings()["schema_str"]
+
+    def get_schema_entries(self):
+        return self.load_schema_strings()["schema_entries"]
+
     def format_number_column(self, df, column_name):
         """
         Applies comma formatting according to the international numbering system to a specific column in a pandas dataframe.
@@ -0,0 +1,101 @@
+import sqlite3
+import pytest
+
+pd = pytest.importorskip("pandas")
+# src.utils.utils imports the index creator and, through it, the embedding model
+for module_name in ("sqlalchemy", "faiss", "llama_index", "torch", "transformers"):
+    pytest.importorskip(module_name)
+
+from src.utils.utils import DatabaseUtils  # noqa: E402
+
+
+def make_database_utils(chunk_rows=4, max_rows=1000, max_bytes=64 * 1024 * 1024):
+    # fetch_result only needs the fetch settings, not the index or the database engine
+    database_utils = DatabaseUtils.__new__(DatabaseUtils)
+    database_utils._chunk_rows = chunk_rows
+    database_utils._max_rows = max_rows
+    database_utils._max_bytes = max_bytes
+    return database_utils
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE sales (id INTEGER PRIMARY KEY, value INTEGER)")
+    conn.executemany(
+        "INSERT INTO sales VALUES (?, ?)", [(i, i * 10) for i in range(20)]
+    )
+    yield conn
+    conn.close()
+
+
+SQL_QUERY = "SELECT id, value FROM sales ORDER BY id"
+
+
+def test_fetch_all(conn):
+    result = make_database_utils().fetch_result(conn, SQL_QUERY, "all", 1000)
+    assert result["id"].tolist() == list(range(20))
+    assert result.attrs == {"fetch_mode": "all", "truncated": False, "total_rows": 20}
+
+
+def test_fetch_all_row_cap(conn):
+    result = make_database_utils().fetch_result(conn, SQL_QUERY, "all", 7)
+    assert result["id"].tolist() == list(range(7))
+    assert result.attrs["truncated"] is True
+    # the rest of the result was not read
+    assert result.attrs["total_rows"] is None
+
+
+def test_fetch_all_byte_cap(conn):
+    full_bytes = int(
+        make_database_utils()
+        .fetch_result(conn, SQL_QUERY, "all", 1000)
+        .memory_usage(index=True, deep=True)
+        .sum()
+    )
+    database_utils = make_database_utils(chunk_rows=20, max_bytes=full_bytes // 2)
+    result = database_utils.fetch_result(conn, SQL_QUERY, "all", 1000)
+    assert 0 < len(result) < 20
+    assert result["id"].tolist() == list(range(len(result)))
+    assert result.attrs["truncated"] is True
+    assert result.attrs["total_rows"] is None
+
+
+def test_fetch_head(conn):
+    result = make_database_utils().fetch_result(conn, SQL_QUERY, "head", 5)
+    assert result["id"].tolist() == list(range(5))
+    assert result.attrs["truncated"] is True
+    assert result.attrs["total_rows"] is None
+
+
+def test_fetch_head_of_short_result(conn):
+    result = make_database_utils().fetch_result(conn, SQL_QUERY, "head", 20)
+    assert len(result) == 20
+    assert result.attrs["truncated"] is False
+    assert result.attrs["total_rows"] == 20
+
+
+def test_fetch_tail(conn):
+    result = make_database_utils().fetch_result(conn, SQL_QUERY, "tail", 5)
+    assert result["id"].tolist() == list(range(15, 20))
+    # same index as the tail of the whole result
+    assert result.index.tolist() == list(range(15, 20))
+    assert result.attrs["truncated"] is True
+    assert result.attrs["total_rows"] == 20
+
+
+def test_fetch_tail_of_short_result(conn):
+    result = make_database_utils().fetch_result(conn, SQL_QUERY, "tail", 50)
+    assert len(result) == 20
+    assert result.attrs["truncated"] is False
+    assert result.attrs["total_rows"] == 20
+
+
+def test_fetch_empty_result(conn):
+    result = make_database_utils().fetch_result(
+        conn, "SELECT id, value FROM sales WHERE id < 0", "all", 1000
+    )
+    assert result.empty
+    assert list(result.columns) == ["id", "value"]
+    assert result.attrs["truncated"] is False
+    assert result.attrs["total_rows"] == 0
@@ -0,0 +1,79 @@
+import pytest
+
+pytest.importorskip("pandas")
+# the LLM scheduler imports the LLM loader
+pytest.importorskip("llama_index")
+pytest.importorskip("llama_cpp")
+
+from src.jobs.insights_snapshot import InsightsSnapshotService  # noqa: E402
+
+
+class FakeLogger:
+    def __init__(self):
+        self.warnings = []
+
+    def warning(self, msg):
+        self.warnings.append(msg)
+
+
+class FakeInsightsAPI:
+    def __init__(self):
+        self.insights = [{"question": "total sales?", "description": "10"}]
+        self.calls = 0
+        self.logger_instance = FakeLogger()
+
+    def get_insight_questions_key(self):
+        return "questions"
+
+    def get_insights(self, progress_callback=None):
+        self.calls += 1
+        return {"insights": self.insights}
+
+
+class FakeDatabaseUtils:
+    data_version = 1
+
+    def get_data_version(self):
+        return self.data_version
+
+
+@pytest.fixture
+def service(tmp_path):
+    return InsightsSnapshotService(
+        insights_api=FakeInsightsAPI(),
+        database_utils=FakeDatabaseUtils(),
+        snapshot_path=str(tmp_path / "snapshot.json"),
+    )
+
+
+def test_refresh_is_skipped_while_current(service):
+    snapshot = service.refresh()
+    assert service.refresh() is snapshot
+    assert service._insights_api.calls == 1
+    service._database_utils.data_version = 2
+    assert not service.is_current()
+    assert service.refresh()["version"] != snapshot["version"]
+
+
+def test_snapshot_is_persisted(service):
+    snapshot = service.refresh()
+    reloaded = InsightsSnapshotService(
+        insights_api=service._insights_api,
+        database_utils=service._database_utils,
+        snapshot_path=service.snapshot_path,
+    )
+    assert reloaded.get_snapshot() == snapshot
+
+
+def test_failed_questions_are_flagged_in_the_snapshot(service):
+    service._insights_api.insights = [
+        {"question": "total sales?", "description": "10"},
+        {"question": "top states?", "description": "Could not process query.", "error": True},
+    ]
+    snapshot = service.refresh()
+    assert snapshot["failed_questions"] == 1
+    assert snapshot["insights"][1]["error"]
+    assert len(service._insights_api.logger_instance.warnings) == 1
+    # the partial snapshot is served and kept until the data changes or a refresh is forced
+    assert service.is_current()
+    assert service.refresh() is snapshot
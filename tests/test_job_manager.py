@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from src.jobs.job_manager import JobManager, JobQueueFullError
+
+
+def wait_until_finished(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not job.is_finished():
+        assert time.monotonic() < deadline, f"job {job.job_id} did not finish"
+        time.sleep(0.01)
+
+
+def test_submit_runs_the_task_and_keeps_its_result():
+    job_manager = JobManager(max_workers=1)
+
+    def task(job):
+        for index, name in enumerate(["total sales?", "top states?"]):
+            job.update_progress(index, name, "completed", {"question": name})
+        return {"insights": ["10", "Goa"]}
+
+    job = job_manager.submit(job_type="insights", task=task)
+    wait_until_finished(job)
+    assert job_manager.get_job(job.job_id) is job
+    status = job.get_status()
+    assert status["status"] == "completed"
+    assert status["job_type"] == "insights"
+    assert status["progress"]["completed"] == status["progress"]["total"] == 2
+    assert job.get_result() == {"insights": ["10", "Goa"]}
+
+
+def test_failed_task_reports_its_error():
+    job_manager = JobManager(max_workers=1)
+
+    def task(job):
+        raise RuntimeError("database is locked")
+
+    job = job_manager.submit(job_type="insights", task=task)
+    wait_until_finished(job)
+    assert job.status == "failed"
+    assert job.error == "RuntimeError: database is locked"
+
+
+def test_partial_results_while_running():
+    job_manager = JobManager(max_workers=1)
+    release = threading.Event()
+
+    def task(job):
+        job.update_progress(0, "total sales?", "completed", {"question": "total sales?"})
+        job.update_progress(1, "top states?", "running")
+        release.wait(5)
+        return {"insights": []}
+
+    job = job_manager.submit(job_type="insights", task=task)
+    while job.get_status()["progress"]["total"] < 2:
+        time.sleep(0.01)
+    assert job.status == "running"
+    assert job.get_result() == [{"question": "total sales?"}]
+    release.set()
+    wait_until_finished(job)
+
+
+def test_queue_full():
+    job_manager = JobManager(max_workers=1, max_pending_jobs=2)
+    release = threading.Event()
+    jobs = [
+        job_manager.submit(job_type="insights", task=lambda job: release.wait(5))
+        for _ in range(2)
+    ]
+    with pytest.raises(JobQueueFullError):
+        job_manager.submit(job_type="insights", task=lambda job: None)
+    assert jobs[1].status == "queued"
+    release.set()
+    for job in jobs:
+        wait_until_finished(job)
+    # finished jobs no longer count as pending
+    wait_until_finished(job_manager.submit(job_type="insights", task=lambda job: None))
+
+
+def test_finished_jobs_expire():
+    job_manager = JobManager(max_workers=1, job_ttl_seconds=0)
+    job = job_manager.submit(job_type="insights", task=lambda job: None)
+    wait_until_finished(job)
+    job.finished_at -= 1
+    job_manager.submit(job_type="insights", task=lambda job: None)
+    assert job_manager.get_job(job.job_id) is None
+    assert job_manager.get_job("unknown") is None
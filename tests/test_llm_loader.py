@@ -0,0 +1,53 @@
+import pytest
+
+pytest.importorskip("llama_index")
+pytest.importorskip("llama_cpp")
+
+from src.config.config_creator import ConfigCreator  # noqa: E402
+from src.config.config_loader import ConfigLoader  # noqa: E402
+from src.utils import llm_loader  # noqa: E402
+from src.utils.llm_loader import LLMLoader  # noqa: E402
+
+
+@pytest.fixture
+def configure_llms(monkeypatch):
+    def configure_llms(models):
+        """
+        Args:
+            models (dict): {model name: (num_workers, threads_per_worker)}, "default" is llm_params.
+        """
+        config = ConfigCreator().get_config()
+        config.set(
+            "llm_models", "names", ",".join(name for name in models if name != "default")
+        )
+        for model_name, (num_workers, threads_per_worker) in models.items():
+            section = "llm_params" if model_name == "default" else f"llm_model_{model_name}"
+            if not config.has_section(section):
+                config.add_section(section)
+            config.set(section, "num_workers", str(num_workers))
+            config.set(section, "threads_per_worker", str(threads_per_worker))
+        config_loader = ConfigLoader()
+        config_loader.config_obj = config
+        monkeypatch.setattr(LLMLoader, "context_loader_instance", config_loader)
+        monkeypatch.setattr(llm_loader.os, "cpu_count", lambda: 18)
+        return config_loader
+
+    return configure_llms
+
+
+def test_threads_are_split_between_the_workers(configure_llms):
+    config_loader = configure_llms({"default": (2, 0)})
+    assert LLMLoader.get_threads_per_worker(config_loader.load_llm_config()) == 8
+
+
+def test_threads_are_split_between_the_workers_of_every_llm(configure_llms):
+    config_loader = configure_llms({"default": (2, 0), "small": (2, 0)})
+    for model_name in ("default", "small"):
+        llm_params = config_loader.load_llm_config(model_name)
+        assert LLMLoader.get_threads_per_worker(llm_params) == 4
+
+
+def test_configured_threads_per_worker(configure_llms):
+    config_loader = configure_llms({"default": (2, 0), "small": (1, 3)})
+    assert LLMLoader.get_threads_per_worker(config_loader.load_llm_config("small")) == 3
+    assert LLMLoader.get_threads_per_worker(config_loader.load_llm_config()) == 5
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+# the scheduler imports the LLM loader
+pytest.importorskip("llama_index")
+pytest.importorskip("llama_cpp")
+
+from src.config.config_creator import ConfigCreator  # noqa: E402
+from src.config.config_loader import ConfigLoader  # noqa: E402
+from src.utils.llm_scheduler import (  # noqa: E402
+    LLMQueueFullError,
+    LLMQueueTimeoutError,
+    LLMScheduler,
+    llm_priority,
+)
+
+
+@pytest.fixture
+def make_scheduler(monkeypatch):
+    # a fixed max_concurrency keeps the scheduler from asking the LLM loader for its worker count
+    monkeypatch.setattr(LLMScheduler, "_instances", {})
+
+    def make_scheduler(max_concurrency=1, max_queue_depth=8, queue_timeout=5):
+        config = ConfigCreator().get_config()
+        config.set("scheduler_params", "max_concurrency", str(max_concurrency))
+        config.set("scheduler_params", "max_queue_depth", str(max_queue_depth))
+        for priority in ("interactive", "default", "batch"):
+            config.set(
+                "scheduler_params", f"{priority}_queue_timeout_seconds", str(queue_timeout)
+            )
+        monkeypatch.setattr(
+            ConfigLoader, "load_scheduler_config", lambda self: config["scheduler_params"]
+        )
+        return LLMScheduler("default")
+
+    return make_scheduler
+
+
+def wait_for_queue_depth(scheduler, depth, timeout=5):
+    deadline = time.monotonic() + timeout
+    while scheduler.stats()["queue_depth"] < depth:
+        assert time.monotonic() < deadline, "calls were not queued"
+        time.sleep(0.01)
+
+
+def start_call(scheduler, priority, name, admitted):
+    def call():
+        with llm_priority(priority), scheduler.slot():
+            admitted.append(name)
+
+    thread = threading.Thread(target=call)
+    thread.start()
+    return thread
+
+
+def test_waiting_calls_are_admitted_by_priority_then_arrival(make_scheduler):
+    scheduler = make_scheduler()
+    admitted = []
+    threads = []
+    scheduler.acquire(priority="interactive")
+    for depth, (priority, name) in enumerate(
+        [
+            ("batch", "batch 1"),
+            ("default", "default 1"),
+            ("batch", "batch 2"),
+            ("interactive", "interactive 1"),
+            ("default", "default 2"),
+        ],
+        start=1,
+    ):
+        threads.append(start_call(scheduler, priority, name, admitted))
+        wait_for_queue_depth(scheduler, depth)
+    scheduler.release()
+    for thread in threads:
+        thread.join(5)
+    assert admitted == ["interactive 1", "default 1", "default 2", "batch 1", "batch 2"]
+    assert scheduler.stats()["priorities"]["batch"]["admitted"] == 2
+
+
+def test_queue_full(make_scheduler):
+    scheduler = make_scheduler(max_queue_depth=1)
+    admitted = []
+    scheduler.acquire()
+    thread = start_call(scheduler, "default", "queued", admitted)
+    wait_for_queue_depth(scheduler, 1)
+    with pytest.raises(LLMQueueFullError) as excinfo:
+        scheduler.acquire(priority="interactive")
+    assert excinfo.value.retry_after == scheduler.retry_after_seconds
+    scheduler.release()
+    thread.join(5)
+    assert admitted == ["queued"]
+    assert scheduler.stats()["priorities"]["interactive"]["rejected"] == 1
+
+
+def test_queue_timeout(make_scheduler):
+    scheduler = make_scheduler()
+    scheduler.acquire()
+    with pytest.raises(LLMQueueTimeoutError):
+        scheduler.acquire(priority="batch", timeout=0.05)
+    stats = scheduler.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["priorities"]["batch"]["timed_out"] == 1
+    scheduler.release()
+
+
+def test_nested_slots_do_not_deadlock(make_scheduler):
+    scheduler = make_scheduler()
+    with scheduler.slot():
+        with scheduler.slot(timeout=0.05):
+            assert scheduler.stats()["active"] == 1
+    assert scheduler.stats()["active"] == 0
@@ -0,0 +1,98 @@
+import itertools
+import queue
+import threading
+
+import pytest
+
+pytest.importorskip("llama_index")
+
+from src.utils.llm_worker_pool import LLMWorkerPool  # noqa: E402
+
+
+class FakeProcess:
+    def __init__(self, alive=True, stops=True):
+        self.alive = alive
+        self.stops = stops
+        self.terminated = False
+
+    def is_alive(self):
+        return self.alive
+
+    def join(self, timeout=None):
+        if self.stops:
+            self.alive = False
+
+    def terminate(self):
+        self.alive = False
+        self.terminated = True
+
+
+def make_pool(processes):
+    # the pool without its worker processes and dispatcher thread
+    pool = LLMWorkerPool.__new__(LLMWorkerPool)
+    pool.num_workers = len(processes)
+    pool._processes = processes
+    pool._request_queues = [queue.Queue() for _ in processes]
+    pool._response_queue = queue.Queue()
+    pool._in_flight = [0] * len(processes)
+    pool._completed = [0] * len(processes)
+    pool._pending = {}
+    pool._request_ids = itertools.count()
+    pool._lock = threading.Lock()
+    pool._closed = False
+    return pool
+
+
+def test_requests_go_to_the_least_busy_live_worker():
+    pool = make_pool([FakeProcess(), FakeProcess(alive=False), FakeProcess()])
+    pool._submit("prompt", formatted=False, stream=False)
+    pool._submit("prompt", formatted=False, stream=False)
+    assert pool._in_flight == [1, 0, 1]
+    assert pool._request_queues[1].empty()
+
+
+def test_requests_of_a_dead_worker_fail():
+    processes = [FakeProcess(), FakeProcess()]
+    pool = make_pool(processes)
+    responses = pool._submit("prompt", formatted=False, stream=False)
+    processes[0].alive = False
+    pool._fail_dead_workers()
+    assert responses.get(timeout=1) == ("error", "LLM worker 0 died")
+    assert pool._in_flight == [0, 0]
+    assert pool._pending == {}
+
+
+def test_dead_worker_is_noticed_while_other_workers_respond():
+    processes = [FakeProcess(), FakeProcess()]
+    pool = make_pool(processes)
+    responses = pool._submit("prompt", formatted=False, stream=False)
+    streamed = pool._submit("prompt", formatted=False, stream=True)
+    processes[0].alive = False
+    threading.Thread(target=pool._dispatch, daemon=True).start()
+    stop_event = threading.Event()
+
+    def respond():
+        # worker 1 keeps the response queue busy
+        while not stop_event.is_set():
+            pool._response_queue.put(("delta", 1, "token"))
+            stop_event.wait(0.01)
+
+    threading.Thread(target=respond, daemon=True).start()
+    try:
+        assert responses.get(timeout=0.5) == ("error", "LLM worker 0 died")
+    finally:
+        stop_event.set()
+    assert streamed.get(timeout=1) == ("delta", "token")
+
+
+def test_close_stops_the_workers_once():
+    processes = [FakeProcess(), FakeProcess(stops=False), FakeProcess(alive=False)]
+    pool = make_pool(processes)
+    pool.close()
+    assert [request_queue.qsize() for request_queue in pool._request_queues] == [1, 1, 0]
+    assert not any(process.is_alive() for process in processes)
+    assert [process.terminated for process in processes] == [False, True, False]
+    pool.close()
+    assert pool._request_queues[0].qsize() == 1
+    with pytest.raises(RuntimeError):
+        pool._submit("prompt", formatted=False, stream=False)
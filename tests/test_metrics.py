@@ -0,0 +1,35 @@
+import time
+
+from src.utils.metrics import STAGE_LATENCY, metrics_endpoint, observe_stage_items
+
+
+def get_stage_seconds(endpoint, stage):
+    return STAGE_LATENCY._values[(endpoint, stage)][1]
+
+
+def test_stream_stage_excludes_the_consumer():
+    def generate():
+        for token in ("Goa", " leads"):
+            time.sleep(0.01)
+            yield token
+
+    with metrics_endpoint("test_stream"):
+        tokens = []
+        for token in observe_stage_items("summary", generate()):
+            tokens.append(token)
+            # a slow client
+            time.sleep(0.1)
+    assert tokens == ["Goa", " leads"]
+    assert 0.02 <= get_stage_seconds("test_stream", "summary") < 0.1
+
+
+def test_stream_stage_is_recorded_when_the_stream_is_closed_early():
+    def generate():
+        yield "Goa"
+        yield " leads"
+
+    with metrics_endpoint("test_closed_stream"):
+        items = observe_stage_items("summary", generate())
+        assert next(items) == "Goa"
+        items.close()
+    assert sum(STAGE_LATENCY._values[("test_closed_stream", "summary")][0]) == 1
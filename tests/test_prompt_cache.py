@@ -0,0 +1,103 @@
+import types
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("llama_cpp")
+pytest.importorskip("llama_index")
+
+from llama_index.llms.llama_utils import completion_to_prompt  # noqa: E402
+from llama_index.prompts.default_prompts import DEFAULT_TEXT_TO_SQL_PROMPT  # noqa: E402
+
+from src.utils.prompt_cache import (  # noqa: E402
+    PromptPrefixCache,
+    get_prompt_prefix,
+    get_static_prefix,
+)
+
+DECOMPOSER_PROMPT = "Break the question down and write the SQL.\nQuestion: top 5 states by sales"
+TABLE_INFO = "Table 'sales' has columns: state (VARCHAR), sales (FLOAT)."
+
+
+class FakeModel:
+    """
+    One token per byte, the context holds the tokens of the last evaluated or loaded state.
+    """
+
+    def __init__(self):
+        self.input_ids = np.array([], dtype=np.intc)
+        self.loaded_states = 0
+
+    @property
+    def n_tokens(self):
+        return len(self.input_ids)
+
+    def n_ctx(self):
+        return 4096
+
+    def tokenize(self, text, special=False):
+        return list(text)
+
+    def reset(self):
+        self.input_ids = np.array([], dtype=np.intc)
+
+    def eval(self, tokens):
+        self.input_ids = np.concatenate([self.input_ids, np.array(tokens, dtype=np.intc)])
+
+    def save_state(self):
+        return types.SimpleNamespace(
+            input_ids=self.input_ids.copy(),
+            llama_state_size=len(self.input_ids),
+            scores=np.zeros((len(self.input_ids), 2), dtype=np.single),
+        )
+
+    def load_state(self, state):
+        self.input_ids = state.input_ids.copy()
+        self.loaded_states += 1
+
+
+@pytest.fixture
+def model():
+    return FakeModel()
+
+
+@pytest.fixture
+def cache(model, tmp_path):
+    model_path = tmp_path / "model.gguf"
+    model_path.write_bytes(b"weights")
+    return PromptPrefixCache(
+        model=model,
+        model_path=str(model_path),
+        min_prefix_tokens=16,
+        completion_to_prompt=completion_to_prompt,
+    )
+
+
+def get_engine_prompt(query_str):
+    # what SQLTableRetrieverQueryEngine sends to the LLM for a decomposer / detail / refiner prompt
+    return completion_to_prompt(
+        DEFAULT_TEXT_TO_SQL_PROMPT.format(
+            dialect="sqlite", schema=TABLE_INFO, query_str=query_str
+        )
+    )
+
+
+def test_query_engine_prompt_restores_the_text_to_sql_prefix(cache, model):
+    static_text = get_static_prefix(
+        DEFAULT_TEXT_TO_SQL_PROMPT.get_template(), {"dialect": "sqlite"}
+    )
+    cache.register_prefix("text_to_sql_prompt", static_text)
+    prefix_tokens = cache.tokenize(get_prompt_prefix(static_text, completion_to_prompt))
+
+    assert cache.restore(get_engine_prompt(DECOMPOSER_PROMPT)) == len(prefix_tokens) - 1
+    assert model.loaded_states == 1
+    # the context already starts with the prefix, nothing is loaded again
+    assert cache.restore(get_engine_prompt("top 3 brands")) == len(prefix_tokens) - 1
+    assert model.loaded_states == 1
+    assert cache.stats()["hits"] == 2
+
+
+def test_bare_template_prefix_does_not_match_the_query_engine_prompt(cache, model):
+    cache.register_prefix("decomposer_template", DECOMPOSER_PROMPT.split("Question")[0])
+    assert cache.restore(get_engine_prompt(DECOMPOSER_PROMPT)) == 0
+    assert model.loaded_states == 0
@@ -0,0 +1,40 @@
+import pytest
+from src.cache.query_cache import SQLQueryCache
+
+
+def test_sql_query_cache_key_normalises_question():
+    cache = SQLQueryCache()
+    key = cache.make_key("Top 5 states?", "", "decomposer_template", "schema")
+    assert key == cache.make_key("  top 5   STATES ", "", "decomposer_template", "schema")
+    assert key != cache.make_key("Top 5 states?", "", "detail_template", "schema")
+    assert key != cache.make_key("Top 5 states?", "", "decomposer_template", "other")
+
+
+def test_sql_query_cache_invalidate():
+    cache = SQLQueryCache()
+    cache.put("key", "SELECT 1")
+    assert cache.get("key") == "SELECT 1"
+    cache.invalidate("key")
+    assert cache.get("key") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 0}
+
+
+def test_sql_query_cache_evicts_least_recently_used():
+    cache = SQLQueryCache(max_entries=2)
+    cache.put("a", "SELECT 'a'")
+    cache.put("b", "SELECT 'b'")
+    cache.get("a")
+    cache.put("c", "SELECT 'c'")
+    assert cache.get("b") is None
+    assert cache.get("a") == "SELECT 'a'"
+
+
+def test_sql_query_cache_persists_invalidation(tmp_path):
+    persist_path = str(tmp_path / "sql_cache.db")
+    cache = SQLQueryCache(persist_path=persist_path)
+    cache.put("a", "SELECT 'a'")
+    cache.put("b", "SELECT 'b'")
+    cache.invalidate("a")
+    reloaded_cache = SQLQueryCache(persist_path=persist_path)
+    assert reloaded_cache.get("a") is None
+    assert reloaded_cache.get("b") == "SELECT 'b'"
@@ -0,0 +1,122 @@
+import configparser
+import sqlite3
+import pytest
+from src.utils.query_guard import (
+    QueryCostRejectedError,
+    QueryGuard,
+    QueryTimeBudgetExceededError,
+    get_sqlite_error_dict,
+)
+
+ENDLESS_QUERY = (
+    "WITH RECURSIVE numbers(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM numbers) "
+    "SELECT COUNT(*) FROM numbers"
+)
+
+
+def make_query_guard(**overrides):
+    config = configparser.ConfigParser()
+    config["query_guard_params"] = {
+        "time_budget_seconds": "0.2",
+        "progress_handler_steps": "1000",
+        "preflight_action": "reject",
+        "large_table_rows": "100",
+        **overrides,
+    }
+    return QueryGuard(config["query_guard_params"])
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE sales (id INTEGER PRIMARY KEY, state TEXT, value REAL)")
+    conn.execute("CREATE TABLE states (code TEXT, name TEXT)")
+    conn.executemany(
+        "INSERT INTO sales (state, value) VALUES (?, ?)",
+        [(f"S{i % 5}", float(i)) for i in range(200)],
+    )
+    conn.executemany(
+        "INSERT INTO states VALUES (?, ?)", [(f"S{i}", f"State {i}") for i in range(5)]
+    )
+    yield conn
+    conn.close()
+
+
+def test_time_budget_stops_long_query(conn):
+    query_guard = make_query_guard()
+    with pytest.raises(QueryTimeBudgetExceededError) as excinfo:
+        with query_guard.time_budget(conn):
+            conn.execute(ENDLESS_QUERY).fetchall()
+    assert excinfo.value.details == {"time_budget_seconds": 0.2}
+    # the progress handler is removed once the block is left
+    assert conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0] == 200
+
+
+def test_time_budget_passes_through_sql_errors(conn):
+    query_guard = make_query_guard()
+    with pytest.raises(sqlite3.OperationalError):
+        with query_guard.time_budget(conn):
+            conn.execute("SELECT missing_column FROM sales")
+
+
+def test_preflight_rejects_unaggregated_full_scan(conn):
+    query_guard = make_query_guard()
+    with pytest.raises(QueryCostRejectedError) as excinfo:
+        query_guard.preflight(conn, "SELECT * FROM sales", data_version=(1,))
+    assert "sales" in excinfo.value.details["reasons"][0]
+    assert excinfo.value.details["query_plan"]
+
+
+@pytest.mark.parametrize(
+    "sql_query",
+    [
+        "SELECT state, SUM(value) FROM sales GROUP BY state",
+        "SELECT * FROM sales WHERE state = 'S1'",
+        "SELECT * FROM sales LIMIT 10",
+        "SELECT * FROM states",
+    ],
+)
+def test_preflight_accepts_cheap_queries(conn, sql_query):
+    assert make_query_guard().preflight(conn, sql_query, data_version=(1,)) == []
+
+
+def test_preflight_flags_cartesian_join(conn):
+    query_guard = make_query_guard(preflight_action="flag")
+    reasons = query_guard.preflight(
+        conn, "SELECT COUNT(*) FROM sales a, sales b", data_version=(1,)
+    )
+    assert any("nested loops" in reason for reason in reasons)
+
+
+def test_preflight_off(conn):
+    query_guard = make_query_guard(preflight_action="off")
+    assert query_guard.preflight(conn, "SELECT * FROM sales", data_version=(1,)) == []
+
+
+def test_table_row_counts_follow_data_version(conn):
+    query_guard = make_query_guard()
+    assert query_guard.get_table_row_counts(conn, (1,))["sales"] == 200
+    conn.execute("INSERT INTO sales (state, value) VALUES ('S0', 1.0)")
+    assert query_guard.get_table_row_counts(conn, (1,))["sales"] == 200
+    assert query_guard.get_table_row_counts(conn, (2,))["sales"] == 201
+
+
+def test_error_dicts_tell_whether_the_refiner_can_help(conn):
+    query_guard = make_query_guard()
+    with pytest.raises(QueryCostRejectedError) as excinfo:
+        query_guard.preflight(conn, "SELECT * FROM sales", data_version=(1,))
+    error_dict = excinfo.value.to_error_dict()
+    assert error_dict["error_type"] == "expensive_query"
+    assert error_dict["refinable"] is True
+    assert "sqlite_error" in error_dict
+
+    sql_error = get_sqlite_error_dict(sqlite3.OperationalError("no such column: x"))
+    assert sql_error["error_type"] == "sqlite_error"
+    assert sql_error["refinable"] is True
+    locked_error = get_sqlite_error_dict(sqlite3.OperationalError("database is locked"))
+    assert locked_error["refinable"] is False
+
+
+def test_invalid_query_config():
+    with pytest.raises(ValueError):
+        make_query_guard(preflight_action="warn")
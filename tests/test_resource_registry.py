@@ -0,0 +1,64 @@
+import pytest
+
+for module_name in (
+    "pandas",
+    "sqlalchemy",
+    "faiss",
+    "llama_index",
+    "llama_cpp",
+    "torch",
+    "transformers",
+):
+    pytest.importorskip(module_name)
+
+from src.index.index_creator import TABLE_RETRIEVER_TOP_K  # noqa: E402
+from src.utils import resource_registry  # noqa: E402
+from src.utils.resource_registry import ResourceRegistry  # noqa: E402
+from src.utils.token_budget import QUERY_ENGINE_TEMPLATES, PromptBudget  # noqa: E402
+
+
+class FakeIndexCreator:
+    _sql_database = object()
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(ResourceRegistry, "_instance", None)
+    registry = ResourceRegistry()
+    # stand in for the reflected database, the built query engine and the log files
+    registry._resources.update(
+        query_engine=object(), index_creator=FakeIndexCreator(), logger=object()
+    )
+    # keeps the default budgets from loading the LLM
+    monkeypatch.setattr(
+        PromptBudget, "get_default_budget", staticmethod(lambda template_name: 4096)
+    )
+    return registry
+
+
+def test_prompt_budget_reserves_the_query_engine_overhead(registry, monkeypatch):
+    calls = []
+
+    def get_query_engine_overhead(query_engine, sql_database, n_tables):
+        calls.append((query_engine, sql_database, n_tables))
+        return 300
+
+    monkeypatch.setattr(
+        resource_registry, "get_query_engine_overhead", get_query_engine_overhead
+    )
+    prompt_budget = registry.prompt_budget
+    assert registry.prompt_budget is prompt_budget
+    assert calls == [
+        (
+            registry.query_engine,
+            FakeIndexCreator._sql_database,
+            TABLE_RETRIEVER_TOP_K,
+        )
+    ]
+    for template_name in QUERY_ENGINE_TEMPLATES:
+        assert prompt_budget.get_budget(template_name) == (
+            prompt_budget._budgets[template_name] - 300
+        )
+    assert prompt_budget.get_budget("summary_template") == (
+        prompt_budget._budgets["summary_template"]
+    )
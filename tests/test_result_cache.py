@@ -0,0 +1,49 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from src.cache.result_cache import ResultCache  # noqa: E402
+
+
+def make_result(n_rows=3):
+    return pd.DataFrame({"value": range(n_rows)})
+
+
+def test_hit_ignores_sql_formatting():
+    cache = ResultCache()
+    cache.put("SELECT value\nFROM sales;", (1,), make_result())
+    result = cache.get("SELECT value FROM sales", (1,))
+    assert result["value"].tolist() == [0, 1, 2]
+
+
+def test_returns_copies():
+    cache = ResultCache()
+    cache.put("SELECT value FROM sales", (1,), make_result())
+    cache.get("SELECT value FROM sales", (1,))["value"] = 0
+    assert cache.get("SELECT value FROM sales", (1,))["value"].tolist() == [0, 1, 2]
+
+
+def test_data_version_change_invalidates_every_entry():
+    cache = ResultCache()
+    cache.put("SELECT value FROM sales", (1,), make_result())
+    assert cache.get("SELECT value FROM sales", (2,)) is None
+    assert cache.get("SELECT value FROM sales", (1,)) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_fetch_options_are_part_of_the_key():
+    cache = ResultCache()
+    cache.put("SELECT value FROM sales", (1,), make_result(), ("tail", 10, 100))
+    assert cache.get("SELECT value FROM sales", (1,), ("head", 10, 100)) is None
+    assert cache.get("SELECT value FROM sales", (1,), ("tail", 10, 100)) is not None
+
+
+def test_byte_bounds():
+    entry_bytes = int(make_result().memory_usage(index=True, deep=True).sum())
+    cache = ResultCache(max_bytes=entry_bytes * 2, max_entry_bytes=entry_bytes)
+    cache.put("SELECT 1", (1,), make_result(n_rows=100))
+    assert cache.stats()["size"] == 0
+    for sql_query in ("SELECT 1", "SELECT 2", "SELECT 3"):
+        cache.put(sql_query, (1,), make_result())
+    assert cache.get("SELECT 1", (1,)) is None
+    assert cache.stats()["bytes"] <= entry_bytes * 2
@@ -0,0 +1,106 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from src.utils.result_summariser import ResultSummariser, summary_mode  # noqa: E402
+
+
+@pytest.fixture
+def summariser():
+    return ResultSummariser()
+
+
+def test_empty_result(summariser):
+    assert summariser.describe(pd.DataFrame({"value": []})) == "The query returned no results."
+
+
+def test_single_value(summariser):
+    result = pd.DataFrame({"total_sales": [1234567.5]})
+    assert summariser.describe(result) == "The total sales is 1,234,567.50."
+
+
+def test_single_row(summariser):
+    result = pd.DataFrame({"state": ["Delhi"], "total_sales": [1500]})
+    assert summariser.describe(result) == "The result is state: Delhi, total sales: 1,500."
+
+
+def test_ranking(summariser):
+    result = pd.DataFrame(
+        {"state": ["Delhi", "Goa", "Kerala", "Assam"], "sales": [50, 300, 100, 50]}
+    )
+    summary = summariser.describe(result)
+    assert "the total sales is 500." in summary
+    assert "The highest sales is for Goa (300), Kerala (100), Delhi (50)." in summary
+    assert "Goa accounts for 60.0% of the total." in summary
+    assert "The lowest is Assam (50)." in summary
+
+
+def test_ascending_ranking(summariser):
+    result = pd.DataFrame(
+        {"state": ["Assam", "Delhi", "Kerala", "Goa"], "sales": [50, 50, 100, 300]}
+    )
+    summary = summariser.describe(result)
+    assert "The lowest sales is for Assam (50), Delhi (50), Kerala (100)." in summary
+    assert "The highest is Goa (300)." in summary
+    assert "accounts for" not in summary
+
+
+@pytest.mark.parametrize("id_column", ["store_id", "product_code", "sku", "pincode"])
+def test_id_columns_are_labels(summariser, id_column):
+    result = pd.DataFrame({id_column: [101, 205, 101], "sales": [10.5, 20.0, 30.0]})
+    assert summariser.split_columns(result) == ([], ["sales"], [id_column])
+
+
+def test_unique_integer_columns_are_labels(summariser):
+    result = pd.DataFrame({"store": [7, 3, 9], "sales": [100, 250, 100]})
+    assert summariser.split_columns(result) == ([], ["sales"], ["store"])
+    summary = summariser.describe(result)
+    assert "The highest sales is for 3 (250)" in summary
+    # without another measure the unique integers are the measure
+    result = pd.DataFrame({"sales": [1, 2, 3], "units": [10, 20, 30]})
+    assert summariser.split_columns(result) == ([], ["sales", "units"], [])
+
+
+def test_series(summariser):
+    result = pd.DataFrame(
+        {"month": ["2023-03", "2023-01", "2023-02"], "sales": [300, 100, 200]}
+    )
+    summary = summariser.describe(result)
+    assert summary.startswith("From 2023-01 to 2023-03 (3 month values):")
+    assert "is increasing overall, moving from 100 to 300 (up 200.0%)." in summary
+    assert "The latest period (2023-03) is up 50.0% on the previous one (2023-02)." in summary
+
+
+def test_flat_series(summariser):
+    result = pd.DataFrame({"year": [2021, 2022, 2023], "sales": [100, 100, 100]})
+    assert "is broadly flat overall" in summariser.describe(result)
+
+
+def test_numeric_columns(summariser):
+    result = pd.DataFrame({"sales": [1, 2, 3], "units": [10, 20, 30]})
+    summary = summariser.describe(result)
+    assert "Across 3 rows, sales totals 6, ranging from 1 to 3 with an average of 2." in summary
+
+
+def test_complex_results_are_left_to_the_llm(summariser):
+    result = pd.DataFrame(
+        {"state": ["Delhi", "Goa"], "brand": ["A", "B"], "sales": [1, 2], "units": [3, 4]}
+    )
+    assert summariser.describe(result) is None
+    result = pd.DataFrame({"state": ["Delhi"] * (summariser.max_rows + 1), "sales": 1})
+    assert summariser.describe(result) is None
+
+
+def test_summary_modes(summariser):
+    simple_result = pd.DataFrame({"total_sales": [10]})
+    complex_result = pd.DataFrame(
+        {"state": ["Delhi", "Goa"], "brand": ["A", "B"], "sales": [1, 2], "units": [3, 4]}
+    )
+    with summary_mode("llm"):
+        assert summariser.summarise(simple_result) is None
+    with summary_mode("auto"):
+        assert summariser.summarise(simple_result) == "The total sales is 10."
+        assert summariser.summarise(complex_result) is None
+    with summary_mode("rules"):
+        assert summariser.summarise(complex_result).startswith("Here are the results:")
+    assert summariser.summarise(simple_result, mode="llm") is None
@@ -0,0 +1,68 @@
+import numpy as np
+
+from src.index.schema_retriever import SchemaColumnRetriever
+
+
+class FakeDatabaseUtils:
+    def __init__(self, column_description="total sale value"):
+        self.column_description = column_description
+
+    def get_schema_entries(self):
+        return {
+            "sales": [
+                ["order_id", "order number", "[1, 2]"],
+                ["value", self.column_description, "[10.5, 3.0]"],
+            ],
+            "states": [["state", "state name", "['Goa']"]],
+        }
+
+    def get_foreign_keys(self):
+        return {}
+
+    def get_key_columns(self):
+        return {}
+
+
+class FakeEmbedModel:
+    def __init__(self):
+        self.embedded = 0
+
+    def get_text_embedding_batch(self, documents):
+        self.embedded += len(documents)
+        return [[len(document), 1.0] for document in documents]
+
+
+def make_retriever(tmp_path, embed_model, database_utils=None, **kwargs):
+    params = dict(
+        embedding_model_name="bge-small",
+        schema_fingerprint="schema-a",
+        persist_dir=str(tmp_path),
+    )
+    params.update(kwargs)
+    return SchemaColumnRetriever(
+        database_utils=database_utils or FakeDatabaseUtils(),
+        embed_model=embed_model,
+        **params,
+    )
+
+
+def test_embeddings_are_reused_for_the_same_schema(tmp_path):
+    embed_model = FakeEmbedModel()
+    retriever = make_retriever(tmp_path, embed_model)
+    assert embed_model.embedded == 3
+    reloaded = make_retriever(tmp_path, embed_model)
+    assert embed_model.embedded == 3
+    np.testing.assert_array_equal(reloaded._embeddings, retriever._embeddings)
+
+
+def test_embeddings_are_rebuilt_when_the_key_changes(tmp_path):
+    embed_model = FakeEmbedModel()
+    make_retriever(tmp_path, embed_model)
+    make_retriever(tmp_path, embed_model, schema_fingerprint="schema-b")
+    assert embed_model.embedded == 6
+    make_retriever(tmp_path, embed_model, embedding_model_name="bge-base")
+    assert embed_model.embedded == 9
+    make_retriever(
+        tmp_path, embed_model, database_utils=FakeDatabaseUtils("sale amount in INR")
+    )
+    assert embed_model.embedded == 12
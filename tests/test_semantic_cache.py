@@ -0,0 +1,81 @@
+import pytest
+
+pytest.importorskip("faiss")
+
+from src.cache.semantic_cache import SemanticQueryCache  # noqa: E402
+
+VOCABULARY = ["top", "states", "sales", "value", "products", "brand", "month"]
+
+
+def embed(question):
+    # bag of words over a tiny vocabulary, paraphrases sharing the words are similar
+    words = question.lower().split()
+    return [
+        float(sum(word.startswith(term) for word in words)) + 0.01 for term in VOCABULARY
+    ]
+
+
+def test_get_literals():
+    get_literals = SemanticQueryCache.get_literals
+    assert get_literals("Top 5 states by sales in DEL") == ["5", "DEL", "order:desc"]
+    assert get_literals("Sales of 'Brand X' in 2023") == ["2023", "brand x"]
+    assert get_literals("top 5 states") != get_literals("top 10 states")
+
+
+@pytest.mark.parametrize(
+    "question, other_question",
+    [
+        ("top 5 states by sales", "bottom 5 states by sales"),
+        ("highest selling products", "lowest selling products"),
+        ("products by sales in ascending order", "products by sales in descending order"),
+        ("top products last month", "top products this year"),
+        ("top products this month", "top products in January"),
+        ("monthly sales of Delhi", "weekly sales of Delhi"),
+    ],
+)
+def test_get_literals_tell_directions_and_periods_apart(question, other_question):
+    assert SemanticQueryCache.get_literals(question) != SemanticQueryCache.get_literals(
+        other_question
+    )
+
+
+@pytest.mark.parametrize(
+    "question, paraphrase",
+    [
+        ("top 5 states by sales", "5 states with the highest sales"),
+        ("sales for the previous month", "sales for the last month"),
+        ("sales by month", "monthly sales"),
+        ("sales year to date", "YTD sales"),
+    ],
+)
+def test_get_literals_match_paraphrases(question, paraphrase):
+    assert SemanticQueryCache.get_literals(question) == SemanticQueryCache.get_literals(
+        paraphrase
+    )
+
+
+def test_lookup_and_invalidate():
+    cache = SemanticQueryCache(embed, "test", threshold=0.9)
+    cache.add("top 5 states by sales value", "decomposer_template", "SELECT 5")
+    match = cache.lookup("top 5 states by value of sales", "decomposer_template")
+    assert match["sql_query"] == "SELECT 5"
+    assert cache.lookup("top 10 states by sales value", "decomposer_template") is None
+    assert cache.lookup("top 5 states by sales value", "detail_template") is None
+    cache.invalidate(match["id"])
+    assert cache.lookup("top 5 states by sales value", "decomposer_template") is None
+
+
+def test_saves_are_batched_and_flushed(tmp_path):
+    cache = SemanticQueryCache(
+        embed, "test", threshold=0.9, persist_dir=str(tmp_path), save_delay_seconds=60
+    )
+    cache.add("top 5 states by sales value", "decomposer_template", "SELECT 5")
+    cache.add("top 5 products by sales value", "decomposer_template", "SELECT 6")
+    assert not (tmp_path / SemanticQueryCache.entries_file_name).exists()
+    cache.flush()
+    reloaded_cache = SemanticQueryCache(
+        embed, "test", threshold=0.9, persist_dir=str(tmp_path)
+    )
+    match = reloaded_cache.lookup("top 5 states by sales value", "decomposer_template")
+    assert match["sql_query"] == "SELECT 5"
+    assert reloaded_cache.stats()["size"] == 2
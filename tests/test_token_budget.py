@@ -0,0 +1,120 @@
+import pytest
+
+pytest.importorskip("llama_index")
+pytest.importorskip("llama_cpp")
+
+from src.config.config_creator import ConfigCreator  # noqa: E402
+from src.config.config_loader import ConfigLoader  # noqa: E402
+from src.utils.token_budget import (  # noqa: E402
+    EXAMPLE_SEPARATOR,
+    PromptBudget,
+    PromptBudgetExceededError,
+    get_request_token_usage,
+    start_request_token_usage,
+)
+
+EXAMPLES_TEMPLATE = (
+    "Answer the question.\n"
+    f"{EXAMPLE_SEPARATOR}\nexample one one one one\n"
+    f"{EXAMPLE_SEPARATOR}\nexample two two two two\n"
+    f"{EXAMPLE_SEPARATOR}\nQuestion: {{query}}"
+)
+SCHEMA_TEMPLATE = "Schema:\n{schema_str}\nQuestion: {query}"
+SCHEMA_STR = (
+    "Table sales:\n"
+    "(state TEXT, Value Examples: Delhi Goa Kerala Assam Punjab)\n"
+    "(brand TEXT, Value Examples: alpha beta gamma delta epsilon)"
+)
+
+
+@pytest.fixture
+def make_budget(monkeypatch):
+    def make_budget(budget, policies, enabled=True, prompt_overheads=None):
+        config = ConfigCreator().get_config()
+        config.set("token_budget_params", "enabled", str(enabled))
+        config.set("token_budget_params", "default_budget", str(budget))
+        config.set("token_budget_params", "default_policy", policies)
+        monkeypatch.setattr(
+            ConfigLoader,
+            "load_token_budget_config",
+            lambda self: config["token_budget_params"],
+        )
+        # one token per word keeps the expected counts readable
+        monkeypatch.setattr(
+            PromptBudget, "count_tokens", staticmethod(lambda text: len(text.split()))
+        )
+        return PromptBudget(
+            prompt_templates={"examples": EXAMPLES_TEMPLATE, "schema": SCHEMA_TEMPLATE},
+            prompt_overheads=prompt_overheads,
+        )
+
+    return make_budget
+
+
+def test_prompt_within_budget_is_unchanged(make_budget):
+    prompt_budget = make_budget(100, "trim_examples,reject")
+    prompt = prompt_budget.build("examples", query="top states?")
+    assert prompt == EXAMPLES_TEMPLATE.format(query="top states?")
+
+
+def test_trim_examples_drops_last_examples_first(make_budget):
+    prompt_budget = make_budget(14, "trim_examples,reject")
+    prompt = prompt_budget.build("examples", query="top states?")
+    assert "example one" in prompt
+    assert "example two" not in prompt
+    assert prompt.endswith("Question: top states?")
+    stats = prompt_budget.stats()["templates"]["examples"]
+    assert stats["policies_applied"]["trim_examples"] == 1
+    assert stats["over_budget"] == 0
+
+
+def test_drop_value_examples(make_budget):
+    prompt_budget = make_budget(12, "drop_value_examples,reject")
+    prompt = prompt_budget.build("schema", schema_str=SCHEMA_STR, query="top states?")
+    assert "Value Examples" not in prompt
+    assert "(state TEXT)" in prompt
+
+
+def test_overhead_is_reserved_from_the_budget(make_budget):
+    # 19 words fit a budget of 20, not once 5 are reserved for the text wrapped around the prompt
+    prompt_budget = make_budget(
+        20, "trim_examples,reject", prompt_overheads={"examples": 5}
+    )
+    prompt = prompt_budget.build("examples", query="top states?")
+    assert "example two" not in prompt
+    assert prompt_budget.get_budget("examples") == 15
+    assert prompt_budget.get_budget("schema") == 20
+    assert prompt_budget.stats()["templates"]["examples"]["overhead"] == 5
+
+
+def test_reject(make_budget):
+    prompt_budget = make_budget(5, "trim_examples,drop_value_examples,reject")
+    with pytest.raises(PromptBudgetExceededError) as excinfo:
+        prompt_budget.build("schema", schema_str=SCHEMA_STR, query="top states?")
+    assert excinfo.value.budget == 5
+    assert excinfo.value.n_tokens > 5
+    assert prompt_budget.stats()["templates"]["schema"]["rejected"] == 1
+
+
+def test_over_budget_prompt_is_sent_when_policies_are_exhausted(make_budget):
+    prompt_budget = make_budget(5, "trim_examples")
+    prompt = prompt_budget.build("schema", schema_str=SCHEMA_STR, query="top states?")
+    assert prompt == SCHEMA_TEMPLATE.format(schema_str=SCHEMA_STR, query="top states?")
+    assert prompt_budget.stats()["templates"]["schema"]["over_budget"] == 1
+
+
+def test_disabled_budget(make_budget):
+    prompt_budget = make_budget(5, "reject", enabled=False)
+    prompt = prompt_budget.build("schema", schema_str=SCHEMA_STR, query="top states?")
+    assert prompt == SCHEMA_TEMPLATE.format(schema_str=SCHEMA_STR, query="top states?")
+
+
+def test_request_token_usage(make_budget):
+    prompt_budget = make_budget(100, "reject")
+    start_request_token_usage()
+    prompt_budget.build("examples", query="top states?")
+    prompt_budget.record_completion("examples", "Delhi and Goa")
+    usage = get_request_token_usage()
+    assert usage["prompt_tokens"] == len(EXAMPLES_TEMPLATE.format(query="top states?").split())
+    assert usage["completion_tokens"] == 3
+    assert usage["templates"]["examples"]["calls"] == 1